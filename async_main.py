@@ -0,0 +1,540 @@
+# Альтернативный запуск бота на asyncio (telebot.async_telebot)
+#
+# Polling, health-эндпоинт, ежедневные напоминания, сброс записей и
+# обновление официального расписания - задачи одного цикла событий,
+# без отдельного потока на каждую из них. Запуск: python async_main.py
+import os
+import asyncio
+import logging
+import signal
+import weakref
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from aiohttp import web
+from telebot.async_telebot import AsyncTeleBot
+
+import config
+from schedule_manager import ScheduleManager, AsyncScheduleManager
+from messages import WELCOME_TEXT, HELP_TEXT
+from keyboards import (
+    get_main_keyboard, get_add_menu_keyboard, get_show_menu_keyboard, get_back_keyboard,
+    get_date_picker_keyboard, keyboard_stats
+)
+from schedule_parser import ScheduleParser, TimetableCache
+from broadcast import Broadcaster
+from reminders import ReminderScheduler
+from router import Router
+from conversation import (
+    ConversationStore, STUDY_DATETIME, STUDY_SUBJECT, WORK_DATETIME, WORK_DESCRIPTION, DATE_QUERY, AI_PLAN
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+if not BOT_TOKEN:
+    logger.error("❌ BOT_TOKEN не найден в переменных окружения!")
+    exit(1)
+
+bot = AsyncTeleBot(BOT_TOKEN)
+
+# Менеджер расписания: блокирующие вызовы уходят в пул потоков
+schedule_manager = AsyncScheduleManager(
+    ScheduleManager(background_flush=False),
+    workers=config.ASYNC_IO_WORKERS
+)
+
+# Официальное расписание из PDF
+timetable_parser = ScheduleParser(
+    config.GOOGLE_DRIVE_URL,
+    default_group=config.DEFAULT_GROUP,
+    cache_dir=config.PDF_CACHE_DIR,
+    extract_workers=config.PDF_EXTRACT_WORKERS,
+    parallel_min_pages=config.PDF_PARALLEL_MIN_PAGES,
+    debug=config.PARSER_DEBUG,
+    trace_path=config.PARSER_TRACE_FILE
+)
+timetable_cache = TimetableCache(timetable_parser, max_length=config.MAX_MESSAGE_LENGTH)
+
+# Состояния диалогов; снапшот сохраняет задача run_flusher
+conversations = ConversationStore(
+    ttl=config.CONVERSATION_TTL_MINUTES * 60,
+    max_users=config.CONVERSATION_MAX_USERS,
+    path=config.CONVERSATIONS_FILE,
+    background_flush=False
+)
+
+# async_telebot обрабатывает обновления пачки параллельно - диалог одного
+# пользователя сериализуем, чтобы его состояние менялось по порядку
+_user_locks = weakref.WeakValueDictionary()
+
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    """Блокировка диалога пользователя"""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+
+# Обработчики команд
+@bot.message_handler(commands=['start'])
+async def cmd_start(message):
+    """Обработчик команды /start"""
+    user_id = message.from_user.id
+    welcome_text = WELCOME_TEXT.format(user_name=message.from_user.first_name)
+    await bot.reply_to(message, welcome_text, reply_markup=get_main_keyboard())
+    logger.info(f"🚀 Пользователь {user_id} запустил бота")
+
+
+@bot.message_handler(commands=['help'])
+async def cmd_help(message):
+    """Обработчик команды /help"""
+    await bot.reply_to(message, HELP_TEXT, reply_markup=get_main_keyboard())
+
+
+@bot.message_handler(commands=['recommendations'])
+async def cmd_recommendations(message):
+    """Обработчик команды /recommendations"""
+    recommendations = await schedule_manager.get_smart_recommendations(message.from_user.id)
+    await bot.reply_to(message, recommendations, reply_markup=get_main_keyboard())
+
+
+def parse_communications(text: str) -> Optional[int]:
+    """Число коммуникаций для ИИ-планировщика или None"""
+    try:
+        value = int(text)
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+@bot.message_handler(commands=['ai_plan'])
+async def cmd_ai_plan(message):
+    """Обработчик команды /ai_plan"""
+    user_id = message.from_user.id
+    args = message.text.split()[1:]
+    current_communications = parse_communications(args[0]) if args else None
+    if current_communications is None:
+        await bot.reply_to(message,
+            "❌ Неправильный формат!\n\n"
+            "Используйте: /ai_plan ТЕКУЩИЙ_ПРОГРЕСС\n"
+            "Пример: /ai_plan 250",
+            reply_markup=get_main_keyboard())
+        return
+
+    smart_schedule = await schedule_manager.get_smart_work_schedule(user_id, current_communications)
+    await bot.reply_to(message, smart_schedule, reply_markup=get_main_keyboard())
+    logger.info(f"🤖 Пользователь {user_id} использовал ИИ-планировщик: {current_communications}")
+
+
+async def send_timetable(message, parts: Optional[List[str]], empty_text: str):
+    """Отправляет готовые части сообщения официального расписания"""
+    if not timetable_cache.is_ready():
+        await bot.reply_to(message, "⏳ Расписание загружается, попробуйте через минуту.", reply_markup=get_main_keyboard())
+        return
+
+    if not parts:
+        await bot.reply_to(message, empty_text, reply_markup=get_main_keyboard())
+        return
+
+    for i, part in enumerate(parts):
+        markup = get_main_keyboard() if i == len(parts) - 1 else None
+        await bot.send_message(message.chat.id, part, reply_markup=markup)
+
+
+@bot.message_handler(commands=['tomorrow'])
+async def cmd_tomorrow(message):
+    """Обработчик команды /tomorrow [группа]"""
+    args = message.text.split()[1:]
+    date = (datetime.now() + timedelta(days=1)).strftime('%d.%m.%Y')
+    await send_timetable(message, timetable_cache.get_day(date, args[0] if args else None),
+                         f"📅 На завтра ({date}) занятий нет.")
+
+
+@bot.message_handler(commands=['date'])
+async def cmd_date(message):
+    """Обработчик команды /date ДД.ММ.ГГГГ [группа]"""
+    args = message.text.split()[1:]
+    try:
+        date_parts = args[0].split('.')
+        if len(date_parts) == 2:
+            date_parts.append(str(datetime.now().year))
+        date = datetime.strptime('.'.join(date_parts), '%d.%m.%Y').strftime('%d.%m.%Y')
+    except (IndexError, ValueError):
+        await bot.reply_to(message,
+            "❌ Неправильный формат!\n\n"
+            "Используйте: /date ДД.ММ.ГГГГ [группа]\n"
+            "Пример: /date 02.09.2025 302Ф",
+            reply_markup=get_main_keyboard())
+        return
+
+    group = args[1] if len(args) > 1 else None
+    await send_timetable(message, timetable_cache.get_day(date, group), f"📅 На {date} занятий нет.")
+
+
+@bot.message_handler(commands=['week'])
+async def cmd_week(message):
+    """Обработчик команды /week [группа]"""
+    args = message.text.split()[1:]
+    groups = ', '.join(timetable_parser.get_groups())
+    await send_timetable(message, timetable_cache.get_week(args[0] if args else None),
+                         f"❌ Группа не найдена. Доступные группы: {groups}")
+
+
+@bot.message_handler(commands=['settings'])
+async def cmd_settings(message):
+    """Обработчик команды /settings"""
+    text = await schedule_manager.format_user_settings(message.from_user.id)
+    await bot.reply_to(message, text, reply_markup=get_main_keyboard())
+
+
+@bot.message_handler(commands=['timezone', 'remind_at', 'remind_before'])
+async def cmd_reminder_settings(message):
+    """Обработчик команд /timezone, /remind_at, /remind_before"""
+    user_id = message.from_user.id
+    command, *args = message.text.split()
+    if not args:
+        await cmd_settings(message)
+        return
+
+    field = {'/timezone': 'timezone', '/remind_at': 'reminder_time', '/remind_before': 'remind_before'}[command.split('@')[0]]
+    result = await schedule_manager.update_user_settings(user_id, **{field: args[0]})
+    await bot.reply_to(message, result, reply_markup=get_main_keyboard())
+
+
+# Маршруты: шаг диалога -> обработчик текста, callback_data -> обработчик кнопки
+text_router = Router('text')
+callback_router = Router('callbacks')
+
+
+async def report_failure(user_id: int, chat_id: int, error: Exception):
+    """Сбрасывает шаг диалога и сообщает пользователю об ошибке обработчика"""
+    logger.error(f"❌ Ошибка обработки для пользователя {user_id}: {error}")
+    conversations.clear(user_id)
+    await bot.send_message(chat_id, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
+
+
+# Обработчик текстовых сообщений
+@bot.message_handler(func=lambda message: True)
+async def handle_text(message):
+    """Обработчик текстовых сообщений"""
+    user_id = message.from_user.id
+    async with user_lock(user_id):
+        state = conversations.get(user_id)
+        try:
+            routed = state is not None and await text_router.dispatch_async(
+                state.step, message, user_id, state, message.text.strip())
+        except Exception as e:
+            await report_failure(user_id, message.chat.id, e)
+            return
+        if not routed:
+            await bot.reply_to(message, "Выберите действие в главном меню:", reply_markup=get_main_keyboard())
+
+
+@text_router.route(STUDY_SUBJECT, WORK_DESCRIPTION)
+async def on_event_title(message, user_id: int, state, text: str):
+    # Дата и время уже введены на предыдущем шаге
+    event_type = "study" if state.step == STUDY_SUBJECT else "work"
+    result = await schedule_manager.add_event(user_id, state.date_text, state.time_text, text, event_type)
+    conversations.clear(user_id)
+    await bot.reply_to(message, result, reply_markup=get_main_keyboard())
+    logger.info(f"➕ Пользователь {user_id} добавил событие ({event_type}): {text}")
+
+
+@text_router.route(AI_PLAN)
+async def on_ai_plan(message, user_id: int, state, text: str):
+    current_communications = parse_communications(text)
+    if current_communications is None:
+        await bot.reply_to(message,
+            "❌ Неправильный формат!\n\n"
+            "Введите положительное число коммуникаций.\n"
+            "Пример: 250",
+            reply_markup=get_main_keyboard())
+        return
+
+    conversations.clear(user_id)
+    smart_schedule = await schedule_manager.get_smart_work_schedule(user_id, current_communications)
+    await bot.reply_to(message, smart_schedule, reply_markup=get_main_keyboard())
+
+
+@text_router.route(STUDY_DATETIME, WORK_DATETIME)
+async def on_event_datetime(message, user_id: int, state, text: str):
+    parts = text.split()
+    is_study = state.step == STUDY_DATETIME
+    if len(parts) < 2:
+        example = "2 сентября 13:55-15:35" if is_study else "2 сентября 14:00-15:00"
+        await bot.reply_to(message,
+            "❌ Неправильный формат!\n\n"
+            f"Используйте: {example}",
+            reply_markup=get_back_keyboard())
+        return
+
+    # Время - последнее слово, дата - все перед ним ("2 сентября", "завтра")
+    date_text = ' '.join(parts[:-1])
+    time_text = parts[-1]
+    if is_study:
+        conversations.set(user_id, STUDY_SUBJECT, date_text, time_text)
+        prompt = f"📚 Отлично! Дата: {date_text}, Время: {time_text}\n\nТеперь введите название предмета:"
+    else:
+        conversations.set(user_id, WORK_DESCRIPTION, date_text, time_text)
+        prompt = f"💼 Отлично! Дата: {date_text}, Время: {time_text}\n\nТеперь введите описание работы:"
+    await bot.reply_to(message, prompt, reply_markup=get_back_keyboard())
+
+
+@text_router.route(DATE_QUERY)
+async def on_date_query(message, user_id: int, state, text: str):
+    conversations.clear(user_id)
+    schedule_text = await schedule_manager.get_date_schedule(user_id, text)
+    await bot.reply_to(message, schedule_text, reply_markup=get_main_keyboard())
+
+
+# Экраны меню: callback_data -> (текст, клавиатура, новый шаг диалога)
+MENU_SCREENS = {
+    "add_menu": ("➕ Выберите тип события для добавления:", get_add_menu_keyboard, None),
+    "show_menu": ("📅 Выберите что показать:", get_show_menu_keyboard, None),
+    "add_study": (
+        "📚 Добавление учебного события\n\n"
+        "Введите дату и время в формате:\n"
+        "2 сентября 13:55-15:35\n"
+        "(дата также: завтра, в пятницу, 05.09)\n\n"
+        "Затем введите название предмета:",
+        get_back_keyboard, STUDY_DATETIME
+    ),
+    "add_work": (
+        "💼 Добавление рабочего события\n\n"
+        "Введите дату и время в формате:\n"
+        "2 сентября 14:00-15:00\n"
+        "(дата также: завтра, в пятницу, 05.09)\n\n"
+        "Затем введите описание работы:",
+        get_back_keyboard, WORK_DATETIME
+    ),
+    "ai_planner": (
+        "🤖 ИИ-планировщик для работы\n\n"
+        "Введите текущее количество коммуникаций:\n"
+        "Пример: 250\n\n"
+        "Бот автоматически рассчитает:\n"
+        "• Оставшиеся цели\n"
+        "• Оптимальное расписание\n"
+        "• Рекомендации",
+        get_back_keyboard, AI_PLAN
+    ),
+    "back_to_main": ("🏠 Главное меню\n\nВыберите действие:", get_main_keyboard, None),
+}
+
+# Отчеты: callback_data -> метод AsyncScheduleManager
+REPORTS = {
+    "show_week": AsyncScheduleManager.get_week_schedule,
+    "show_today": AsyncScheduleManager.get_today_schedule,
+    "smart_recommendations": AsyncScheduleManager.get_smart_recommendations,
+    "statistics": AsyncScheduleManager.analyze_schedule,
+}
+
+
+# Обработчик callback-запросов
+@bot.callback_query_handler(func=lambda call: True)
+async def process_callback(call):
+    """Обработчик нажатий на кнопки"""
+    await bot.answer_callback_query(call.id)
+    try:
+        routed = await callback_router.dispatch_async(call.data, call)
+    except Exception as e:
+        await report_failure(call.from_user.id, call.message.chat.id, e)
+        return
+    if not routed:
+        logger.warning(f"⚠️ Неизвестная кнопка от пользователя {call.from_user.id}: {call.data}")
+
+
+async def edit_screen(call, text: str, reply_markup):
+    """Заменяет сообщение с кнопками новым экраном"""
+    await bot.edit_message_text(
+        text,
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        reply_markup=reply_markup
+    )
+    logger.info(f"🔘 Пользователь {call.from_user.id}: {call.data}")
+
+
+@callback_router.route(*MENU_SCREENS)
+async def cb_menu_screen(call):
+    text, keyboard, step = MENU_SCREENS[call.data]
+    if step:
+        async with user_lock(call.from_user.id):
+            conversations.set(call.from_user.id, step)
+    await edit_screen(call, text, keyboard())
+
+
+@callback_router.route(*REPORTS)
+async def cb_report(call):
+    async with user_lock(call.from_user.id):
+        text = await REPORTS[call.data](schedule_manager, call.from_user.id)
+    await edit_screen(call, text, get_back_keyboard())
+
+
+@callback_router.route("show_date")
+async def cb_show_date(call, date_text: Optional[str] = None):
+    """show_date - спросить дату, show_date:YYYY-MM-DD - сразу показать расписание"""
+    user_id = call.from_user.id
+    if date_text:
+        # День выбран кнопкой - ввод даты текстом больше не ждем
+        async with user_lock(user_id):
+            conversations.clear(user_id)
+        text = await schedule_manager.get_date_schedule(user_id, date_text)
+        reply_markup = get_back_keyboard()
+    else:
+        async with user_lock(user_id):
+            conversations.set(user_id, DATE_QUERY)
+        text = "📅 Введите дату в формате:\n2 сентября (или: завтра, в пятницу, 05.09)\n\nИли выберите день:"
+        reply_markup = get_date_picker_keyboard(datetime.now().strftime('%Y-%m-%d'))
+    await edit_screen(call, text, reply_markup)
+
+
+# Фоновые задачи цикла событий
+def send_from_thread(chat_id: int, text: str):
+    """Отправка из потоков Broadcaster через цикл событий"""
+    return asyncio.run_coroutine_threadsafe(bot.send_message(chat_id, text), event_loop).result()
+
+
+# Broadcaster синхронный (пул потоков и token bucket), сами запросы
+# выполняются в цикле событий; event_loop задается в run()
+event_loop = None
+broadcaster = Broadcaster(
+    send_from_thread,
+    config.BROADCAST_CHECKPOINT_DIR,
+    workers=config.BROADCAST_WORKERS,
+    global_rate=config.BROADCAST_GLOBAL_RATE,
+    per_chat_rate=config.BROADCAST_PER_CHAT_RATE,
+    max_retries=config.BROADCAST_MAX_RETRIES,
+    max_chat_buckets=config.BROADCAST_CHAT_BUCKETS
+)
+
+
+# Напоминания по местному времени пользователей; задания выполняются в потоке
+# (Broadcaster), а ожидание ближайшего срабатывания - задача цикла событий
+reminder_scheduler = ReminderScheduler(schedule_manager.manager, broadcaster)
+
+
+async def run_scheduler():
+    """Спит до ближайшего срабатывания напоминаний или до появления более раннего"""
+    wakeup = asyncio.Event()
+    reminder_scheduler.add_wakeup_listener(lambda: event_loop.call_soon_threadsafe(wakeup.set))
+    await asyncio.to_thread(reminder_scheduler.load)
+
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), reminder_scheduler.seconds_until_next())
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        try:
+            await asyncio.to_thread(reminder_scheduler.run_due)
+        except Exception as e:
+            logger.error(f"❌ Ошибка в планировщике напоминаний: {e}")
+
+
+async def run_flusher():
+    """Сбрасывает накопленные записи раз в WRITE_FLUSH_INTERVAL_SECONDS
+    или сразу, как только какой-то из буферов набрал max_pending записей"""
+    interval = max(config.WRITE_FLUSH_INTERVAL_SECONDS, 0.1)
+    wakeup = asyncio.Event()
+    for writer in (schedule_manager.manager.writer, conversations.writer):
+        writer.add_wakeup_listener(lambda: event_loop.call_soon_threadsafe(wakeup.set))
+
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        try:
+            await schedule_manager.flush_pending()
+            await asyncio.to_thread(conversations.writer.flush)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сброса записей: {e}")
+
+
+async def run_timetable_refresh():
+    """Обновляет официальное расписание раз в UPDATE_INTERVAL_HOURS"""
+    while True:
+        try:
+            await asyncio.to_thread(timetable_parser.update_schedule)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления расписания: {e}")
+        await asyncio.sleep(config.UPDATE_INTERVAL_HOURS * 3600)
+
+
+async def home(request):
+    return web.json_response({"status": "Bot is running", "timestamp": datetime.now().isoformat()})
+
+
+async def metrics(request):
+    return web.json_response({
+        "storage_writes": schedule_manager.manager.writer.stats(),
+        "last_broadcast": broadcaster.last_stats,
+        "reminders": reminder_scheduler.stats(),
+        "conversations": conversations.stats(),
+        "user_stats": schedule_manager.manager.stats.info(),
+        "dates": schedule_manager.manager.dates.stats(),
+        "routes": {"text": text_router.stats(), "callbacks": callback_router.stats()},
+        "keyboards": keyboard_stats(),
+        "tasks": len(asyncio.all_tasks()),
+    })
+
+
+async def start_health_server() -> web.AppRunner:
+    """Health-эндпоинт для Render в том же цикле событий"""
+    app = web.Application()
+    app.router.add_get('/', home)
+    app.router.add_get('/metrics', metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', int(os.environ.get('PORT', 8080))).start()
+    logger.info("🌐 Health-эндпоинт запущен")
+    return runner
+
+
+async def run():
+    """Запускает все задачи и ждет сигнала завершения"""
+    global event_loop
+    stop_event = asyncio.Event()
+    loop = event_loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    runner = await start_health_server()
+    try:
+        await bot.delete_webhook()
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка очистки webhook: {e}")
+
+    tasks = [
+        asyncio.create_task(run_scheduler()),
+        asyncio.create_task(run_flusher()),
+        asyncio.create_task(run_timetable_refresh()),
+        asyncio.create_task(bot.infinity_polling(timeout=60)),
+    ]
+    logger.info("🚀 Бот запущен (asyncio)")
+
+    await stop_event.wait()
+    logger.info("📡 Получен сигнал, завершаем работу...")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    await schedule_manager.close()
+    await asyncio.to_thread(conversations.close)
+    logger.info(f"💾 Записи сохранены: {schedule_manager.manager.writer.stats()}")
+    await bot.close_session()
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,116 @@
+# Бенчмарк разбора дат из ввода пользователей
+#
+# Сравнивает прежний ScheduleManager.parse_date (словарь месяцев на каждый
+# вызов, только "2 сентября") с грамматикой date_parser без кэша и с
+# кэшем DateParser на потоке реалистичного ввода: даты словами и
+# сокращениями, "завтра", дни недели, 05.09, ключи YYYY-MM-DD от кнопок
+# и опечатки.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_date_parser.py [запросов]
+import os
+import sys
+import time
+import random
+from datetime import datetime, date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from date_parser import DateParser, parse_date, MONTHS
+
+GENITIVE = list(MONTHS)[:12]  # Полные названия идут в MONTHS первыми
+TODAY = date(2025, 12, 20)
+
+
+def build_inputs(count: int, seed: int = 1) -> list:
+    """Поток запросов: у пользователей в ходу одни и те же ближайшие даты"""
+    rnd = random.Random(seed)
+    inputs = []
+    for _ in range(count):
+        kind = rnd.random()
+        day = rnd.randint(1, 28)
+        if kind < 0.45:
+            inputs.append(f"{day} {rnd.choice(GENITIVE)}")
+        elif kind < 0.6:
+            inputs.append(rnd.choice(['сегодня', 'завтра', 'Завтра', 'послезавтра']))
+        elif kind < 0.7:
+            inputs.append(rnd.choice(['в понедельник', 'во вторник', 'в среду', 'в пятницу', 'пт']))
+        elif kind < 0.85:
+            inputs.append(f"{day:02d}.{rnd.randint(1, 12):02d}")
+        elif kind < 0.95:
+            inputs.append(f"2025-12-{day:02d}")  # Кнопки выбора дня
+        else:
+            inputs.append(rnd.choice(['2 сентебря', '31 февраля', 'на днях', '32.01']))
+    return inputs
+
+
+def legacy_parse_date(date_text: str) -> str:
+    """Прежняя реализация (без логирования)"""
+    try:
+        current_year = datetime.now().year
+        months = {
+            'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
+            'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
+            'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+        }
+        parts = date_text.strip().split()
+        if len(parts) >= 2:
+            day = int(parts[0])
+            if day < 1 or day > 31:
+                return date_text
+            month_name = parts[1].lower()
+            if month_name in months:
+                month = months[month_name]
+                if month == 2 and day > 29:
+                    return date_text
+                elif month in [4, 6, 9, 11] and day > 30:
+                    return date_text
+                return datetime(current_year, month, day).strftime('%Y-%m-%d')
+        return date_text
+    except Exception:
+        return date_text
+
+
+def best_of(func, repeats: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    inputs = build_inputs(count)
+    parser = DateParser(clock=lambda: TODAY)
+
+    def run_legacy():
+        for text in inputs:
+            legacy_parse_date(text)
+
+    def run_grammar():
+        for text in inputs:
+            parse_date(text, TODAY)
+
+    def run_cached():
+        for text in inputs:
+            parser.parse(text)
+
+    legacy = best_of(run_legacy)
+    grammar = best_of(run_grammar)
+    cached = best_of(run_cached)
+
+    recognized_legacy = sum(legacy_parse_date(text) != text for text in inputs)
+    recognized = sum(parse_date(text, TODAY) is not None for text in inputs)
+
+    print(f"Запросов: {count}, различных: {len(set(inputs))}")
+    print(f"Прежний parse_date: {count / legacy:,.0f} в секунду, распознано {recognized_legacy}")
+    print(f"Грамматика без кэша: {count / grammar:,.0f} в секунду, распознано {recognized}")
+    print(f"DateParser с кэшем: {count / cached:,.0f} в секунду ({parser.stats()})")
+    # Прежний parse_date всегда подставлял текущий год (2025-01-05)
+    print(f"'5 января', введенное {TODAY}: {parse_date('5 января', TODAY)}")
+
+
+if __name__ == '__main__':
+    main()
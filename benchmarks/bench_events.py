@@ -0,0 +1,128 @@
+# Бенчмарк модели событий
+#
+# Сравнивает события-словари (как они лежали в памяти раньше) с Event:
+# память на событие после загрузки JSON, сортировку дня, построение
+# занятого времени и текст расписания. Проверяет, что JSON -> Event -> JSON
+# не теряет данных, в том числе на нестандартных записях.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_events.py [событий]
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import Event
+from free_slots import to_minutes, format_minutes, MINUTES_PER_DAY
+
+LESSON_TIMES = ['08:30-10:05', '10:15-11:50', '12:00-13:35', '13:55-15:30', '15:40-17:15']
+ACTIVITIES = ['Математика', 'Физика', 'Смена в колл-центре', 'Встреча', 'Английский']
+
+# Записи, которые должны пережить перевод без потерь
+ODD_EVENTS = [
+    {'id': 'a1', 'time': '9:00 - 10:30', 'activity': 'Пара', 'type': 'study', 'added_at': '2025-10-01T08:00:00'},
+    {'id': 'a2', 'time': '23:00-01:00', 'activity': 'Ночная смена', 'type': 'work', 'added_at': '2025-10-01T08:00:00.123456'},
+    {'id': 'a3', 'time': 'весь день', 'activity': 'Поход', 'type': 'trip', 'added_at': '2025-10-01T08:00:00+03:00'},
+    {'id': 'a4', 'time': '10:00-11:00', 'activity': 'Без типа'},
+    {'id': 'a5', 'time': '10:00-11:00', 'activity': 'Лишний ключ', 'type': 'general', 'added_at': '', 'note': 'x'},
+]
+
+
+def build_json(events: int, seed: int = 1) -> str:
+    """Снапшот одного пользователя: {user_id: {date: [events]}}"""
+    rnd = random.Random(seed)
+    added = datetime(2025, 9, 1)
+    dates = {}
+    for i in range(events):
+        date_key = f"2025-{rnd.randrange(9, 13)}-{rnd.randrange(1, 29):02d}"
+        added += timedelta(seconds=rnd.randrange(1, 3600), microseconds=rnd.randrange(1000000))
+        dates.setdefault(date_key, []).append({
+            'id': f"{i:08x}",
+            'time': rnd.choice(LESSON_TIMES),
+            'activity': rnd.choice(ACTIVITIES),
+            'type': rnd.choice(('study', 'work', 'general')),
+            'added_at': added.isoformat()
+        })
+    return json.dumps({'1': dates}, ensure_ascii=False)
+
+
+def measure(load) -> tuple:
+    """(результат, байт памяти) для load()"""
+    tracemalloc.start()
+    result = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def best_of(func, repeats: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def render_dicts(days: dict):
+    for events in days.values():
+        events.sort(key=lambda x: x['time'])
+        for event in events:
+            emoji = "📚" if event['type'] == 'study' else "💼" if event['type'] == 'work' else "📝"
+            f"{emoji} {event['time']} - {event['activity']}"
+            start_text, end_text = event['time'].split('-')
+            start, end = to_minutes(start_text), to_minutes(end_text)
+            if end <= start:
+                end = MINUTES_PER_DAY
+
+
+def render_events(days: dict):
+    for events in days.values():
+        events.sort(key=Event.sort_key)
+        for event in events:
+            f"{event.type.emoji} {event.time} - {event.activity}"
+            event.busy_range()
+
+
+def check_roundtrip(raw: dict) -> int:
+    """Число событий, которые после JSON -> Event -> JSON отличаются от исходных"""
+    mismatches = 0
+    for date_key, events in raw.items():
+        for data in events:
+            if Event.from_dict(date_key, data).to_dict() != data:
+                mismatches += 1
+    for data in ODD_EVENTS:
+        event = Event.from_dict('не дата', data)
+        if event.to_dict() != data or json.dumps(event.to_dict()) != json.dumps(data):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    text = build_json(count)
+
+    dicts, dict_bytes = measure(lambda: json.loads(text)['1'])
+    events, event_bytes = measure(lambda: {
+        date_key: [Event.from_dict(date_key, data) for data in day]
+        for date_key, day in json.loads(text)['1'].items()
+    })
+
+    print(f"Событий: {count}")
+    print(f"Память: словари {dict_bytes / count:.0f} Б/событие, Event {event_bytes / count:.0f} Б/событие")
+    print(f"Загрузка JSON: словари {best_of(lambda: json.loads(text), 3) * 1000:.0f} мс, "
+          f"Event {best_of(lambda: [Event.from_dict(k, d) for k, day in json.loads(text)['1'].items() for d in day], 3) * 1000:.0f} мс")
+    print(f"Сортировка + текст + занятое время: словари {best_of(lambda: render_dicts(dicts)) * 1000:.1f} мс, "
+          f"Event {best_of(lambda: render_events(events)) * 1000:.1f} мс")
+    sample = format_minutes(events[next(iter(events))][0].start)
+    print(f"Первое событие начинается в {sample}")
+    print(f"Потери при JSON -> Event -> JSON: {check_roundtrip(dicts)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Бенчмарк разбора текста расписания
+#
+# Сравнивает классификатор строк (одна альтернация) с прежней схемой
+# "до трех re.search на строку" и меряет полный parse_schedule в обычном
+# и в отладочном режиме.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_parser.py [дней]
+import os
+import re
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_parser import ScheduleParser, classify_line
+
+SUBJECTS = ['Математика', 'Физика', 'История', 'Химия', 'Биология', 'Философия']
+INSTRUCTORS = ['Иванов И.И.', 'Петров П.П.', 'Сидорова А.В.', 'Кузнецов Д.С.']
+AUDITORIUMS = ['101 Советская', '205 Полесская', '12 Ломоносова', 'Спортивный зал']
+LESSON_TIMES = ['08-30', '10-15', '12-00', '13-55', '15-40', '17-25']
+
+
+def build_text(days: int) -> str:
+    """Синтетический текст расписания двух групп на days дней"""
+    lines = ['301 Ф 302 Ф']
+    for day in range(days):
+        lines.append(f"{day % 28 + 1:02d}.{day // 28 % 12 + 1:02d}.2025")
+        for slot, lesson_time in enumerate(LESSON_TIMES):
+            left = SUBJECTS[(day + slot) % len(SUBJECTS)]
+            right = SUBJECTS[(day + slot + 3) % len(SUBJECTS)]
+            room = AUDITORIUMS[slot % len(AUDITORIUMS)]
+            lines.append(f"{lesson_time} 301 Ф {left} {room} 302 Ф {right} {room}")
+            lines.append(INSTRUCTORS[(day + slot) % len(INSTRUCTORS)])
+            lines.append(f"Аудит. {room}")
+            lines.append(f"{lesson_time[:2]}:{lesson_time[3:]} - {int(lesson_time[:2]) + 1:02d}:{lesson_time[3:]}")
+    return '\n'.join(lines)
+
+
+def legacy_classify(line: str) -> tuple:
+    """Прежняя схема: до трех re.search со строковыми шаблонами на строку"""
+    date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', line)
+    if date_match:
+        return 'date', date_match
+    lesson_time_match = re.search(r'(\d{2})-(\d{2})', line)
+    if lesson_time_match:
+        return 'lesson_time', lesson_time_match
+    main_time_match = re.search(r'(\d{2}):(\d{2})\s*-\s*(\d{2}):(\d{2})', line)
+    if main_time_match:
+        return 'main_time', main_time_match
+    return None, None
+
+
+def best_of(func, repeats: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    text = build_text(days)
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    print(f"Текст: {days} дней, {len(lines)} строк, {len(text)} символов")
+
+    # Классификации совпадают на всех строках реального вида
+    mismatches = [line for line in lines if legacy_classify(line)[0] != classify_line(line)[0]]
+    print(f"Расхождений классификации: {len(mismatches)}")
+
+    legacy_time = best_of(lambda: [legacy_classify(line) for line in lines])
+    new_time = best_of(lambda: [classify_line(line) for line in lines])
+    print(f"Классификация, 3 x re.search: {len(lines) / legacy_time:12,.0f} строк/с")
+    print(f"Классификация, одна альтернация: {len(lines) / new_time:9,.0f} строк/с (x{legacy_time / new_time:.2f})")
+
+    # Полный разбор: логирование включено на уровне INFO (как в продакшене),
+    # вывод уходит в /dev/null, чтобы мерить форматирование, а не терминал
+    devnull = open(os.devnull, 'w')
+    logging.basicConfig(level=logging.INFO, stream=devnull)
+    parser = ScheduleParser('')
+    parse_time = best_of(lambda: parser.parse_schedule(text, '302 Ф', ['301 Ф']), repeats=3)
+    print(f"parse_schedule: {parse_time * 1000:.1f} мс, {len(lines) / parse_time:,.0f} строк/с")
+
+    debug_parser = ScheduleParser('', debug=True)
+    debug_time = best_of(lambda: debug_parser.parse_schedule(text, '302 Ф', ['301 Ф']), repeats=3)
+    print(f"parse_schedule (debug): {debug_time * 1000:.1f} мс, {len(lines) / debug_time:,.0f} строк/с")
+    devnull.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Бенчмарк извлечения текста из PDF: последовательно vs пул процессов
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_pdf_extract.py [страниц] [процессов]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_parser import ScheduleParser
+
+
+def build_pdf(pages: int, lines_per_page: int = 60) -> bytes:
+    """Собирает синтетический многостраничный PDF с текстом (Helvetica)"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages заполняется после страниц
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for page_num in range(pages):
+        lines = [b"BT /F1 9 Tf 30 800 Td 11 TL"]
+        for line_num in range(lines_per_page):
+            text = f"{line_num % 12 + 8:02d}-30 Group {page_num % 4 + 301} F Subject {line_num} room {line_num * 7} Ivanov I.I."
+            lines.append(f"({text}) '".encode('latin-1'))
+        lines.append(b"ET")
+        stream = b"\n".join(lines)
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_id, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def measure(parser: ScheduleParser, pdf_content: bytes, repeats: int = 3) -> tuple:
+    """Лучшее время из repeats прогонов и результат последнего"""
+    best = float('inf')
+    pages_text = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        pages_text = parser.extract_pages_text(pdf_content)
+        best = min(best, time.perf_counter() - started)
+    return best, pages_text
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 2)
+
+    pdf_content = build_pdf(pages)
+    print(f"PDF: {pages} страниц, {len(pdf_content)} байт, процессов: {workers}")
+
+    serial = ScheduleParser('', extract_workers=0)
+    parallel = ScheduleParser('', extract_workers=workers, parallel_min_pages=1)
+
+    serial_time, serial_text = measure(serial, pdf_content)
+    parallel_time, parallel_text = measure(parallel, pdf_content)
+
+    assert serial_text == parallel_text, "Параллельное извлечение изменило текст или порядок страниц"
+
+    print(f"Последовательно: {serial_time * 1000:8.1f} мс ({pages / serial_time:.0f} стр/с)")
+    print(f"Пул процессов:   {parallel_time * 1000:8.1f} мс ({pages / parallel_time:.0f} стр/с)")
+    print(f"Ускорение: x{serial_time / parallel_time:.2f}")
+
+
+if __name__ == '__main__':
+    main()
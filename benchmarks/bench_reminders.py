@@ -0,0 +1,173 @@
+# Бенчмарк напоминаний перед событиями
+#
+# Меряет, сколько стоит смена настроек пользователя с событиями на
+# ближайшие дни (задания перекладываются в кучу заново), и проверяет, что
+# после смены интервала, а затем часового пояса на каждое событие остается
+# ровно одно напоминание - с новыми настройками.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_reminders.py [событий в день]
+import os
+import sys
+import time
+import heapq
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from events import Event
+from reminders import BEFORE, EVENT_HORIZON_DAYS, ReminderScheduler
+
+USER_ID = 1
+
+
+class MemoryStorage:
+    """Расписания в памяти: {user_id: {date: [events]}}"""
+
+    def __init__(self, schedules: dict):
+        self.schedules = schedules
+
+    def get_users_for_date(self, date_key: str) -> list:
+        return [user_id for user_id, dates in self.schedules.items() if dates.get(date_key)]
+
+    def get_events(self, user_id: int, date_key: str) -> list:
+        return list(self.schedules.get(user_id, {}).get(date_key, []))
+
+    def get_all_user_settings(self) -> dict:
+        return {}
+
+
+class MemoryManager:
+    """То, что планировщику нужно от ScheduleManager"""
+
+    def __init__(self, storage: MemoryStorage):
+        self.storage = storage
+        self.settings = {}
+        self._settings_listeners = []
+
+    def add_event_listener(self, callback):
+        pass
+
+    def add_settings_listener(self, callback):
+        self._settings_listeners.append(callback)
+
+    def get_user_settings(self, user_id: int) -> dict:
+        settings = {
+            'timezone': config.DEFAULT_TIMEZONE,
+            'reminder_time': config.DAILY_REMINDER_TIME,
+            'remind_before': config.REMIND_BEFORE_MINUTES
+        }
+        settings.update(self.settings.get(user_id, {}))
+        return settings
+
+    def update(self, user_id: int, **changes):
+        self.settings.setdefault(user_id, {}).update(changes)
+        for callback in self._settings_listeners:
+            callback(user_id, self.get_user_settings(user_id))
+
+    def get_day_reminders(self, date_key: str, user_ids) -> dict:
+        return {}
+
+
+class NullBroadcaster:
+    def unfinished_runs(self) -> list:
+        return []
+
+    def run(self, run_id: str, messages: dict) -> dict:
+        return {'sent': 0}
+
+
+def build_schedules(per_day: int) -> dict:
+    """События пользователя на завтра и послезавтра (по UTC) - в пределах горизонта"""
+    today = datetime.now(timezone.utc).date()
+    dates = {}
+    for offset in range(1, EVENT_HORIZON_DAYS + 1):
+        date_key = (today + timedelta(days=offset)).isoformat()
+        dates[date_key] = [
+            Event.from_dict(date_key, {
+                'id': f"{offset}-{i}",
+                'time': f"{8 + i * 14 // per_day:02d}:{i * 14 * 60 // per_day % 60:02d}-23:00",
+                'activity': f"Событие {i}",
+                'type': 'general'
+            })
+            for i in range(per_day)
+        ]
+    return {USER_ID: dates}
+
+
+def best_of(func, repeats: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def live_reminders(scheduler: ReminderScheduler) -> dict:
+    """Напоминания, которые реально уйдут: timestamp -> число текстов"""
+    heap = list(scheduler._heap)
+    scheduled = set(scheduler._scheduled)  # _collect_before снимает отметки - вернем их
+    messages = {}
+    while heap:
+        timestamp, _, kind, payload = heapq.heappop(heap)
+        if kind == BEFORE:
+            scheduler._collect_before(timestamp, payload, messages)
+    scheduler._scheduled = scheduled
+    return {timestamp: len(texts[USER_ID]) for timestamp, texts in messages.items()}
+
+
+def expected_reminders(schedules: dict, before: int, tz_name: str) -> dict:
+    expected = {}
+    for events in schedules[USER_ID].values():
+        for event in events:
+            start = datetime.fromordinal(event.day) + timedelta(minutes=event.start)
+            timestamp = (start.replace(tzinfo=ZoneInfo(tz_name)) - timedelta(minutes=before)).timestamp()
+            expected[timestamp] = expected.get(timestamp, 0) + 1
+    return expected
+
+
+def check_settings_changes(schedules: dict) -> int:
+    """Число расхождений после смены интервала, а затем часового пояса"""
+    manager = MemoryManager(MemoryStorage(schedules))
+    manager.settings[USER_ID] = {'remind_before': 15, 'timezone': 'Europe/Moscow'}
+    scheduler = ReminderScheduler(manager, NullBroadcaster())
+    scheduler.load()
+
+    mismatches = 0
+    steps = [
+        {},
+        {'remind_before': 30},
+        {'timezone': 'Asia/Vladivostok'},
+        {'timezone': 'Europe/Moscow'},
+    ]
+    for changes in steps:
+        if changes:
+            manager.update(USER_ID, **changes)
+        settings = manager.get_user_settings(USER_ID)
+        if live_reminders(scheduler) != expected_reminders(schedules, settings['remind_before'], settings['timezone']):
+            mismatches += 1
+    scheduler.stop()
+    return mismatches
+
+
+def main():
+    per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    schedules = build_schedules(per_day)
+
+    manager = MemoryManager(MemoryStorage(schedules))
+    scheduler = ReminderScheduler(manager, NullBroadcaster())
+    scheduler.load()
+    intervals = iter(range(1, 10 ** 6))
+    elapsed = best_of(lambda: manager.update(USER_ID, remind_before=next(intervals)))
+    scheduler.stop()
+
+    print(f"Событий: {per_day} в день на {EVENT_HORIZON_DAYS} дн.")
+    print(f"Смена настроек: {elapsed * 1000:.1f} мс, заданий в куче: {len(scheduler._heap)}")
+    print(f"Расхождений после смены интервала и часового пояса: {check_settings_changes(schedules)} из 4")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# Бенчмарк планировщика смен
+#
+# Меряет полный путь ИИ-планировщика (индекс занятого времени, свободные
+# окна, выбор смен) на пользователе с сотнями событий и сверяет число смен
+# с полным перебором на небольших случайных примерах.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_shift_planner.py [событий] [дней]
+import os
+import sys
+import time
+import random
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from events import Event
+from free_slots import BusyIndex, to_minutes, format_minutes
+from shift_planner import plan_shifts, split_window
+
+BUDGET_MS = config.WORK_PLAN_BUDGET_MS
+
+
+def build_schedules(events: int, days: int, seed: int = 1) -> dict:
+    """Случайные пары (по сетке звонков) и события: {date -> [events]}"""
+    rnd = random.Random(seed)
+    lessons = ('08:30-10:05', '10:15-11:50', '12:00-13:35', '13:55-15:30', '15:40-17:15')
+    schedules = {}
+    for i in range(events):
+        date_key = f"2025-10-{rnd.randrange(days) + 1:02d}"
+        if rnd.random() < 0.8:
+            time_text = rnd.choice(lessons)
+        else:
+            start = rnd.randrange(9 * 60, 21 * 60, 15)
+            time_text = f"{format_minutes(start)}-{format_minutes(min(start + 60, 1439))}"
+        schedules.setdefault(date_key, []).append(Event.from_dict(date_key, {
+            'id': str(i), 'time': time_text, 'activity': 'Пара', 'type': 'study'
+        }))
+    return schedules
+
+
+def plan(schedules: dict, days: int, needed_minutes: int):
+    """Путь auto_plan_work_shift без хранилища"""
+    busy = BusyIndex.from_schedules(schedules)
+    date_keys = [f"2025-10-{day + 1:02d}" for day in range(days)]
+    windows = {}
+    for date_key, start, end in busy.free_windows(
+            date_keys, to_minutes(config.WORK_DAY_START), to_minutes(config.WORK_DAY_END),
+            config.WORK_MIN_SHIFT_HOURS * 60, config.WORK_SLOT_GRANULARITY_MINUTES):
+        windows.setdefault(date_key, []).append((start, end))
+    return plan_shifts(
+        windows, needed_minutes,
+        min_shift=config.WORK_MIN_SHIFT_HOURS * 60,
+        max_shift=config.WORK_SHIFT_HOURS * 60,
+        day_cap=config.WORK_MAX_HOURS_PER_DAY * 60,
+        break_minutes=config.WORK_BREAK_MINUTES,
+        granularity=config.WORK_SLOT_GRANULARITY_MINUTES,
+        budget_ms=BUDGET_MS
+    )
+
+
+def brute_force_count(windows: dict, needed: int, min_shift: int, max_shift: int, day_cap: int,
+                      break_minutes: int, granularity: int):
+    """Минимальное число смен полным перебором (None - цель недостижима)"""
+    chunks = [
+        (date_key, length)
+        for date_key, day_windows in windows.items()
+        for start, end in day_windows
+        for _, length in split_window(start, end, max_shift, min_shift, break_minutes, granularity)
+    ]
+    for k in range(1, len(chunks) + 1):
+        for subset in combinations(chunks, k):
+            per_day = {}
+            for date_key, length in subset:
+                count, minutes = per_day.get(date_key, (0, 0))
+                per_day[date_key] = (count + 1, minutes + length)
+            # k смен дня можно укоротить до любой суммы от k * min_shift
+            cap = day_cap // granularity * granularity
+            if any(count * min_shift > cap for count, _ in per_day.values()):
+                continue
+            if sum(min(cap, minutes) for _, minutes in per_day.values()) >= needed:
+                return k
+    return None
+
+
+def check_optimality(cases: int = 300) -> int:
+    """Сверяет число смен с перебором, возвращает число расхождений"""
+    rnd = random.Random(7)
+    mismatches = 0
+    for _ in range(cases):
+        windows = {}
+        for day in range(rnd.randint(1, 4)):
+            cursor = 9 * 60
+            day_windows = []
+            while cursor < 20 * 60:
+                length = rnd.choice((60, 120, 180, 240, 300, 480))
+                day_windows.append((cursor, min(cursor + length, 21 * 60)))
+                cursor += length + rnd.choice((60, 90, 120))
+            windows[f"2025-10-{day + 1:02d}"] = day_windows
+        needed = rnd.randrange(60, 20 * 60, 60)
+        params = dict(min_shift=120, max_shift=240, day_cap=rnd.choice((240, 360, 480)),
+                      break_minutes=60, granularity=60)
+        result = plan_shifts(windows, needed, **params)
+        expected = brute_force_count(windows, needed, **params)
+        got = len(result.shifts) if result.complete else None
+        if got != expected:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    schedules = build_schedules(events, days)
+    # Цель на месяц: 1000 коммуникаций
+    needed = -(-1000 * 60 // config.COMMUNICATIONS_PER_HOUR)
+    needed = -(-needed // config.WORK_SLOT_GRANULARITY_MINUTES) * config.WORK_SLOT_GRANULARITY_MINUTES
+
+    latencies = []
+    for _ in range(200):
+        started = time.perf_counter()
+        result = plan(schedules, days, needed)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    print(f"Событий: {events} на {days} дней, цель: {needed / 60:g} ч")
+    print(f"Смен: {len(result.shifts)}, часов: {result.minutes / 60:g}, цель набрана: {result.complete}, "
+          f"бюджет превышен: {result.timed_out}")
+    print(f"Время плана: p50 {latencies[len(latencies) // 2]:.2f} мс, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} мс, max {latencies[-1]:.2f} мс (бюджет {BUDGET_MS} мс)")
+    print(f"Расхождений с перебором: {check_optimality()} из 300")
+
+
+if __name__ == '__main__':
+    main()
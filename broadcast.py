@@ -0,0 +1,282 @@
+# Рассылка сообщений многим пользователям с учетом лимитов Telegram
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых повторять отправку бессмысленно
+# (бот заблокирован, чат не найден, некорректный запрос)
+PERMANENT_ERRORS = (400, 403)
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate токенов в секунду, запас не больше capacity
+
+    capacity = 1 - равномерный темп без всплесков (безопасно для лимитов Telegram).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Ждет токен, возвращает время ожидания в секундах"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов (ответ 429 с retry_after)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class BroadcastCheckpoint:
+    """Журнал рассылки: переживает падение процесса посреди рассылки
+
+    Перед отправкой в журнал пишется намерение ("sending"), после - результат.
+    Чаты с намерением без результата при возобновлении не отправляются
+    повторно: лучше не доставить одно напоминание, чем прислать его дважды.
+    Журнал ведет одну рассылку (run_id в первой строке): у параллельных
+    рассылок разные файлы, см. Broadcaster.checkpoint_for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def unfinished_run(self) -> Optional[str]:
+        """run_id незавершенной рассылки или None"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.loads(f.readline()).get('run_id')
+        except (OSError, ValueError):
+            return None
+
+    def open(self, run_id: str) -> Dict[int, str]:
+        """Начинает или продолжает рассылку, возвращает chat_id -> последний статус
+
+        Журнал другой рассылки в этом файле перезаписывается.
+        """
+        statuses = {}
+        if self.unfinished_run() == run_id:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                next(f)
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Оборванная последняя строка
+                    statuses[record['chat_id']] = record['status']
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write({'run_id': run_id})
+        return statuses
+
+    def record(self, chat_id: int, status: str):
+        self._write({'chat_id': chat_id, 'status': status})
+
+    def _write(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def finish(self):
+        """Рассылка завершена - журнал больше не нужен"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        """Закрывает журнал, оставляя его для возобновления"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class Broadcaster:
+    """Параллельная рассылка с общим и поканальным ограничением скорости
+
+    send(chat_id, text) - функция отправки (например, bot.send_message).
+    Общий лимит global_rate сообщений в секунду (Telegram - около 30),
+    для одного чата - per_chat_rate. Оба лимита живут дольше одной
+    рассылки: параллельные и идущие подряд рассылки делят общий bucket, а
+    bucket чата помнится для max_chat_buckets последних чатов (давно
+    молчавший чат вытесняется - его bucket все равно полон). Ответ 429
+    приостанавливает все рассылки на retry_after секунд, сетевые ошибки
+    и 5xx повторяются с экспоненциальной задержкой, 400/403 считаются
+    окончательными. Журнал для возобновления у каждой рассылки свой -
+    файл в checkpoint_dir.
+    """
+
+    def __init__(self, send: Callable, checkpoint_dir: str, workers: int = 8,
+                 global_rate: float = 25.0, per_chat_rate: float = 1.0, max_retries: int = 3,
+                 max_chat_buckets: int = 10000):
+        self.send = send
+        self.checkpoint_dir = checkpoint_dir
+        self.workers = max(1, workers)
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self.max_chat_buckets = max(1, max_chat_buckets)
+        self.last_stats = {}
+
+        self._bucket = TokenBucket(global_rate)
+        self._chat_buckets = OrderedDict()  # chat_id -> TokenBucket, недавно писавшие в конце
+        self._buckets_lock = threading.Lock()
+
+    def checkpoint_for(self, run_id: str) -> BroadcastCheckpoint:
+        """Журнал рассылки: файл по run_id в checkpoint_dir"""
+        file_name = re.sub(r'[^\w.-]', '_', run_id) + '.jsonl'
+        return BroadcastCheckpoint(os.path.join(self.checkpoint_dir, file_name))
+
+    def unfinished_runs(self) -> List[str]:
+        """run_id рассылок, прерванных до завершения"""
+        try:
+            names = sorted(os.listdir(self.checkpoint_dir))
+        except OSError:
+            return []
+        runs = []
+        for name in names:
+            if name.endswith('.jsonl'):
+                run_id = BroadcastCheckpoint(os.path.join(self.checkpoint_dir, name)).unfinished_run()
+                if run_id:
+                    runs.append(run_id)
+        return runs
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate)
+                if len(self._chat_buckets) > self.max_chat_buckets:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    def run(self, run_id: str, messages: Dict[int, Union[str, List[str]]]) -> Dict:
+        """Рассылает messages (chat_id -> текст или части), возвращает статистику"""
+        started = time.perf_counter()
+        bucket = self._bucket
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        checkpoint = self.checkpoint_for(run_id)
+        statuses = checkpoint.open(run_id)
+        stats = {
+            'run_id': run_id, 'total': len(messages), 'sent': 0, 'failed': 0,
+            'skipped': 0, 'uncertain': 0, 'retries': 0, 'rate_limited': 0
+        }
+        stats_lock = threading.Lock()
+
+        def count(key: str, value: int = 1):
+            with stats_lock:
+                stats[key] += value
+
+        pending = []
+        for chat_id, text in messages.items():
+            status = statuses.get(chat_id)
+            if status in ('sent', 'failed'):
+                count('skipped')
+            elif status == 'sending':
+                # Упали во время отправки - не знаем, дошло ли сообщение
+                count('uncertain')
+            else:
+                pending.append((chat_id, [text] if isinstance(text, str) else text))
+
+        if statuses:
+            logger.info(f"📨 Возобновляю рассылку {run_id}: осталось {len(pending)} из {len(messages)}")
+
+        def deliver(job):
+            chat_id, parts = job
+            chat_bucket = self._chat_bucket(chat_id)
+            checkpoint.record(chat_id, 'sending')
+            ok = True
+            for part in parts:
+                chat_bucket.acquire()
+                if not self._send_with_retry(chat_id, part, bucket, count):
+                    ok = False
+                    break
+            checkpoint.record(chat_id, 'sent' if ok else 'failed')
+            count('sent' if ok else 'failed')
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='broadcast') as executor:
+                list(executor.map(deliver, pending))
+        except BaseException:
+            checkpoint.close()
+            raise
+
+        checkpoint.finish()
+
+        duration = time.perf_counter() - started
+        stats['duration_s'] = round(duration, 2)
+        stats['throughput_per_s'] = round(stats['sent'] / duration, 1) if duration else 0
+        self.last_stats = stats
+        logger.info(
+            f"📨 Рассылка {run_id}: отправлено {stats['sent']}, ошибок {stats['failed']}, "
+            f"пропущено {stats['skipped']}, 429: {stats['rate_limited']}, "
+            f"{stats['throughput_per_s']} сообщ/с за {stats['duration_s']} с"
+        )
+        return stats
+
+    def _send_with_retry(self, chat_id: int, text: str, bucket: TokenBucket, count: Callable) -> bool:
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                self.send(chat_id, text)
+                return True
+            except Exception as e:
+                error_code = getattr(e, 'error_code', None)
+                if error_code in PERMANENT_ERRORS:
+                    logger.warning(f"⚠️ Сообщение пользователю {chat_id} не доставлено: {e}")
+                    return False
+                if attempt == self.max_retries:
+                    logger.error(f"❌ Ошибка отправки пользователю {chat_id} после {attempt + 1} попыток: {e}")
+                    return False
+
+                count('retries')
+                if error_code == 429:
+                    count('rate_limited')
+                    retry_after = (getattr(e, 'result_json', None) or {}).get('parameters', {}).get('retry_after', 1)
+                    bucket.pause(retry_after)
+                    logger.warning(f"⚠️ Лимит Telegram, пауза рассылки {retry_after} с")
+                else:
+                    time.sleep(2 ** attempt)
+        return False
@@ -8,14 +8,73 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', '8380069376:AAEB7UesvgxymReqmnQTIvIMNABB5_6N_
 GOOGLE_DRIVE_URL = "https://drive.google.com/file/d/152JZ6IMxa07Z1oIjzv7NLhm1LhQUynzP/view?usp=sharing"
 
 # Настройки группы
-DEFAULT_GROUP = "302Ф"
+DEFAULT_GROUP = "302Ф"  # Группа по умолчанию (из PDF разбираются все найденные группы)
 
 # Настройки обновления
 UPDATE_INTERVAL_HOURS = 1  # Обновлять расписание каждый час
+PDF_CACHE_DIR = ".pdf_cache"  # Кэш PDF и заголовков ETag/Last-Modified для условных запросов
+PDF_EXTRACT_WORKERS = 0  # Процессов для извлечения текста из PDF (0 или 1 - последовательно)
+PDF_PARALLEL_MIN_PAGES = 8  # PDF с меньшим числом страниц всегда извлекаются последовательно
+
+# Режим получения обновлений
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # polling - long polling, webhook - Telegram присылает обновления во Flask
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', os.getenv('RENDER_EXTERNAL_URL'))  # Публичный адрес сервиса (на Render задается автоматически)
+WEBHOOK_PATH = "/webhook"  # Путь, на который Telegram отправляет обновления
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Секрет заголовка X-Telegram-Bot-Api-Secret-Token (по умолчанию выводится из токена)
+WEBHOOK_QUEUE_SIZE = 1000  # Очередь обновлений; при переполнении Telegram получит 503 и повторит доставку
+HANDLER_WORKERS = 4  # Потоков для обработчиков (обновления одного пользователя - строго по очереди)
+HANDLER_QUEUE_SIZE = 100  # Ожидающих задач на поток; при переполнении прием обновлений притормаживает
+ASYNC_IO_WORKERS = 4  # asyncio-режим (async_main.py): потоков для операций с хранилищем
 
 # Настройки логирования
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+PARSER_DEBUG = False  # Подробный лог разбора PDF (логгер schedule_parser.debug)
+PARSER_TRACE_FILE = None  # JSONL-трассировка решений парсера при PARSER_DEBUG, например "parser_trace.jsonl"
 
 # Настройки сообщений
 MAX_MESSAGE_LENGTH = 4096  # Максимальная длина сообщения в Telegram
+
+# Настройки хранения расписаний
+STORAGE_BACKEND = "journal"  # journal - JSON-снапшот + журнал, sqlite - локальная база SQLite
+SQLITE_PATH = "schedules.db"  # База для STORAGE_BACKEND = "sqlite" (при первом запуске импортирует SCHEDULES_FILE)
+SCHEDULES_FILE = "schedules.json"  # Снапшот (журнал пишется рядом: schedules.json.journal)
+JOURNAL_COMPACT_THRESHOLD = 500  # Сворачивать журнал в снапшот каждые N записей
+STATS_MAX_USERS = 10000  # Счетчиков статистики в памяти - давно не смотревшие вытесняются
+WRITE_FLUSH_INTERVAL_SECONDS = 2.0  # Сброс записей на диск не реже раза в N секунд (0 - сразу)
+WRITE_FLUSH_MAX_PENDING = 100  # ...или сразу после N несохраненных записей
+# Максимальная потеря при аварийном падении: записи за WRITE_FLUSH_INTERVAL_SECONDS (не больше WRITE_FLUSH_MAX_PENDING)
+
+# Настройки диалогов (состояния ввода пользователей)
+CONVERSATION_TTL_MINUTES = 30  # Брошенный диалог забывается через N минут
+CONVERSATION_MAX_USERS = 10000  # Больше диалогов в памяти не держим - вытесняются давно неактивные
+CONVERSATIONS_FILE = "conversations.json"  # Снапшот диалогов для перезапуска, журнал рядом (None - только в памяти)
+
+# Настройки разбора дат ("2 сентября", "завтра", "05.09")
+DATE_CACHE_SIZE = 1024  # Разобранных выражений в LRU-кэше (сбрасывается в полночь)
+DATE_YEAR_WINDOW_DAYS = 60  # Дата без года - в текущем году, если соседний год не ближе N дней (в декабре "5 января" - следующий год)
+
+# Настройки ИИ-планировщика смен
+WORK_SHIFT_HOURS = 4  # Максимальная длительность одной рабочей смены
+WORK_MIN_SHIFT_HOURS = 2  # Смены короче не планируются
+WORK_MAX_HOURS_PER_DAY = 8  # Лимит рабочих часов в день
+WORK_BREAK_MINUTES = 60  # Перерыв между сменами в одном свободном окне
+WORK_DAY_START = "09:00"  # Смены планируются не раньше...
+WORK_DAY_END = "21:00"  # ...и заканчиваются не позже
+WORK_SLOT_GRANULARITY_MINUTES = 60  # Начало и длительность смены кратны N минутам
+WORK_PLAN_DAYS = 7  # На сколько дней вперед планировать, если период цели не задан
+WORK_PLAN_BUDGET_MS = 50  # Бюджет времени на построение плана смен
+COMMUNICATIONS_PER_HOUR = 13  # Ожидаемые коммуникации за час смены
+
+# Настройки рассылки напоминаний
+BROADCAST_WORKERS = 8  # Параллельных отправок
+BROADCAST_GLOBAL_RATE = 25  # Сообщений в секунду на всего бота (лимит Telegram - около 30)
+BROADCAST_PER_CHAT_RATE = 1  # Сообщений в секунду в один чат
+BROADCAST_MAX_RETRIES = 3  # Повторов при 429, 5xx и сетевых ошибках
+BROADCAST_CHECKPOINT_DIR = "broadcast_checkpoints"  # Журналы рассылок (файл на рассылку) для возобновления после падения
+BROADCAST_CHAT_BUCKETS = 10000  # Сколько последних чатов помнят свой темп отправки между рассылками
+
+# Настройки напоминаний (пользователь может изменить свои командами /timezone, /remind_at, /remind_before)
+DEFAULT_TIMEZONE = "Europe/Moscow"  # Часовой пояс по умолчанию
+DAILY_REMINDER_TIME = "08:00"  # Ежедневное напоминание по местному времени пользователя
+REMIND_BEFORE_MINUTES = 0  # Напоминание за N минут до события (0 - выключено)
@@ -0,0 +1,241 @@
+# Состояния диалогов: TTL, ограничение памяти (LRU), снапшот и журнал на диске
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from storage import WriteCoalescer
+
+logger = logging.getLogger(__name__)
+
+# Шаги диалога
+STUDY_DATETIME = 'study_datetime'  # Ждем дату и время учебного события
+STUDY_SUBJECT = 'study_subject'  # Ждем название предмета (дата и время уже введены)
+WORK_DATETIME = 'work_datetime'
+WORK_DESCRIPTION = 'work_description'
+DATE_QUERY = 'date_query'  # Ждем дату для показа расписания
+AI_PLAN = 'ai_plan'  # Ждем число коммуникаций для ИИ-планировщика
+
+
+class ConversationState(NamedTuple):
+    """Состояние диалога пользователя"""
+    step: str
+    date_text: Optional[str] = None  # Введенная дата, например "2 сентября"
+    time_text: Optional[str] = None  # Введенное время, например "13:55-15:35"
+    updated_at: float = 0.0  # time.time() последнего изменения (переживает перезапуск)
+
+
+class ConversationStore:
+    """Хранилище состояний диалогов
+
+    Брошенный диалог удаляется через ttl секунд после последнего изменения,
+    а при превышении max_users вытесняется пользователь, дольше всех не
+    писавший боту (LRU). Если задан path, состояния сохраняются тем же
+    WriteCoalescer, что и расписания: диалог переживает перезапуск и
+    редеплой. Каждый сброс дописывает в журнал (path + '.journal', write +
+    fsync) только изменившиеся диалоги; когда журнал длиннее
+    compact_threshold записей и числа диалогов, он сворачивается в снапшот
+    JSON (временный файл + fsync + os.replace). Снапшот помнит, на какой
+    момент он снят, а записи журнала - время изменения, поэтому остатки
+    журнала, уже вошедшие в снапшот, при загрузке пропускаются. Устаревшие
+    к моменту загрузки записи отбрасываются.
+    """
+
+    def __init__(self, ttl: float = 1800.0, max_users: int = 10000, path: Optional[str] = None,
+                 flush_interval: float = 2.0, background_flush: bool = True, compact_threshold: int = 1000):
+        self.ttl = ttl
+        self.max_users = max(1, max_users)
+        self.path = path
+        self.journal_path = f"{path}.journal" if path else None
+        self.compact_threshold = compact_threshold
+
+        self._states = OrderedDict()  # user_id -> ConversationState, от давних к свежим
+        self._lock = threading.Lock()
+        self._changes = {}  # user_id -> время изменения с последнего сброса
+        self._write_lock = threading.Lock()
+        self._journal_records = 0
+
+        self.expired = 0
+        self.evicted = 0
+
+        self.writer = WriteCoalescer(self, flush_interval=flush_interval, max_pending=100)
+        if path:
+            self.load()
+            if background_flush:
+                self.writer.start()
+
+    # ---------- Доступ ----------
+
+    def get(self, user_id: int) -> Optional[ConversationState]:
+        """Текущее состояние пользователя или None (нет диалога или он устарел)"""
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                return None
+            now = time.time()
+            if now - state.updated_at > self.ttl:
+                del self._states[user_id]
+                self.expired += 1
+                self._changes[user_id] = now
+                return None
+            self._states.move_to_end(user_id)
+            return state
+
+    def set(self, user_id: int, step: str, date_text: Optional[str] = None, time_text: Optional[str] = None):
+        """Переводит диалог пользователя на шаг step"""
+        state = ConversationState(step, date_text, time_text, time.time())
+        with self._lock:
+            self._states[user_id] = state
+            self._states.move_to_end(user_id)
+            self._changes[user_id] = state.updated_at
+            while len(self._states) > self.max_users:
+                evicted_id, _ = self._states.popitem(last=False)
+                self._changes[evicted_id] = state.updated_at
+                self.evicted += 1
+        self._mark_dirty()
+
+    def clear(self, user_id: int):
+        """Завершает диалог пользователя"""
+        with self._lock:
+            if self._states.pop(user_id, None) is None:
+                return
+            self._changes[user_id] = time.time()
+        self._mark_dirty()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def purge_expired(self) -> int:
+        """Удаляет устаревшие диалоги, возвращает их количество"""
+        now = time.time()
+        deadline = now - self.ttl
+        with self._lock:
+            expired = [user_id for user_id, state in self._states.items() if state.updated_at < deadline]
+            for user_id in expired:
+                del self._states[user_id]
+                self._changes[user_id] = now
+            self.expired += len(expired)
+        return len(expired)
+
+    def _mark_dirty(self):
+        if self.path:
+            self.writer.mark_dirty()
+
+    # ---------- Снапшот и журнал ----------
+
+    def load(self):
+        """Загружает снапшот и журнал диалогов, пропуская устаревшие"""
+        raw = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Ошибка загрузки диалогов: {e}")
+        # Снапшот без журнала - просто user_id -> поля
+        saved_at = raw.get('saved_at', 0.0) if 'states' in raw else 0.0
+        raw_states = raw['states'] if 'states' in raw else raw
+        states = {int(user_id): ConversationState(*fields) for user_id, fields in raw_states.items()}
+
+        # Журнал: [user_id, поля состояния или None (диалог завершен), время изменения]
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            user_id, fields, changed_at = json.loads(line)
+                        except ValueError:
+                            continue  # Оборванная последняя строка
+                        replayed += 1
+                        if changed_at < saved_at:
+                            continue  # Уже в снапшоте (упали до усечения журнала)
+                        if fields is None:
+                            states.pop(user_id, None)
+                        else:
+                            states[user_id] = ConversationState(*fields)
+            except OSError as e:
+                logger.error(f"❌ Ошибка чтения журнала диалогов: {e}")
+
+        deadline = time.time() - self.ttl
+        fresh = sorted(
+            ((user_id, state) for user_id, state in states.items() if state.updated_at >= deadline),
+            key=lambda item: item[1].updated_at
+        )
+        with self._lock:
+            self._states = OrderedDict(fresh[-self.max_users:])
+        self._journal_records = replayed
+        logger.info(f"💬 Загружено диалогов: {len(self._states)} (устаревших: {len(states) - len(fresh)}, "
+                    f"записей журнала: {replayed})")
+
+    def flush(self):
+        """Дописывает изменившиеся диалоги в журнал (вызывается WriteCoalescer)"""
+        if not self.path:
+            return
+        self.purge_expired()
+        with self._write_lock:
+            with self._lock:
+                if not self._changes:
+                    return
+                changes, self._changes = self._changes, {}
+                records = []
+                for user_id, changed_at in changes.items():
+                    state = self._states.get(user_id)
+                    records.append([user_id, list(state) if state is not None else None, changed_at])
+                compact = self._journal_records + len(records) > max(self.compact_threshold, len(self._states))
+                if compact:
+                    data = json.dumps({
+                        'saved_at': time.time(),
+                        'states': {user_id: list(state) for user_id, state in self._states.items()}
+                    }, ensure_ascii=False)
+
+            try:
+                if compact:
+                    self._write_snapshot(data)
+                else:
+                    self._append_journal(records)
+            except Exception:
+                with self._lock:
+                    for user_id, changed_at in changes.items():
+                        self._changes.setdefault(user_id, changed_at)
+                raise
+
+    def _append_journal(self, records):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += len(records)
+
+    def _write_snapshot(self, data: str):
+        """Сворачивает журнал: полный снапшот, затем пустой журнал"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Падение до усечения безопасно: load пропустит записи старше saved_at
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        self._journal_records = 0
+
+    def close(self):
+        """Сохраняет несохраненные изменения (вызывается при завершении)"""
+        if self.path:
+            self.writer.stop()
+            # mark_dirty мог не дойти до WriteCoalescer (например, только purge)
+            self.flush()
+
+    def stats(self) -> Dict:
+        """Метрики для /metrics"""
+        return {
+            'active': len(self._states),
+            'max_users': self.max_users,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'journal_records': self._journal_records,
+        }
@@ -0,0 +1,152 @@
+# Разбор дат, которые вводят пользователи: "2 сентября", "завтра", "в пятницу", "05.01"
+#
+# Пример: python date_parser.py "2 сентября" завтра 31.12
+import re
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+MONTHS = {
+    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4, 'мая': 5, 'июня': 6,
+    'июля': 7, 'августа': 8, 'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12,
+    # Сокращения
+    'янв': 1, 'фев': 2, 'февр': 2, 'мар': 3, 'апр': 4, 'май': 5, 'июн': 6,
+    'июл': 7, 'авг': 8, 'сен': 9, 'сент': 9, 'окт': 10, 'ноя': 11, 'нояб': 11, 'дек': 12,
+}
+WEEKDAYS = {
+    'понедельник': 0, 'вторник': 1, 'среда': 2, 'среду': 2, 'четверг': 3,
+    'пятница': 4, 'пятницу': 4, 'суббота': 5, 'субботу': 5, 'воскресенье': 6,
+    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
+}
+RELATIVE_DAYS = {'вчера': -1, 'сегодня': 0, 'завтра': 1, 'послезавтра': 2}
+
+
+def _alternation(words) -> str:
+    # Длинные варианты раньше коротких: 'сент' не должен съедаться 'сен'
+    return '|'.join(sorted(words, key=len, reverse=True))
+
+
+# Грамматика: одна альтернация с именованными группами, текст разбирается
+# одним fullmatch. Вид выражения - match.lastgroup (внешняя группа
+# закрывается последней).
+DATE_FORMS = (
+    ('relative', rf'(?P<relative_word>{_alternation(RELATIVE_DAYS)})'),  # завтра
+    ('weekday', rf'(?:во?\s+)?(?P<weekday_word>{_alternation(WEEKDAYS)})'),  # в пятницу
+    ('iso', r'(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})'),  # 2025-09-02
+    ('numeric', r'(?P<num_day>\d{1,2})[./](?P<num_month>\d{1,2})(?:[./](?P<num_year>\d{4}|\d{2}))?'),  # 02.09, 2/9/25
+    ('text', rf'(?P<text_day>\d{{1,2}})\s*(?P<text_month>{_alternation(MONTHS)})\.?'
+             r'(?:\s+(?P<text_year>\d{4})(?:\s*г(?:ода?)?\.?)?)?'),  # 2 сентября [2025 г.]
+)
+DATE_RE = re.compile('|'.join(f'(?P<{kind}>{pattern})' for kind, pattern in DATE_FORMS))
+SPACES_RE = re.compile(r'\s+')
+
+
+def _resolve_year(day: int, month: int, today: date, year_window: int) -> Optional[date]:
+    """Дата без года: текущий год, как и раньше, кроме перехода через Новый год
+
+    Соседний год выбирается, только если дата в нем не дальше year_window
+    дней от сегодня, а в текущем году - дальше: в декабре "5 января" - это
+    январь следующего года, в январе "28 декабря" - только что прошедший
+    декабрь. "1 августа", введенное в октябре, - август этого года.
+    29 февраля не в високосный год не распознается.
+    """
+    window = timedelta(days=year_window)
+    candidates = []
+    for year in (today.year, today.year + 1, today.year - 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            candidates.append(None)
+
+    current = candidates[0]
+    if current is not None and abs(current - today) <= window:
+        return current
+    for adjacent in candidates[1:]:
+        if adjacent is not None and abs(adjacent - today) <= window:
+            return adjacent
+    return current
+
+
+def parse_date(text: str, today: date, year_window: int = 60) -> Optional[date]:
+    """Дата из текста пользователя или None, если текст не распознан
+
+    Понимает "2 сентября", "2 сент 2026", "сегодня" / "завтра" / "вчера",
+    дни недели ("в пятницу" - ближайшая пятница после сегодняшнего дня:
+    в пятницу это пятница через неделю, сегодня - "сегодня"),
+    "02.09", "2/9/25" и "2025-09-02". Год, если он не указан, выбирает
+    _resolve_year.
+    """
+    match = DATE_RE.fullmatch(SPACES_RE.sub(' ', text.strip().lower().replace('ё', 'е')))
+    if match is None:
+        return None
+
+    kind = match.lastgroup
+    if kind == 'relative':
+        return today + timedelta(days=RELATIVE_DAYS[match['relative_word']])
+    if kind == 'weekday':
+        return today + timedelta(days=(WEEKDAYS[match['weekday_word']] - today.weekday() - 1) % 7 + 1)
+
+    if kind == 'iso':
+        day, month, year = match['iso_day'], match['iso_month'], match['iso_year']
+    elif kind == 'numeric':
+        day, month, year = match['num_day'], match['num_month'], match['num_year']
+    else:
+        day, month, year = match['text_day'], MONTHS[match['text_month']], match['text_year']
+
+    day, month = int(day), int(month)
+    if year is None:
+        return _resolve_year(day, month, today, year_window)
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+class DateParser:
+    """parse_date с LRU-кэшем разобранных выражений
+
+    Результат зависит от сегодняшней даты ("завтра", год по умолчанию),
+    поэтому кэш сбрасывается, когда наступает новый день. Повторный ввод
+    того же текста в течение дня - один поиск в кэше.
+    """
+
+    def __init__(self, maxsize: int = 1024, year_window: int = 60,
+                 clock: Callable[[], date] = lambda: datetime.now().date()):
+        self.year_window = year_window
+        self.clock = clock
+        self._today = None
+        self._lock = threading.Lock()
+        self._cached = lru_cache(maxsize=maxsize)(self._parse)
+        self.resets = 0
+
+    def _parse(self, text: str, today: date) -> Optional[str]:
+        parsed = parse_date(text, today, self.year_window)
+        return parsed.isoformat() if parsed else None
+
+    def parse(self, text: str) -> Optional[str]:
+        """'YYYY-MM-DD' или None, если дата не распознана"""
+        today = self.clock()
+        if today != self._today:
+            with self._lock:
+                if today != self._today:
+                    self._cached.cache_clear()
+                    self._today = today
+                    self.resets += 1
+        return self._cached(text, today)
+
+    def stats(self) -> Dict:
+        """Метрики для /metrics"""
+        info = self._cached.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'resets': self.resets}
+
+
+if __name__ == '__main__':
+    import sys
+
+    parser = DateParser()
+    for argument in sys.argv[1:]:
+        print(f"{argument!r} -> {parser.parse(argument)}")
@@ -0,0 +1,214 @@
+# Диспетчер обновлений: пул обработчиков со строгим порядком для каждого пользователя
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, List
+
+from telebot import TeleBot
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update):
+    """Пользователь, от которого пришло обновление (или None)"""
+    for field in ('message', 'edited_message', 'callback_query'):
+        item = getattr(update, field, None)
+        if item is not None and item.from_user is not None:
+            return item.from_user.id
+    return None
+
+
+class UpdateDispatcher:
+    """Выполняет обработчики на пуле потоков
+
+    У каждого пользователя своя очередь задач (deque), а общий пул потоков
+    берет пользователей по готовности: пока задача пользователя выполняется,
+    следующая его задача ждет, поэтому обновления одного пользователя
+    обрабатываются строго по очереди - диалог (ConversationStore) не
+    ломается. Медленный обработчик задерживает только своего пользователя,
+    остальные разбираются свободными потоками. После каждой задачи
+    пользователь встает в конец очереди готовых - никто не занимает поток
+    надолго. Всего ожидает не больше queue_size задач на поток: при
+    переполнении submit() блокирует вызывающего (поток polling или очередь
+    webhook), пока место не освободится.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 100):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.capacity = self.workers * queue_size
+        self._pending = {}  # Пользователь -> deque задач; есть, пока у него есть работа
+        self._ready = deque()  # Пользователи с задачами, которых сейчас никто не обрабатывает
+        self._queued = 0  # Задач в очередях пользователей
+        self._stopping = False
+        self._threads = []
+
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._has_room = threading.Condition(self._lock)
+
+        # Метрики (под тем же замком)
+        self._latencies = deque(maxlen=1000)  # Время обработки последних задач, с
+        self._waits = deque(maxlen=1000)  # Время ожидания в очереди, с
+        self.processed = 0
+        self.failed = 0
+        self.blocked = 0  # Сколько раз submit() ждал места в очереди
+        self.rejected = 0  # Задачи, пришедшие после stop()
+
+    def start(self):
+        """Запускает потоки обработчиков"""
+        if self._threads:
+            return
+        with self._lock:
+            self._stopping = False
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'handler-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"🧵 Пул обработчиков: {self.workers} потоков, очередь {self.capacity} задач")
+
+    def submit(self, user_id, task: Callable, *args):
+        """Ставит задачу в очередь пользователя"""
+        item = (time.perf_counter(), task, args)
+        with self._lock:
+            if self._queued >= self.capacity and not self._stopping:
+                self.blocked += 1
+                logger.warning(f"⚠️ Очередь обработчиков заполнена, ждем (пользователь {user_id})")
+                while self._queued >= self.capacity and not self._stopping:
+                    self._has_room.wait()
+            if self._stopping:
+                self.rejected += 1
+                logger.warning(f"⚠️ Обработчики остановлены, задача пользователя {user_id} отброшена")
+                return
+
+            tasks = self._pending.get(user_id)
+            if tasks is None:
+                # Пользователь простаивал - сразу готов к обработке
+                tasks = self._pending[user_id] = deque()
+                self._ready.append(user_id)
+                self._has_work.notify()
+            # Иначе его задачу уже выполняют или он уже в очереди готовых
+            tasks.append(item)
+            self._queued += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._ready:
+                    if self._stopping:
+                        return
+                    self._has_work.wait()
+                user_id = self._ready.popleft()
+                tasks = self._pending[user_id]
+                queued_at, task, args = tasks.popleft()
+                self._queued -= 1
+                self._has_room.notify()
+
+            started = time.perf_counter()
+            try:
+                task(*args)
+                failed = False
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ Ошибка обработчика: {e}")
+            finished = time.perf_counter()
+
+            with self._lock:
+                if tasks:
+                    self._ready.append(user_id)
+                    self._has_work.notify()
+                else:
+                    del self._pending[user_id]
+                self.processed += 1
+                self.failed += failed
+                self._waits.append(started - queued_at)
+                self._latencies.append(finished - started)
+
+    def stop(self, timeout: float = 10.0):
+        """Дожидается обработки уже принятых задач и останавливает потоки
+
+        Не блокируется на заполненной очереди: новые задачи после вызова
+        отбрасываются, потоки доделывают принятые и выходят.
+        """
+        with self._lock:
+            self._stopping = True
+            self._has_work.notify_all()
+            self._has_room.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def stats(self) -> dict:
+        """Метрики для /metrics"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            waits = list(self._waits)
+            processed, failed, blocked, rejected = self.processed, self.failed, self.blocked, self.rejected
+            queued, users = self._queued, len(self._pending)
+
+        def ms(seconds):
+            return round(seconds * 1000, 2)
+
+        return {
+            "workers": self.workers,
+            "queued": queued,
+            "active_users": users,
+            "processed": processed,
+            "failed": failed,
+            "blocked": blocked,
+            "rejected": rejected,
+            "latency_avg_ms": ms(sum(latencies) / len(latencies)) if latencies else 0,
+            "latency_p95_ms": ms(latencies[int(len(latencies) * 0.95)]) if latencies else 0,
+            "latency_max_ms": ms(latencies[-1]) if latencies else 0,
+            "queue_wait_avg_ms": ms(sum(waits) / len(waits)) if waits else 0,
+        }
+
+
+class DispatchingTeleBot(TeleBot):
+    """TeleBot, который передает обновления в UpdateDispatcher
+
+    Бот создается с threaded=False: подбор и вызов обработчиков выполняются
+    прямо в потоке диспетчера, а не во встроенном пуле telebot (у которого
+    нет порядка по пользователям).
+
+    offset polling сдвигается, как только обновление принято в очередь, а
+    не после обработки - так же, как у telebot с threaded=True. Иначе
+    следующий getUpdates снова получил бы обновления, которые еще в работе,
+    и они выполнились бы дважды. Цена - доставка "не более одного раза":
+    принятые, но не обработанные обновления теряются при аварийном
+    завершении; при обычной остановке stop() дожидается их обработки.
+    """
+
+    def __init__(self, token: str, dispatcher: UpdateDispatcher, **kwargs):
+        self._update_id_lock = threading.Lock()
+        self._last_update_id = 0
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        self.dispatcher = dispatcher
+
+    @property
+    def last_update_id(self) -> int:
+        return self._last_update_id
+
+    @last_update_id.setter
+    def last_update_id(self, value: int):
+        # Обработчики обновляют offset из разных потоков - он только растет,
+        # иначе polling запросит уже принятые обновления повторно
+        with self._update_id_lock:
+            if value > self._last_update_id:
+                self._last_update_id = value
+
+    def process_new_updates(self, updates: List):
+        for update in updates:
+            # offset сдвигаем сразу, не дожидаясь обработки (см. docstring класса)
+            self.last_update_id = update.update_id
+            user_id = update_user_id(update)
+            # Обновления без пользователя распределяем по update_id - отдельным
+            # ключом, чтобы он не совпал с id какого-нибудь пользователя
+            key = user_id if user_id is not None else ('update', update.update_id)
+            self.dispatcher.submit(key, self._process_update, update)
+
+    def _process_update(self, update):
+        super().process_new_updates([update])
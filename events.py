@@ -0,0 +1,187 @@
+# Модель события расписания: компактная запись вместо словаря со строками
+from datetime import date
+from enum import IntEnum
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Optional, Tuple
+
+from free_slots import MINUTES_PER_DAY, to_minutes, format_minutes
+
+NO_TIME = -1  # start/end, если время события не распознано
+_MISSING = object()  # Ключа не было в исходном словаре
+_KEYS = {'id', 'time', 'activity', 'type', 'added_at'}
+
+# 'HH:MM' для каждой минуты суток и обратно. Разбор через словарь отдает
+# общие для всех событий объекты int и заодно проверяет, что запись
+# каноническая (восстанавливается из минут как есть)
+_CLOCK = tuple(format_minutes(minutes) for minutes in range(MINUTES_PER_DAY + 1))
+_CLOCK_MINUTES = {text: minutes for minutes, text in enumerate(_CLOCK)}
+
+
+class EventType(IntEnum):
+    """Тип события"""
+    GENERAL = 0
+    STUDY = 1
+    WORK = 2
+
+    @property
+    def emoji(self) -> str:
+        return _EMOJI[self]
+
+
+_EMOJI = {EventType.GENERAL: "📝", EventType.STUDY: "📚", EventType.WORK: "💼"}
+_TYPE_NAMES = tuple(event_type.name.lower() for event_type in EventType)
+_TYPES_BY_NAME = {name: EventType(value) for value, name in enumerate(_TYPE_NAMES)}
+
+
+def _parse_time(time_text) -> Tuple[int, int, bool]:
+    """'13:55-15:35' -> (835, 935, каноническая ли запись)
+
+    (NO_TIME, NO_TIME, False), если время не распознано.
+    """
+    if isinstance(time_text, str):
+        return _parse_time_text(time_text)
+    return NO_TIME, NO_TIME, False
+
+
+@lru_cache(maxsize=4096)
+def _parse_time_text(time_text: str) -> Tuple[int, int, bool]:
+    # Событий много, а различных интервалов - десятки (пары, смены)
+    if len(time_text) == 11 and time_text[5] == '-':
+        start = _CLOCK_MINUTES.get(time_text[:5])
+        end = _CLOCK_MINUTES.get(time_text[6:])
+        if start is not None and end is not None:
+            return start, end, True
+    try:
+        start_text, end_text = time_text.split('-')
+        return to_minutes(start_text), to_minutes(end_text), False
+    except ValueError:
+        return NO_TIME, NO_TIME, False
+
+
+@lru_cache(maxsize=4096)
+def _date_ordinal(date_key: str) -> int:
+    """'2025-10-17' -> порядковый номер дня; 0, если дата не распознана
+
+    Кэш отдает один объект int на дату для всех ее событий.
+    """
+    try:
+        return date.fromisoformat(date_key).toordinal()
+    except (ValueError, TypeError):
+        return 0
+
+
+class Event:
+    """Событие расписания
+
+    Время хранится минутами от полуночи, дата - порядковым номером дня,
+    тип - EventType, поэтому сортировка, поиск свободного времени и
+    напоминания не разбирают строки. Момент добавления только показывается
+    и сохраняется - он остается строкой из JSON, чтобы не разбирать его при
+    загрузке каждого события.
+    Формат JSON прежний: from_dict / to_dict переводят без потерь - поля,
+    которые не восстанавливаются из кодированных значений (время вида
+    '9:00 - 10:00', неизвестный тип, лишние или отсутствующие ключи),
+    сохраняются как были в raw.
+    """
+
+    __slots__ = ('id', 'day', 'start', 'end', 'activity', 'type', 'added_at', 'raw')
+
+    def __init__(self, id: str, day: int, start: int, end: int, activity: str,
+                 type: EventType = EventType.GENERAL, added_at: str = '',
+                 raw: Optional[Dict] = None):
+        self.id = id
+        self.day = day  # date.toordinal(), 0 - дата не распознана
+        self.start = start  # Минуты от полуночи, NO_TIME - не распознано
+        self.end = end
+        self.activity = activity
+        self.type = type
+        self.added_at = added_at  # ISO-время добавления, как в JSON
+        self.raw = raw  # Исходные значения полей JSON, которые не кодируются без потерь
+
+    # Ключ сортировки событий дня: events.sort(key=Event.sort_key)
+    sort_key = attrgetter('start', 'end')
+
+    def __lt__(self, other: 'Event') -> bool:
+        # Тот же порядок, что sort_key: для bisect.insort в списке дня
+        return (self.start, self.end) < (other.start, other.end)
+
+    @classmethod
+    def from_dict(cls, date_key: str, data: Dict) -> 'Event':
+        """Событие из словаря формата JSON (дата - ключ, под которым оно лежит)"""
+        start, end, time_exact = _parse_time(data.get('time'))
+        added_at = data.get('added_at', '')
+        type_name = data.get('type')
+        event_type = _TYPES_BY_NAME.get(type_name) if isinstance(type_name, str) else None
+        event = cls(
+            data.get('id'), _date_ordinal(date_key), start, end, data.get('activity'),
+            event_type or EventType.GENERAL, added_at
+        )
+
+        # Обычная запись восстанавливается из полей как есть; остальные сверяем целиком
+        if time_exact and event_type is not None and data.keys() == _KEYS:
+            return event
+        encoded = event.to_dict()
+        if encoded != data:
+            raw = {key: value for key, value in data.items() if encoded.get(key, _MISSING) != value}
+            raw.update((key, _MISSING) for key in encoded if key not in data)
+            event.raw = raw
+        return event
+
+    def to_dict(self) -> Dict:
+        """Словарь формата JSON, равный исходному"""
+        data = {
+            'id': self.id,
+            'time': self.time,
+            'activity': self.activity,
+            'type': _TYPE_NAMES[self.type],
+            'added_at': self.added_at
+        }
+        if self.raw:
+            for key, value in self.raw.items():
+                if value is _MISSING:
+                    del data[key]
+                else:
+                    data[key] = value
+        return data
+
+    def _raw_text(self, key: str) -> Optional[str]:
+        value = self.raw.get(key) if self.raw else None
+        return value if isinstance(value, str) else None
+
+    @property
+    def time(self) -> str:
+        """Время для показа: '13:55-15:35'"""
+        if self.raw is not None or self.start == NO_TIME:
+            raw_time = self._raw_text('time')
+            if raw_time is not None:
+                return raw_time
+            if self.start == NO_TIME:
+                return ''
+        return f"{_CLOCK[self.start]}-{_CLOCK[self.end]}"
+
+    @property
+    def type_name(self) -> str:
+        """Тип строкой, как в JSON ('study', 'work', ...)"""
+        return (self.raw is not None and self._raw_text('type')) or _TYPE_NAMES[self.type]
+
+    @property
+    def date(self) -> Optional[date]:
+        return date.fromordinal(self.day) if self.day else None
+
+    def busy_range(self) -> Optional[Tuple[int, int]]:
+        """Занятый интервал дня [start, end); событие через полночь - до конца дня
+
+        None, если время не распознано или событие нулевой длины.
+        """
+        if self.start == NO_TIME or self.end == self.start:
+            return None
+        return self.start, self.end if self.end > self.start else MINUTES_PER_DAY
+
+    def overlaps(self, other: 'Event') -> bool:
+        """Пересекаются ли события одного дня по времени"""
+        mine, theirs = self.busy_range(), other.busy_range()
+        return bool(mine and theirs) and mine[0] < theirs[1] and theirs[0] < mine[1]
+
+    def __repr__(self) -> str:
+        return f"Event({self.id!r}, {self.date}, {self.time!r}, {self.activity!r}, {self.type_name!r})"
@@ -0,0 +1,118 @@
+# Поиск свободного времени: занятые интервалы по дням в целых минутах
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(time_text: str) -> int:
+    """'09:30' -> 570"""
+    hour, minute = time_text.strip().split(':')
+    minutes = int(hour) * 60 + int(minute)
+    if not 0 <= minutes <= MINUTES_PER_DAY:
+        raise ValueError(f"Некорректное время: {time_text}")
+    return minutes
+
+
+def format_minutes(minutes: int) -> str:
+    """570 -> '09:30'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class BusyIntervals:
+    """Занятое время одного дня
+
+    Непересекающиеся интервалы [start, end) в минутах хранятся в двух
+    отсортированных списках начал и концов: пересекающиеся при добавлении
+    сливаются, поэтому проверка «свободен ли отрезок» и поиск первого
+    занятого интервала после момента - бинарный поиск, O(log n).
+    """
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def add(self, start: int, end: int):
+        """Отмечает [start, end) занятым, сливая с соседними интервалами"""
+        # Интервалы, которые пересекаются или соприкасаются с новым
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def is_free(self, start: int, end: int) -> bool:
+        """Не пересекается ли [start, end) с занятым временем"""
+        index = bisect_right(self.ends, start)
+        return index == len(self.starts) or self.starts[index] >= end
+
+    def free_windows(self, lo: int, hi: int, min_length: int, granularity: int = 1) -> List[Tuple[int, int]]:
+        """Свободные окна внутри [lo, hi) длиной не меньше min_length
+
+        Начало окна выравнивается вверх до кратного granularity минут.
+        """
+        windows = []
+        cursor = lo
+        index = bisect_right(self.ends, lo)  # Первый интервал, который заканчивается после lo
+        while cursor < hi:
+            busy_start = self.starts[index] if index < len(self.starts) else hi
+            window_start = -(-cursor // granularity) * granularity
+            window_end = min(busy_start, hi)
+            if window_end - window_start >= min_length:
+                windows.append((window_start, window_end))
+            if index >= len(self.starts):
+                break
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        return windows
+
+    def copy(self) -> 'BusyIntervals':
+        intervals = BusyIntervals()
+        intervals.starts = list(self.starts)
+        intervals.ends = list(self.ends)
+        return intervals
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class BusyIndex:
+    """Занятое время пользователя по датам ('YYYY-MM-DD' -> BusyIntervals)"""
+
+    def __init__(self):
+        self.days = {}
+
+    @classmethod
+    def from_schedules(cls, schedules: Dict[str, List]) -> 'BusyIndex':
+        """Строит индекс по событиям {date -> [Event]}"""
+        index = cls()
+        for date_key, events in schedules.items():
+            for event in events:
+                interval = event.busy_range()
+                if interval:
+                    index.add(date_key, *interval)
+        return index
+
+    def add(self, date_key: str, start: int, end: int):
+        day = self.days.get(date_key)
+        if day is None:
+            day = self.days[date_key] = BusyIntervals()
+        day.add(start, end)
+
+    def is_free(self, date_key: str, start: int, end: int) -> bool:
+        day = self.days.get(date_key)
+        return day is None or day.is_free(start, end)
+
+    def free_windows(self, date_keys: Iterable[str], lo: int, hi: int, min_length: int,
+                     granularity: int = 1) -> List[Tuple[str, int, int]]:
+        """Свободные окна (дата, начало, конец) по датам date_keys"""
+        empty = BusyIntervals()
+        windows = []
+        for date_key in date_keys:
+            day = self.days.get(date_key, empty)
+            windows.extend((date_key, start, end) for start, end in day.free_windows(lo, hi, min_length, granularity))
+        return windows
@@ -0,0 +1,146 @@
+# Inline-клавиатуры бота (общие для обычного и asyncio-режима)
+#
+# Клавиатуры собираются один раз и кэшируются вместе с готовым JSON: на
+# каждый ответ не создаются новые кнопки и telebot не сериализует их заново.
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Optional
+
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+_caches = {}  # имя клавиатуры -> lru_cache, для метрик
+
+
+class FrozenKeyboard(InlineKeyboardMarkup):
+    """Неизменяемая клавиатура с заранее сериализованным JSON
+
+    Один объект отдается всем ответам сразу, поэтому изменять его нельзя:
+    add()/row() и присваивание атрибутов вызывают ошибку.
+    """
+
+    def __init__(self, rows):
+        super().__init__(tuple(tuple(row) for row in rows))
+        self._json = json.dumps(super().to_dict())
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("Клавиатура неизменяема")
+        super().__setattr__(name, value)
+
+    def to_json(self) -> str:
+        return self._json
+
+    def add(self, *args, **kwargs):
+        raise TypeError("Клавиатура неизменяема")
+
+    def row(self, *args, **kwargs):
+        raise TypeError("Клавиатура неизменяема")
+
+
+def cached_keyboard(maxsize: Optional[int] = None) -> Callable:
+    """Кэширует клавиатуру по аргументам построителя
+
+    Построитель возвращает ряды кнопок, в кэш попадает FrozenKeyboard.
+    maxsize=None - статическая клавиатура (строится один раз), иначе
+    динамические клавиатуры вытесняются по LRU.
+    """
+    def decorator(build: Callable) -> Callable:
+        cache = lru_cache(maxsize=maxsize)(lambda *args: FrozenKeyboard(build(*args)))
+        _caches[build.__name__] = cache
+
+        @wraps(build)
+        def wrapper(*args) -> InlineKeyboardMarkup:
+            return cache(*args)
+
+        wrapper.cache_info = cache.cache_info
+        return wrapper
+    return decorator
+
+
+def keyboard_stats() -> Dict:
+    """Попадания в кэш клавиатур для /metrics"""
+    stats = {}
+    for name, cache in _caches.items():
+        info = cache.cache_info()
+        stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+    return stats
+
+
+@cached_keyboard()
+def get_main_keyboard():
+    """Главная клавиатура (оптимизированная для мобильных)"""
+    return [
+        [
+            InlineKeyboardButton("➕ Добавить", callback_data="add_menu")
+        ],
+        [
+            InlineKeyboardButton("📅 Показать", callback_data="show_menu")
+        ],
+        [
+            InlineKeyboardButton("🤖 ИИ-планировщик", callback_data="ai_planner")
+        ],
+        [
+            InlineKeyboardButton("📊 Статистика", callback_data="statistics")
+        ]
+    ]
+
+
+@cached_keyboard()
+def get_add_menu_keyboard():
+    """Клавиатура меню добавления"""
+    return [
+        [
+            InlineKeyboardButton("📚 Учеба", callback_data="add_study"),
+            InlineKeyboardButton("💼 Работа", callback_data="add_work")
+        ],
+        [
+            InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")
+        ]
+    ]
+
+
+@cached_keyboard()
+def get_show_menu_keyboard():
+    """Клавиатура меню просмотра"""
+    return [
+        [
+            InlineKeyboardButton("📅 На дату", callback_data="show_date"),
+            InlineKeyboardButton("📊 На неделю", callback_data="show_week")
+        ],
+        [
+            InlineKeyboardButton("🌅 Сегодня", callback_data="show_today"),
+            InlineKeyboardButton("🤖 Рекомендации", callback_data="smart_recommendations")
+        ],
+        [
+            InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")
+        ]
+    ]
+
+
+@cached_keyboard()
+def get_back_keyboard():
+    """Клавиатура с кнопкой "Назад" """
+    return [[InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")]]
+
+
+@cached_keyboard(maxsize=32)
+def get_date_picker_keyboard(start_date: str, days: int = 7):
+    """Выбор даты: days дней начиная с start_date ('YYYY-MM-DD')
+
+    Кнопки ведут на show_date:YYYY-MM-DD. Ключ кэша - дата начала, так что
+    за день клавиатура строится один раз.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    buttons = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        label = f"{WEEKDAYS[day.weekday()]} {day.strftime('%d.%m')}"
+        buttons.append(InlineKeyboardButton(label, callback_data=f"show_date:{day.strftime('%Y-%m-%d')}"))
+
+    rows = [buttons[i:i + 4] for i in range(0, len(buttons), 4)]
+    rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")])
+    return rows
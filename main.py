@@ -1,21 +1,35 @@
 import os
 import logging
 from datetime import datetime, timedelta
-import json
-from typing import Dict, List, Optional
+from typing import List, Optional
 import threading
 from flask import Flask, request, jsonify
-import schedule
 import time
-import uuid
 import signal
 import sys
+import queue
+import hmac
+import hashlib
+
+import config
+from schedule_manager import ScheduleManager
+from messages import WELCOME_TEXT, HELP_TEXT
+from keyboards import (
+    get_main_keyboard, get_add_menu_keyboard, get_show_menu_keyboard, get_back_keyboard,
+    get_date_picker_keyboard, keyboard_stats
+)
+from schedule_parser import ScheduleParser, TimetableCache
+from dispatcher import UpdateDispatcher, DispatchingTeleBot
+from broadcast import Broadcaster
+from reminders import ReminderScheduler
+from router import Router
+from conversation import (
+    ConversationStore, STUDY_DATETIME, STUDY_SUBJECT, WORK_DATETIME, WORK_DESCRIPTION, DATE_QUERY, AI_PLAN
+)
 
 # Импорты для telebot (pyTelegramBotAPI)
 try:
     import telebot
-    from telebot import TeleBot
-    from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
     print("✅ pyTelegramBotAPI успешно импортирован")
 except ImportError as e:
     logging.error(f"❌ Ошибка импорта pyTelegramBotAPI: {e}")
@@ -36,515 +50,114 @@ app = Flask(__name__)
 def home():
     return jsonify({"status": "Bot is running", "timestamp": datetime.now().isoformat()})
 
-def run_flask():
-    """Запускает Flask в отдельном потоке"""
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
-
-# Состояния для бота
-user_states = {}  # user_id -> state
-
-class ScheduleManager:
-    """Менеджер расписания пользователя по датам"""
-    
-    def __init__(self):
-        self.schedules = {}  # user_id -> {date -> [events]}
-        self.load_schedules()
-    
-    def load_schedules(self):
-        """Загружает расписания из файла"""
-        try:
-            if os.path.exists('schedules.json'):
-                with open('schedules.json', 'r', encoding='utf-8') as f:
-                    self.schedules = json.load(f)
-                logger.info(f"📂 Загружено {len(self.schedules)} расписаний")
-        except Exception as e:
-            logger.error(f"❌ Ошибка загрузки расписаний: {e}")
-            self.schedules = {}
-    
-    def save_schedules(self):
-        """Сохраняет расписания в файл"""
-        try:
-            with open('schedules.json', 'w', encoding='utf-8') as f:
-                json.dump(self.schedules, f, ensure_ascii=False, indent=2)
-            logger.info("💾 Расписания сохранены")
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения расписаний: {e}")
-    
-    def parse_date(self, date_text: str) -> str:
-        """Парсит дату из текста (например: '2 сентября' -> '2025-09-02')"""
-        try:
-            # Текущий год
-            current_year = datetime.now().year
-            
-            # Словарь месяцев
-            months = {
-                'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-            }
-            
-            # Парсим текст
-            parts = date_text.strip().split()
-            if len(parts) >= 2:
-                day = int(parts[0])
-                
-                # Валидация дня
-                if day < 1 or day > 31:
-                    logger.warning(f"⚠️ Некорректный день: {day}")
-                    return date_text
-                
-                month_name = parts[1].lower()
-                
-                if month_name in months:
-                    month = months[month_name]
-                    
-                    # Валидация конкретных месяцев
-                    if month == 2 and day > 29:  # Февраль
-                        logger.warning(f"⚠️ Некорректный день для февраля: {day}")
-                        return date_text
-                    elif month in [4, 6, 9, 11] and day > 30:  # 30-дневные месяцы
-                        logger.warning(f"⚠️ Некорректный день для {month_name}: {day}")
-                        return date_text
-                    
-                    # Формируем дату в формате YYYY-MM-DD
-                    date_obj = datetime(current_year, month, day)
-                    return date_obj.strftime('%Y-%m-%d')
-            
-            # Если не удалось распарсить, возвращаем как есть
-            return date_text
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга даты '{date_text}': {e}")
-            return date_text
-    
-    def add_event(self, user_id: int, date_text: str, time_text: str, activity: str, event_type: str = "general") -> str:
-        """Добавляет событие на конкретную дату"""
-        if user_id not in self.schedules:
-            self.schedules[user_id] = {}
-        
-        # Валидация времени
-        if not self._validate_time_format(time_text):
-            return f"❌ Неправильный формат времени: {time_text}\nИспользуйте формат: 13:55-15:35"
-        
-        # Парсим дату
-        date_key = self.parse_date(date_text)
-        
-        if date_key not in self.schedules[user_id]:
-            self.schedules[user_id][date_key] = []
-        
-        # Генерируем уникальный ID
-        event_id = str(uuid.uuid4())[:8]  # Короткий ID из 8 символов
-        
-        # Создаем событие
-        event = {
-            'id': event_id,
-            'time': time_text.strip(),
-            'activity': activity.strip(),
-            'type': event_type,
-            'added_at': datetime.now().isoformat()
-        }
-        
-        # Добавляем событие и сортируем по времени
-        self.schedules[user_id][date_key].append(event)
-        self.schedules[user_id][date_key].sort(key=lambda x: x['time'])
-        
-        self.save_schedules()
-        
-        return f"✅ Событие добавлено на {date_text} в {time_text}: {activity}"
-    
-    def _validate_time_format(self, time_text: str) -> bool:
-        """Проверяет корректность формата времени"""
-        try:
-            # Ожидаемый формат: "13:55-15:35"
-            if '-' not in time_text:
-                return False
-            
-            start_time, end_time = time_text.split('-')
-            
-            # Проверяем формат времени (HH:MM)
-            for time_part in [start_time.strip(), end_time.strip()]:
-                if ':' not in time_part:
-                    return False
-                
-                hour, minute = time_part.split(':')
-                hour_int = int(hour)
-                minute_int = int(minute)
-                
-                if hour_int < 0 or hour_int > 23 or minute_int < 0 or minute_int > 59:
-                    return False
-            
-            return True
-        except:
-            return False
-    
-    def get_date_schedule(self, user_id: int, date_text: str) -> str:
-        """Получает расписание на конкретную дату"""
-        if user_id not in self.schedules:
-            return "📅 У вас пока нет расписаний. Добавьте первое событие!"
-        
-        date_key = self.parse_date(date_text)
-        
-        if date_key not in self.schedules[user_id] or not self.schedules[user_id][date_key]:
-            return f"📅 На {date_text} у вас нет запланированных событий."
-        
-        events = self.schedules[user_id][date_key]
-        result = f"📅 Расписание на {date_text}:\n\n"
-        
-        for i, event in enumerate(events, 1):
-            emoji = "📚" if event['type'] == 'study' else "💼" if event['type'] == 'work' else "📝"
-            result += f"{emoji} {event['time']} - {event['activity']}\n"
-        
-        return result
-    
-    def get_week_schedule(self, user_id: int) -> str:
-        """Получает расписание на неделю"""
-        if user_id not in self.schedules or not self.schedules[user_id]:
-            return "📅 На этой неделе у вас нет запланированных событий."
-        
-        result = "📅 Расписание на неделю:\n\n"
-        
-        # Сортируем даты
-        sorted_dates = sorted(self.schedules[user_id].keys())
-        
-        for date_key in sorted_dates:
-            events = self.schedules[user_id][date_key]
-            if events:
-                # Словарь для русских названий месяцев
-                months_ru = {
-                    1: 'января', 2: 'февраля', 3: 'марта', 4: 'апреля',
-                    5: 'мая', 6: 'июня', 7: 'июля', 8: 'августа',
-                    9: 'сентября', 10: 'октября', 11: 'ноября', 12: 'декабря'
-                }
-                
-                # Преобразуем дату в читаемый формат
-                try:
-                    date_obj = datetime.strptime(date_key, '%Y-%m-%d')
-                    day = date_obj.day
-                    month = months_ru.get(date_obj.month, str(date_obj.month))
-                    date_display = f"{day} {month}"
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"⚠️ Ошибка парсинга даты '{date_key}': {e}")
-                    date_display = date_key
-                except Exception as e:
-                    logger.warning(f"⚠️ Неожиданная ошибка при форматировании даты '{date_key}': {e}")
-                    date_display = date_key
-                
-                result += f"📅 {date_display}:\n"
-                
-                for event in events:
-                    emoji = "📚" if event['type'] == 'study' else "💼" if event['type'] == 'work' else "📝"
-                    result += f"  {emoji} {event['time']} - {event['activity']}\n"
-                
-                result += "\n"
-        
-        return result
-    
-    def get_today_schedule(self, user_id: int) -> str:
-        """Получает расписание на сегодня"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        if user_id not in self.schedules or today not in self.schedules[user_id]:
-            return "📅 Сегодня у вас нет запланированных событий. Отличный день для отдыха! 😊"
-        
-        events = self.schedules[user_id][today]
-        if not events:
-            return "📅 Сегодня у вас нет запланированных событий. Отличный день для отдыха! 😊"
-        
-        result = "🌅 Доброе утро! Вот что у вас сегодня:\n\n"
-        
-        for i, event in enumerate(events, 1):
-            emoji = "📚" if event['type'] == 'study' else "💼" if event['type'] == 'work' else "📝"
-            result += f"{i}. {emoji} {event['time']} - {event['activity']}\n"
-        
-        result += "\n💡 Совет: Планируйте время с запасом между событиями!"
-        return result
-    
-    def get_user_schedules(self, user_id: int) -> Dict:
-        """Получает все расписания пользователя"""
-        return self.schedules.get(user_id, {})
-    
-    def analyze_schedule(self, user_id: int) -> str:
-        """Анализирует расписание и дает советы"""
-        user_schedules = self.get_user_schedules(user_id)
-        
-        if not user_schedules:
-            return "📝 У вас пока нет расписаний. Добавьте их для получения анализа!"
-        
-        analysis = "🔍 Анализ вашего расписания:\n\n"
-        
-        # Анализ по типам событий
-        study_count = 0
-        work_count = 0
-        total_events = 0
-        
-        for date_key, events in user_schedules.items():
-            for event in events:
-                total_events += 1
-                if event.get('type') == 'study':
-                    study_count += 1
-                elif event.get('type') == 'work':
-                    work_count += 1
-        
-        analysis += f"📊 Общая статистика:\n"
-        analysis += f"• Всего событий: {total_events}\n"
-        analysis += f"• Учебных: {study_count}\n"
-        analysis += f"• Рабочих: {work_count}\n\n"
-        
-        # Словарь для русских названий дней недели
-        weekdays_ru = {
-            'Monday': 'Понедельник',
-            'Tuesday': 'Вторник',
-            'Wednesday': 'Среда',
-            'Thursday': 'Четверг',
-            'Friday': 'Пятница',
-            'Saturday': 'Суббота',
-            'Sunday': 'Воскресенье'
-        }
-        
-        # Анализ по дням недели
-        weekday_stats = {}
-        for date_key, events in user_schedules.items():
-            try:
-                date_obj = datetime.strptime(date_key, '%Y-%m-%d')
-                english_weekday = date_obj.strftime('%A')
-                russian_weekday = weekdays_ru.get(english_weekday, english_weekday)
-                
-                if russian_weekday not in weekday_stats:
-                    weekday_stats[russian_weekday] = 0
-                weekday_stats[russian_weekday] += len(events)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"⚠️ Ошибка парсинга даты '{date_key}': {e}")
-                continue
-            except Exception as e:
-                logger.warning(f"⚠️ Неожиданная ошибка при анализе даты '{date_key}': {e}")
-                continue
-        
-        # Самый загруженный день
-        if weekday_stats:
-            busiest_day = max(weekday_stats.items(), key=lambda x: x[1])
-            analysis += f"📅 Самый загруженный день: {busiest_day[0]} ({busiest_day[1]} событий)\n\n"
-        
-        # Советы
-        analysis += "💡 Советы:\n"
-        if total_events > 15:
-            analysis += "• У вас очень насыщенное расписание! Рассмотрите делегирование.\n"
-        elif total_events > 10:
-            analysis += "• Хорошая загруженность! Не забудьте про отдых.\n"
-        elif total_events > 5:
-            analysis += "• Умеренная загруженность. Можно добавить больше активности.\n"
-        else:
-            analysis += "• Легкая загруженность. Отличное время для новых проектов!\n"
-        
-        if study_count > work_count * 2:
-            analysis += "• Большой акцент на учебе - отличная инвестиция в будущее!\n"
-        elif work_count > study_count * 2:
-            analysis += "• Много рабочих событий - не забывайте про развитие!\n"
-        
-        return analysis
+@app.route('/metrics')
+def metrics():
+    """Метрики бота"""
+    return jsonify({
+        "storage_writes": schedule_manager.writer.stats(),
+        "handlers": dispatcher.stats(),
+        "last_broadcast": broadcaster.last_stats,
+        "reminders": reminder_scheduler.stats(),
+        "conversations": conversations.stats(),
+        "user_stats": schedule_manager.stats.info(),
+        "dates": schedule_manager.dates.stats(),
+        "routes": {"text": text_router.stats(), "callbacks": callback_router.stats()},
+        "keyboards": keyboard_stats(),
+        "webhook": webhook_counters(queued=update_queue.qsize())
+    })
+
+# Очередь обновлений webhook: Flask только принимает их, обработка идет в отдельном потоке
+update_queue = queue.Queue(maxsize=config.WEBHOOK_QUEUE_SIZE)
+webhook_stats = {"received": 0, "rejected": 0, "dropped": 0}
+webhook_stats_lock = threading.Lock()  # Flask обрабатывает запросы в нескольких потоках
+
+def count_webhook(key: str):
+    """Увеличивает счетчик webhook"""
+    with webhook_stats_lock:
+        webhook_stats[key] += 1
+
+def webhook_counters(**extra) -> dict:
+    """Согласованная копия счетчиков webhook"""
+    with webhook_stats_lock:
+        return dict(webhook_stats, **extra)
+
+@app.route(config.WEBHOOK_PATH, methods=['POST'])
+def webhook():
+    """Прием обновлений от Telegram в режиме webhook"""
+    secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(secret, WEBHOOK_SECRET):
+        count_webhook("rejected")
+        return jsonify({"error": "forbidden"}), 403
     
-    def get_smart_recommendations(self, user_id: int) -> str:
-        """Генерирует краткие рекомендации по расписанию"""
-        if user_id not in self.schedules:
-            return "📊 Рекомендации\n\nДобавьте события для получения советов!"
-        
-        result = "🤖 Рекомендации ИИ:\n\n"
-        
-        # Считаем события
-        total_events = sum(len(events) for events in self.schedules[user_id].values())
-        study_count = sum(1 for events in self.schedules[user_id].values() 
-                         for event in events if event.get('type') == 'study')
-        work_count = sum(1 for events in self.schedules[user_id].values() 
-                        for event in events if event.get('type') == 'work')
-        
-        # Краткая статистика
-        result += f"📊 Статистика: {total_events} событий\n"
-        result += f"📚 Учеба: {study_count} | 💼 Работа: {work_count}\n\n"
-        
-        # Основные рекомендации
-        if total_events == 0:
-            result += "💡 Добавьте события в расписание\n"
-        elif total_events < 5:
-            result += "💡 Добавьте больше событий\n"
-        elif total_events > 15:
-            result += "⚠️ Слишком много событий - добавьте отдых\n"
-        else:
-            result += "✅ Хорошее количество событий\n"
-        
-        # Баланс
-        if study_count > work_count * 2:
-            result += "📚 Много учебы - добавьте работу\n"
-        elif work_count > study_count * 2:
-            result += "💼 Много работы - добавьте учебу\n"
-        else:
-            result += "⚖️ Хороший баланс учеба/работа\n"
-        
-        result += "\n🎯 Используйте ИИ-планировщик для оптимизации!"
-        
-        return result
-    
-    def get_smart_work_schedule(self, user_id: int, current_communications: int) -> str:
-        """Генерирует умное рабочее расписание на основе текущих коммуникаций"""
-        try:
-            # Определяем текущий месяц и декаду
-            now = datetime.now()
-            current_month = now.month
-            current_day = now.day
-            
-            # Цели
-            monthly_goal = 1000
-            decade_goal = 300
-            
-            # Определяем декаду (1-10, 11-20, 21-31)
-            if current_day <= 10:
-                decade = 1
-                decade_start = 1
-                decade_end = 10
-            elif current_day <= 20:
-                decade = 2
-                decade_start = 11
-                decade_end = 20
-            else:
-                decade = 3
-                decade_start = 21
-                decade_end = 31
-            
-            # Рассчитываем оставшиеся дни
-            days_in_month = (now.replace(month=now.month % 12 + 1, day=1) - timedelta(days=1)).day
-            remaining_days_in_month = days_in_month - current_day + 1
-            remaining_days_in_decade = decade_end - current_day + 1
-            
-            # Рассчитываем необходимые коммуникации
-            remaining_monthly = monthly_goal - current_communications
-            remaining_decade = decade_goal - current_communications
-            
-            # Используем более критичную цель
-            if remaining_decade > 0:
-                target_communications = remaining_decade
-                target_period = f"декаду (до {decade_end} числа)"
-                target_days = remaining_days_in_decade
-            else:
-                target_communications = remaining_monthly
-                target_period = f"месяц (до конца месяца)"
-                target_days = remaining_days_in_month
-            
-            # Автоматическое планирование рабочей смены
-            auto_plan = self.auto_plan_work_shift(user_id, target_communications)
-            
-            result = f"🤖 ИИ-планировщик для работы:\n\n"
-            result += f"📊 Текущий прогресс: {current_communications} коммуникаций\n"
-            result += f"🎯 Цель на {target_period}: {target_communications} коммуникаций\n"
-            result += f"⏰ Осталось дней: {target_days}\n"
-            result += f"📈 Нужно в день: {target_communications / target_days:.1f}\n\n"
-            
-            result += f"🚀 Автоматический план:\n{auto_plan}"
-            
-            return result
-            
-        except (ValueError, TypeError) as e:
-            logger.error(f"❌ Ошибка валидации в ИИ-планировщике: {e}")
-            return f"❌ Ошибка валидации данных: {e}"
-        except Exception as e:
-            logger.error(f"❌ Неожиданная ошибка в ИИ-планировщике: {e}")
-            return f"❌ Неожиданная ошибка: {e}"
+    try:
+        update = telebot.types.Update.de_json(request.get_data(as_text=True))
+    except Exception as e:
+        logger.warning(f"⚠️ Некорректное обновление webhook: {e}")
+        return jsonify({"error": "bad request"}), 400
     
-    def auto_plan_work_shift(self, user_id: int, target_communications: int) -> str:
-        """Автоматически планирует оптимальную рабочую смену"""
-        try:
-            # Проверяем валидность target_communications
-            if target_communications <= 0:
-                return "❌ Некорректная цель: количество коммуникаций должно быть больше 0"
-            
-            # Словарь для русских названий дней недели (выносим за цикл)
-            weekdays_ru = {
-                'Monday': 'Понедельник',
-                'Tuesday': 'Вторник',
-                'Wednesday': 'Среда',
-                'Thursday': 'Четверг',
-                'Friday': 'Пятница',
-                'Saturday': 'Суббота',
-                'Sunday': 'Воскресенье'
-            }
-            
-            # Находим свободные слоты на ближайшие 7 дней
-            available_slots = []
-            
-            for i in range(7):
-                check_date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                
-                # Проверяем существующие события
-                existing_events = self.schedules.get(user_id, {}).get(check_date, [])
-                
-                # Ищем свободные 4-часовые слоты
-                for hour in range(9, 18):  # 9:00 - 18:00
-                    slot_start = f"{hour:02d}:00"
-                    slot_end = f"{hour + 4:02d}:00"
-                    
-                    # Проверяем конфликты
-                    conflict = False
-                    for event in existing_events:
-                        event_start = event.get('time', '').split('-')[0].strip()
-                        event_end = event.get('time', '').split('-')[-1].strip()
-                        
-                        # Простая проверка пересечения времени
-                        if (slot_start < event_end and slot_end > event_start):
-                            conflict = True
-                            break
-                    
-                    if not conflict:
-                        # Получаем русское название дня недели
-                        english_day = (datetime.now() + timedelta(days=i)).strftime('%A')
-                        russian_day = weekdays_ru.get(english_day, english_day)
-                        
-                        available_slots.append({
-                            'date': check_date,
-                            'start': slot_start,
-                            'end': slot_end,
-                            'day_name': russian_day
-                        })
-            
-            if not available_slots:
-                return "❌ Нет свободных слотов на ближайшие 7 дней"
-            
-            # Выбираем лучший слот (приоритет: сегодня, завтра, затем по дням)
-            best_slot = available_slots[0]
-            
-            # Рассчитываем возможные коммуникации (13 в час)
-            hours = 4
-            possible_communications = int(hours * 13)
-            
-            result = f"📅 Рекомендуемая смена:\n"
-            result += f"• Дата: {best_slot['day_name']} ({best_slot['date']})\n"
-            result += f"• Время: {best_slot['start']} - {best_slot['end']}\n"
-            result += f"• Длительность: {hours} часа\n"
-            result += f"• Ожидаемые коммуникации: {possible_communications}\n"
-            result += f"• Прогресс к цели: {possible_communications / target_communications * 100:.1f}%\n\n"
-            
-            if possible_communications >= target_communications:
-                result += "✅ Эта смена поможет достичь цели!"
-            else:
-                result += f"⚠️ Нужно еще {target_communications - possible_communications} коммуникаций"
-            
-            return result
-            
-        except (ValueError, TypeError) as e:
-            logger.error(f"❌ Ошибка валидации в авто-планировании: {e}")
-            return f"❌ Ошибка валидации данных: {e}"
-        except Exception as e:
-            logger.error(f"❌ Неожиданная ошибка в авто-планировании: {e}")
-            return f"❌ Неожиданная ошибка: {e}"
+    try:
+        update_queue.put_nowait(update)
+    except queue.Full:
+        # Telegram повторит доставку позже
+        count_webhook("dropped")
+        return jsonify({"error": "busy"}), 503
     
+    count_webhook("received")
+    return '', 200
 
+def run_flask():
+    """Запускает Flask в отдельном потоке"""
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
+
+# Состояния диалогов: забываются через CONVERSATION_TTL_MINUTES, переживают перезапуск
+conversations = ConversationStore(
+    ttl=config.CONVERSATION_TTL_MINUTES * 60,
+    max_users=config.CONVERSATION_MAX_USERS,
+    path=config.CONVERSATIONS_FILE,
+    flush_interval=config.WRITE_FLUSH_INTERVAL_SECONDS
+)
 
 # Инициализация менеджера расписания
 schedule_manager = ScheduleManager()
 
+# Официальное расписание из PDF: обновляется в фоне, сообщения готовятся заранее
+timetable_parser = ScheduleParser(
+    config.GOOGLE_DRIVE_URL,
+    default_group=config.DEFAULT_GROUP,
+    cache_dir=config.PDF_CACHE_DIR,
+    extract_workers=config.PDF_EXTRACT_WORKERS,
+    parallel_min_pages=config.PDF_PARALLEL_MIN_PAGES,
+    debug=config.PARSER_DEBUG,
+    trace_path=config.PARSER_TRACE_FILE
+)
+timetable_cache = TimetableCache(timetable_parser, max_length=config.MAX_MESSAGE_LENGTH)
+
 # Получение токена бота
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 if not BOT_TOKEN:
     logger.error("❌ BOT_TOKEN не найден в переменных окружения!")
     exit(1)
 
-# Инициализация бота
-bot = telebot.TeleBot(BOT_TOKEN)
+# Инициализация бота: обработчики выполняются в пуле потоков, по порядку для каждого пользователя
+dispatcher = UpdateDispatcher(workers=config.HANDLER_WORKERS, queue_size=config.HANDLER_QUEUE_SIZE)
+bot = DispatchingTeleBot(BOT_TOKEN, dispatcher)
+
+# Рассылка напоминаний с учетом лимитов Telegram и журналом для возобновления
+broadcaster = Broadcaster(
+    bot.send_message,
+    config.BROADCAST_CHECKPOINT_DIR,
+    workers=config.BROADCAST_WORKERS,
+    global_rate=config.BROADCAST_GLOBAL_RATE,
+    per_chat_rate=config.BROADCAST_PER_CHAT_RATE,
+    max_retries=config.BROADCAST_MAX_RETRIES,
+    max_chat_buckets=config.BROADCAST_CHAT_BUCKETS
+)
+
+# Ежедневные напоминания и напоминания перед событиями по местному времени пользователей
+reminder_scheduler = ReminderScheduler(schedule_manager, broadcaster)
+
+# Секрет webhook одинаков у всех экземпляров: при редеплое старый и новый принимают одни и те же запросы
+WEBHOOK_SECRET = config.WEBHOOK_SECRET or hashlib.sha256(BOT_TOKEN.encode()).hexdigest()
 
 # Флаг для корректного завершения
 shutdown_flag = False
@@ -560,66 +173,30 @@ def signal_handler(signum, frame):
     except:
         pass
     
+    # Дожидаемся уже принятых обработчиков, чтобы их записи попали на диск
+    try:
+        dispatcher.stop(timeout=10)
+    except Exception as e:
+        logger.error(f"❌ Ошибка остановки обработчиков: {e}")
+    
+    # Сохраняем накопленные записи расписаний
+    try:
+        schedule_manager.flush()
+        logger.info(f"💾 Записи сохранены: {schedule_manager.writer.stats()}")
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения при завершении: {e}")
+    
+    try:
+        conversations.close()
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения диалогов: {e}")
+    
     sys.exit(0)
 
 # Регистрируем обработчики сигналов
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
-# Клавиатуры
-def get_main_keyboard() -> InlineKeyboardMarkup:
-    """Главная клавиатура (оптимизированная для мобильных)"""
-    keyboard = [
-        [
-            InlineKeyboardButton("➕ Добавить", callback_data="add_menu")
-        ],
-        [
-            InlineKeyboardButton("📅 Показать", callback_data="show_menu")
-        ],
-        [
-            InlineKeyboardButton("🤖 ИИ-планировщик", callback_data="ai_planner")
-        ],
-        [
-            InlineKeyboardButton("📊 Статистика", callback_data="statistics")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_add_menu_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура меню добавления"""
-    keyboard = [
-        [
-            InlineKeyboardButton("📚 Учеба", callback_data="add_study"),
-            InlineKeyboardButton("💼 Работа", callback_data="add_work")
-        ],
-        [
-            InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_show_menu_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура меню просмотра"""
-    keyboard = [
-        [
-            InlineKeyboardButton("📅 На дату", callback_data="show_date"),
-            InlineKeyboardButton("📊 На неделю", callback_data="show_week")
-        ],
-        [
-            InlineKeyboardButton("🌅 Сегодня", callback_data="show_today"),
-            InlineKeyboardButton("🤖 Рекомендации", callback_data="smart_recommendations")
-        ],
-        [
-            InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_back_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура с кнопкой "Назад" """
-    keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")]]
-    return InlineKeyboardMarkup(keyboard)
-
 # Обработчики команд
 @bot.message_handler(commands=['start'])
 def cmd_start(message):
@@ -627,20 +204,7 @@ def cmd_start(message):
     user_id = message.from_user.id
     user_name = message.from_user.first_name
     
-    welcome_text = f"""
-👋 Привет, {user_name}!
-
-Я ваш персональный помощник по расписанию! 🗓️
-
-Что я умею:
-• 📚 Добавлять учебное расписание
-• 💼 Добавлять рабочее расписание  
-• 🤖 ИИ-планировщик для работы
-• 📊 Анализ и рекомендации
-• 🌅 Ежедневные напоминания
-
-Выберите действие:
-"""
+    welcome_text = WELCOME_TEXT.format(user_name=user_name)
     
     bot.reply_to(message, welcome_text, reply_markup=get_main_keyboard())
     logger.info(f"🚀 Пользователь {user_id} запустил бота")
@@ -648,35 +212,7 @@ def cmd_start(message):
 @bot.message_handler(commands=['help'])
 def cmd_help(message):
     """Обработчик команды /help"""
-    help_text = """
-❓ Как пользоваться ботом:
-
-➕ Добавить:
-• 📚 Учеба - введите предмет, дату и время
-• 💼 Работа - введите описание, дату и время
-
-📅 Показать:
-• 📅 На дату - расписание на конкретную дату
-• 📊 На неделю - расписание на всю неделю
-• 🌅 Сегодня - что у вас сегодня
-• 🤖 Рекомендации - советы по расписанию
-
-🤖 ИИ-планировщик:
-• Введите: ТЕКУЩИЙ_ПРОГРЕСС
-• Пример: 250
-• Бот автоматически рассчитает план
-
-📊 Статистика:
-• Общая статистика расписания
-• Анализ загруженности
-
-Примеры ввода:
-• "Математика 2 сентября 13:55-15:35"
-• "Встреча с клиентом 3 сентября 14:00-15:00"
-• "250" (для ИИ-планировщика)
-"""
-    
-    bot.reply_to(message, help_text, reply_markup=get_main_keyboard())
+    bot.reply_to(message, HELP_TEXT, reply_markup=get_main_keyboard())
 
 @bot.message_handler(commands=['recommendations'])
 def cmd_recommendations(message):
@@ -718,6 +254,99 @@ def cmd_ai_plan(message):
     
     logger.info(f"🤖 Пользователь {user_id} использовал ИИ-планировщик: {current_communications}")
 
+def send_timetable(message, parts: Optional[List[str]], empty_text: str):
+    """Отправляет готовые части сообщения официального расписания"""
+    if not timetable_cache.is_ready():
+        bot.reply_to(message, "⏳ Расписание загружается, попробуйте через минуту.", reply_markup=get_main_keyboard())
+        return
+    
+    if not parts:
+        bot.reply_to(message, empty_text, reply_markup=get_main_keyboard())
+        return
+    
+    for i, part in enumerate(parts):
+        # Клавиатура - только под последней частью
+        markup = get_main_keyboard() if i == len(parts) - 1 else None
+        bot.send_message(message.chat.id, part, reply_markup=markup)
+
+@bot.message_handler(commands=['tomorrow'])
+def cmd_tomorrow(message):
+    """Обработчик команды /tomorrow [группа]"""
+    args = message.text.split()[1:]
+    group = args[0] if args else None
+    date = (datetime.now() + timedelta(days=1)).strftime('%d.%m.%Y')
+    
+    send_timetable(message, timetable_cache.get_day(date, group), f"📅 На завтра ({date}) занятий нет.")
+    logger.info(f"🏫 Пользователь {message.from_user.id} запросил расписание на завтра")
+
+@bot.message_handler(commands=['date'])
+def cmd_date(message):
+    """Обработчик команды /date ДД.ММ.ГГГГ [группа]"""
+    args = message.text.split()[1:]
+    if not args:
+        bot.reply_to(message, 
+            "❌ Неправильный формат!\n\n"
+            "Используйте: /date ДД.ММ.ГГГГ [группа]\n"
+            "Пример: /date 02.09.2025 302Ф",
+            reply_markup=get_main_keyboard())
+        return
+    
+    try:
+        # Год можно не указывать: /date 02.09
+        date_parts = args[0].split('.')
+        if len(date_parts) == 2:
+            date_parts.append(str(datetime.now().year))
+        date = datetime.strptime('.'.join(date_parts), '%d.%m.%Y').strftime('%d.%m.%Y')
+    except ValueError:
+        bot.reply_to(message, 
+            "❌ Неправильная дата!\n\n"
+            "Пример: /date 02.09.2025",
+            reply_markup=get_main_keyboard())
+        return
+    
+    group = args[1] if len(args) > 1 else None
+    send_timetable(message, timetable_cache.get_day(date, group), f"📅 На {date} занятий нет.")
+    logger.info(f"🏫 Пользователь {message.from_user.id} запросил расписание на {date}")
+
+@bot.message_handler(commands=['week'])
+def cmd_week(message):
+    """Обработчик команды /week [группа]"""
+    args = message.text.split()[1:]
+    group = args[0] if args else None
+    
+    groups = ', '.join(timetable_parser.get_groups())
+    send_timetable(message, timetable_cache.get_week(group), f"❌ Группа не найдена. Доступные группы: {groups}")
+    logger.info(f"🏫 Пользователь {message.from_user.id} запросил расписание на неделю")
+
+@bot.message_handler(commands=['settings'])
+def cmd_settings(message):
+    """Обработчик команды /settings"""
+    bot.reply_to(message, schedule_manager.format_user_settings(message.from_user.id), reply_markup=get_main_keyboard())
+
+@bot.message_handler(commands=['timezone', 'remind_at', 'remind_before'])
+def cmd_reminder_settings(message):
+    """Обработчик команд /timezone, /remind_at, /remind_before"""
+    user_id = message.from_user.id
+    command, *args = message.text.split()
+    if not args:
+        bot.reply_to(message, schedule_manager.format_user_settings(user_id), reply_markup=get_main_keyboard())
+        return
+    
+    field = {'/timezone': 'timezone', '/remind_at': 'reminder_time', '/remind_before': 'remind_before'}[command.split('@')[0]]
+    result = schedule_manager.update_user_settings(user_id, **{field: args[0]})
+    bot.reply_to(message, result, reply_markup=get_main_keyboard())
+    logger.info(f"⚙️ Пользователь {user_id} изменил настройки: {field} = {args[0]}")
+
+# Маршруты: шаг диалога -> обработчик текста, callback_data -> обработчик кнопки
+text_router = Router('text')
+callback_router = Router('callbacks')
+
+def report_failure(user_id: int, chat_id: int, error: Exception):
+    """Сбрасывает шаг диалога и сообщает пользователю об ошибке обработчика"""
+    logger.error(f"❌ Ошибка обработки для пользователя {user_id}: {error}")
+    conversations.clear(user_id)
+    bot.send_message(chat_id, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
+
 # Обработчик текстовых сообщений
 @bot.message_handler(func=lambda message: True)
 def handle_text(message):
@@ -725,336 +354,276 @@ def handle_text(message):
     user_id = message.from_user.id
     text = message.text.strip()
     
-    if user_id not in user_states:
-        bot.reply_to(message, "Выберите действие в главном меню:", reply_markup=get_main_keyboard())
+    state = conversations.get(user_id)
+    try:
+        routed = state is not None and text_router.dispatch(state.step, message, user_id, state, text)
+    except Exception as e:
+        report_failure(user_id, message.chat.id, e)
         return
+    if not routed:
+        bot.reply_to(message, "Выберите действие в главном меню:", reply_markup=get_main_keyboard())
+
+@text_router.route(STUDY_SUBJECT, WORK_DESCRIPTION)
+def on_event_title(message, user_id, state, text):
+    """Название события: дата и время уже введены на предыдущем шаге"""
+    event_type = "study" if state.step == STUDY_SUBJECT else "work"
+    result = schedule_manager.add_event(user_id, state.date_text, state.time_text, text, event_type)
+    bot.reply_to(message, result, reply_markup=get_main_keyboard())
     
-    state = user_states[user_id]
-    
-    if state.startswith("waiting_for_study_subject_"):
-        # Парсим дату и время из состояния
-        try:
-            state_parts = state.split('_', 4)
-            if len(state_parts) >= 5:
-                date_text = state_parts[3]
-                time_text = state_parts[4]
-                
-                # Добавляем событие
-                result = schedule_manager.add_event(user_id, date_text, time_text, text, "study")
-                bot.reply_to(message, result, reply_markup=get_main_keyboard())
-                
-                # Очищаем состояние
-                del user_states[user_id]
-                logger.info(f"📚 Пользователь {user_id} добавил учебное событие: {text}")
-            else:
-                bot.reply_to(message, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга состояния: {e}")
-            bot.reply_to(message, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
-    
-    elif state.startswith("waiting_for_work_description_"):
-        # Парсим дату и время из состояния
-        try:
-            state_parts = state.split('_', 4)
-            if len(state_parts) >= 5:
-                date_text = state_parts[3]
-                time_text = state_parts[4]
-                
-                # Добавляем событие
-                result = schedule_manager.add_event(user_id, date_text, time_text, text, "work")
-                bot.reply_to(message, result, reply_markup=get_main_keyboard())
-                
-                # Очищаем состояние
-                del user_states[user_id]
-                logger.info(f"💼 Пользователь {user_id} добавил рабочее событие: {text}")
-            else:
-                bot.reply_to(message, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга состояния: {e}")
-            bot.reply_to(message, "❌ Ошибка! Попробуйте снова.", reply_markup=get_main_keyboard())
-    
-    elif state == "waiting_for_ai_plan":
-        try:
-            current_communications = int(text)
-            if current_communications < 0:
-                raise ValueError("Отрицательное число")
-            
-            # Получаем умное расписание
-            smart_schedule = schedule_manager.get_smart_work_schedule(user_id, current_communications)
-            bot.reply_to(message, smart_schedule, reply_markup=get_main_keyboard())
-            
-            # Очищаем состояние
-            del user_states[user_id]
-            logger.info(f"🤖 Пользователь {user_id} использовал ИИ-планировщик: {current_communications}")
-            
-        except ValueError:
-            bot.reply_to(message, 
-                "❌ Неправильный формат!\n\n"
-                "Введите положительное число коммуникаций.\n"
-                "Пример: 250",
-                reply_markup=get_main_keyboard())
+    # Очищаем состояние
+    conversations.clear(user_id)
+    emoji = "📚" if event_type == "study" else "💼"
+    logger.info(f"{emoji} Пользователь {user_id} добавил событие ({event_type}): {text}")
+
+@text_router.route(AI_PLAN)
+def on_ai_plan(message, user_id, state, text):
+    try:
+        current_communications = int(text)
+        if current_communications < 0:
+            raise ValueError("Отрицательное число")
+    except ValueError:
+        bot.reply_to(message, 
+            "❌ Неправильный формат!\n\n"
+            "Введите положительное число коммуникаций.\n"
+            "Пример: 250",
+            reply_markup=get_main_keyboard())
+        return
     
-    elif state == "waiting_for_study_datetime":
-        # Парсим дату и время
-        try:
-            parts = text.split()
-            if len(parts) >= 3:
-                day = parts[0]
-                month = parts[1]
-                time_range = parts[2]
-                
-                date_text = f"{day} {month}"
-                time_text = time_range
-                
-                # Устанавливаем состояние ожидания предмета (без подчеркиваний)
-                user_states[user_id] = f"waiting_for_study_subject_{date_text}_{time_text}"
-                
-                bot.reply_to(message, 
-                    f"📚 Отлично! Дата: {date_text}, Время: {time_text}\n\n"
-                    "Теперь введите название предмета:",
-                    reply_markup=get_back_keyboard())
-            else:
-                bot.reply_to(message, 
-                    "❌ Неправильный формат!\n\n"
-                    "Используйте: 2 сентября 13:55-15:35",
-                    reply_markup=get_back_keyboard())
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга даты/времени: {e}")
-            bot.reply_to(message, 
-                "❌ Ошибка! Попробуйте снова.",
-                reply_markup=get_back_keyboard())
+    # Получаем умное расписание
+    smart_schedule = schedule_manager.get_smart_work_schedule(user_id, current_communications)
+    bot.reply_to(message, smart_schedule, reply_markup=get_main_keyboard())
     
-    elif state == "waiting_for_work_datetime":
-        # Парсим дату и время
-        try:
-            parts = text.split()
-            if len(parts) >= 3:
-                day = parts[0]
-                month = parts[1]
-                time_range = parts[2]
-                
-                date_text = f"{day} {month}"
-                time_text = time_range
-                
-                # Устанавливаем состояние ожидания описания работы (без подчеркиваний)
-                user_states[user_id] = f"waiting_for_work_description_{date_text}_{time_text}"
-                
-                bot.reply_to(message, 
-                    f"💼 Отлично! Дата: {date_text}, Время: {time_text}\n\n"
-                    "Теперь введите описание работы:",
-                    reply_markup=get_back_keyboard())
-            else:
-                bot.reply_to(message, 
-                    "❌ Неправильный формат!\n\n"
-                    "Используйте: 2 сентября 14:00-15:00",
-                    reply_markup=get_back_keyboard())
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга даты/времени для работы: {e}")
-            bot.reply_to(message, 
-                "❌ Ошибка! Попробуйте снова.",
-                reply_markup=get_back_keyboard())
+    # Очищаем состояние
+    conversations.clear(user_id)
+    logger.info(f"🤖 Пользователь {user_id} использовал ИИ-планировщик: {current_communications}")
+
+@text_router.route(STUDY_DATETIME, WORK_DATETIME)
+def on_event_datetime(message, user_id, state, text):
+    """Дата и время события, например: 2 сентября 13:55-15:35"""
+    is_study = state.step == STUDY_DATETIME
+    parts = text.split()
+    if len(parts) < 2:
+        example = "2 сентября 13:55-15:35" if is_study else "2 сентября 14:00-15:00"
+        bot.reply_to(message, 
+            "❌ Неправильный формат!\n\n"
+            f"Используйте: {example}",
+            reply_markup=get_back_keyboard())
+        return
     
-    elif state == "waiting_for_date":
-        # Показываем расписание на указанную дату
-        schedule_text = schedule_manager.get_date_schedule(user_id, text)
-        bot.reply_to(message, schedule_text, reply_markup=get_main_keyboard())
-        
-        # Очищаем состояние
-        del user_states[user_id]
-        logger.info(f"📅 Пользователь {user_id} запросил расписание на дату: {text}")
+    # Время - последнее слово, дата - все перед ним ("2 сентября", "завтра")
+    date_text = ' '.join(parts[:-1])
+    time_text = parts[-1]
     
+    # Ждем название события, дата и время хранятся в состоянии
+    if is_study:
+        conversations.set(user_id, STUDY_SUBJECT, date_text, time_text)
+        prompt = f"📚 Отлично! Дата: {date_text}, Время: {time_text}\n\nТеперь введите название предмета:"
     else:
-        bot.reply_to(message, "Выберите действие в главном меню:", reply_markup=get_main_keyboard())
+        conversations.set(user_id, WORK_DESCRIPTION, date_text, time_text)
+        prompt = f"💼 Отлично! Дата: {date_text}, Время: {time_text}\n\nТеперь введите описание работы:"
+    bot.reply_to(message, prompt, reply_markup=get_back_keyboard())
+
+@text_router.route(DATE_QUERY)
+def on_date_query(message, user_id, state, text):
+    # Показываем расписание на указанную дату
+    schedule_text = schedule_manager.get_date_schedule(user_id, text)
+    bot.reply_to(message, schedule_text, reply_markup=get_main_keyboard())
+    
+    # Очищаем состояние
+    conversations.clear(user_id)
+    logger.info(f"📅 Пользователь {user_id} запросил расписание на дату: {text}")
 
 # Обработчик callback-запросов
 @bot.callback_query_handler(func=lambda call: True)
 def process_callback(call):
     """Обработчик нажатий на кнопки"""
-    user_id = call.from_user.id
-    data = call.data
-    
     bot.answer_callback_query(call.id)
     
-    if data == "add_menu":
-        bot.edit_message_text(
-            "➕ Выберите тип события для добавления:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_add_menu_keyboard()
-        )
-        logger.info(f"➕ Пользователь {user_id} открыл меню добавления")
-    
-    elif data == "show_menu":
-        bot.edit_message_text(
-            "📅 Выберите что показать:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_show_menu_keyboard()
-        )
-        logger.info(f"📅 Пользователь {user_id} открыл меню просмотра")
-    
-    elif data == "add_study":
-        bot.edit_message_text(
-            "📚 Добавление учебного события\n\n"
-            "Введите дату и время в формате:\n"
-            "2 сентября 13:55-15:35\n\n"
-            "Затем введите название предмета:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        
-        # Устанавливаем состояние ожидания даты и времени
-        user_states[user_id] = "waiting_for_study_datetime"
-        logger.info(f"📚 Пользователь {user_id} начал добавление учебного события")
-    
-    elif data == "add_work":
-        bot.edit_message_text(
-            "💼 Добавление рабочего события\n\n"
-            "Введите дату и время в формате:\n"
-            "2 сентября 14:00-15:00\n\n"
-            "Затем введите описание работы:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        
-        # Устанавливаем состояние ожидания даты и времени
-        user_states[user_id] = "waiting_for_work_datetime"
-        logger.info(f"💼 Пользователь {user_id} начал добавление рабочего события")
-    
-    elif data == "show_date":
-        bot.edit_message_text(
-            "📅 Введите дату в формате:\n"
-            "2 сентября\n\n"
-            "Или выберите действие:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        user_states[user_id] = "waiting_for_date"
+    try:
+        routed = callback_router.dispatch(call.data, call)
+    except Exception as e:
+        report_failure(call.from_user.id, call.message.chat.id, e)
+        return
+    if not routed:
+        logger.warning(f"⚠️ Неизвестная кнопка от пользователя {call.from_user.id}: {call.data}")
+
+def edit_screen(call, text: str, reply_markup):
+    """Заменяет сообщение с кнопками новым экраном"""
+    bot.edit_message_text(
+        text,
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        reply_markup=reply_markup
+    )
+
+@callback_router.route("add_menu")
+def cb_add_menu(call):
+    edit_screen(call, "➕ Выберите тип события для добавления:", get_add_menu_keyboard())
+    logger.info(f"➕ Пользователь {call.from_user.id} открыл меню добавления")
+
+@callback_router.route("show_menu")
+def cb_show_menu(call):
+    edit_screen(call, "📅 Выберите что показать:", get_show_menu_keyboard())
+    logger.info(f"📅 Пользователь {call.from_user.id} открыл меню просмотра")
+
+@callback_router.route("add_study")
+def cb_add_study(call):
+    edit_screen(call,
+        "📚 Добавление учебного события\n\n"
+        "Введите дату и время в формате:\n"
+        "2 сентября 13:55-15:35\n"
+        "(дата также: завтра, в пятницу, 05.09)\n\n"
+        "Затем введите название предмета:",
+        get_back_keyboard())
+    
+    # Устанавливаем состояние ожидания даты и времени
+    conversations.set(call.from_user.id, STUDY_DATETIME)
+    logger.info(f"📚 Пользователь {call.from_user.id} начал добавление учебного события")
+
+@callback_router.route("add_work")
+def cb_add_work(call):
+    edit_screen(call,
+        "💼 Добавление рабочего события\n\n"
+        "Введите дату и время в формате:\n"
+        "2 сентября 14:00-15:00\n"
+        "(дата также: завтра, в пятницу, 05.09)\n\n"
+        "Затем введите описание работы:",
+        get_back_keyboard())
+    
+    # Устанавливаем состояние ожидания даты и времени
+    conversations.set(call.from_user.id, WORK_DATETIME)
+    logger.info(f"💼 Пользователь {call.from_user.id} начал добавление рабочего события")
+
+@callback_router.route("show_date")
+def cb_show_date(call, date_text: Optional[str] = None):
+    """show_date - спросить дату, show_date:YYYY-MM-DD - сразу показать расписание"""
+    if date_text:
+        # День выбран кнопкой - ввод даты текстом больше не ждем
+        conversations.clear(call.from_user.id)
+        edit_screen(call, schedule_manager.get_date_schedule(call.from_user.id, date_text), get_back_keyboard())
+        return
     
+    edit_screen(call,
+        "📅 Введите дату в формате:\n"
+        "2 сентября (или: завтра, в пятницу, 05.09)\n\n"
+        "Или выберите день:",
+        get_date_picker_keyboard(datetime.now().strftime('%Y-%m-%d')))
+    conversations.set(call.from_user.id, DATE_QUERY)
+
+@callback_router.route("show_week")
+def cb_show_week(call):
+    edit_screen(call, schedule_manager.get_week_schedule(call.from_user.id), get_back_keyboard())
+    logger.info(f"📊 Пользователь {call.from_user.id} запросил недельное расписание")
+
+@callback_router.route("show_today")
+def cb_show_today(call):
+    edit_screen(call, schedule_manager.get_today_schedule(call.from_user.id), get_back_keyboard())
+    logger.info(f"🌅 Пользователь {call.from_user.id} запросил сегодняшнее расписание")
+
+@callback_router.route("smart_recommendations")
+def cb_smart_recommendations(call):
+    edit_screen(call, schedule_manager.get_smart_recommendations(call.from_user.id), get_back_keyboard())
+    logger.info(f"🤖 Пользователь {call.from_user.id} запросил рекомендации")
+
+@callback_router.route("ai_planner")
+def cb_ai_planner(call):
+    edit_screen(call,
+        "🤖 ИИ-планировщик для работы\n\n"
+        "Введите текущее количество коммуникаций:\n"
+        "Пример: 250\n\n"
+        "Бот автоматически рассчитает:\n"
+        "• Оставшиеся цели\n"
+        "• Оптимальное расписание\n"
+        "• Рекомендации",
+        get_back_keyboard())
+    conversations.set(call.from_user.id, AI_PLAN)
+    logger.info(f"🤖 Пользователь {call.from_user.id} открыл ИИ-планировщик")
+
+@callback_router.route("statistics")
+def cb_statistics(call):
+    edit_screen(call, schedule_manager.analyze_schedule(call.from_user.id), get_back_keyboard())
+    logger.info(f"📊 Пользователь {call.from_user.id} запросил статистику")
+
+@callback_router.route("back_to_main")
+def cb_back_to_main(call):
+    edit_screen(call, "🏠 Главное меню\n\nВыберите действие:", get_main_keyboard())
+    logger.info(f"🏠 Пользователь {call.from_user.id} вернулся в главное меню")
 
+# Главная функция
+def main():
+    """Главная функция"""
+    logger.info("🚀 Запуск бота...")
     
-    elif data == "show_week":
-        schedule_text = schedule_manager.get_week_schedule(user_id)
-        bot.edit_message_text(
-            schedule_text,
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        logger.info(f"📊 Пользователь {user_id} запросил недельное расписание")
+    # Запускаем Flask в отдельном потоке для Render.com
+    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    flask_thread.start()
+    logger.info("🌐 Flask запущен в отдельном потоке")
     
-    elif data == "show_today":
-        schedule_text = schedule_manager.get_today_schedule(user_id)
-        bot.edit_message_text(
-            schedule_text,
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        logger.info(f"🌅 Пользователь {user_id} запросил сегодняшнее расписание")
+    # Пул обработчиков обновлений
+    dispatcher.start()
     
-    elif data == "smart_recommendations":
-        recommendations = schedule_manager.get_smart_recommendations(user_id)
-        bot.edit_message_text(
-            recommendations,
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        logger.info(f"🤖 Пользователь {user_id} запросил рекомендации")
+    # Официальное расписание: прогрев и фоновое обновление
+    timetable_parser.start_background_refresh(config.UPDATE_INTERVAL_HOURS)
     
-    elif data == "ai_planner":
-        bot.edit_message_text(
-            "🤖 ИИ-планировщик для работы\n\n"
-            "Введите текущее количество коммуникаций:\n"
-            "Пример: 250\n\n"
-            "Бот автоматически рассчитает:\n"
-            "• Оставшиеся цели\n"
-            "• Оптимальное расписание\n"
-            "• Рекомендации",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        user_states[user_id] = "waiting_for_ai_plan"
-        logger.info(f"🤖 Пользователь {user_id} открыл ИИ-планировщик")
+    # Напоминания: поток спит до ближайшего срабатывания
+    reminder_scheduler.start()
     
-    elif data == "statistics":
-        analysis = schedule_manager.analyze_schedule(user_id)
-        bot.edit_message_text(
-            analysis,
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_back_keyboard()
-        )
-        logger.info(f"📊 Пользователь {user_id} запросил статистику")
+    if config.BOT_MODE == 'webhook' and run_webhook():
+        return
     
-    elif data == "back_to_main":
-        bot.edit_message_text(
-            "🏠 Главное меню\n\n"
-            "Выберите действие:",
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=get_main_keyboard()
-        )
-        logger.info(f"🏠 Пользователь {user_id} вернулся в главное меню")
+    run_polling()
 
-def send_daily_reminders():
-    """Отправляет ежедневные напоминания всем пользователям"""
-    try:
-        # Получаем всех пользователей
-        all_users = list(schedule_manager.schedules.keys())
+def process_update_queue():
+    """Передает обновления из очереди webhook обработчикам бота"""
+    while not shutdown_flag:
+        try:
+            update = update_queue.get(timeout=1)
+        except queue.Empty:
+            continue
         
-        for user_id in all_users:
+        # Все, что накопилось, обрабатываем одной пачкой
+        updates = [update]
+        while len(updates) < 100:
             try:
-                today_schedule = schedule_manager.get_today_schedule(user_id)
-                if "нет запланированных событий" not in today_schedule:
-                    # Отправляем напоминание
-                    bot.send_message(user_id, today_schedule)
-                    logger.info(f"🌅 Отправлено ежедневное напоминание пользователю {user_id}")
-                else:
-                    logger.info(f"📅 Пользователь {user_id} не имеет событий на сегодня")
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки напоминания пользователю {user_id}: {e}")
+                updates.append(update_queue.get_nowait())
+            except queue.Empty:
+                break
         
-        logger.info(f"✅ Ежедневные напоминания отправлены {len(all_users)} пользователям")
-    except Exception as e:
-        logger.error(f"❌ Ошибка в функции ежедневных напоминаний: {e}")
-
-def run_scheduler():
-    """Запускает планировщик задач"""
-    # Ежедневное напоминание в 8:00
-    schedule.every().day.at("08:00").do(send_daily_reminders)
-    
-    logger.info("⏰ Планировщик запущен: ежедневные напоминания в 8:00")
-    
-    while True:
         try:
-            schedule.run_pending()
-            time.sleep(60)  # Проверяем каждую минуту
+            bot.process_new_updates(updates)
         except Exception as e:
-            logger.error(f"❌ Ошибка в планировщике: {e}")
-            time.sleep(60)  # Продолжаем работу
+            logger.error(f"❌ Ошибка обработки обновлений: {e}")
 
-# Главная функция
-def main():
-    """Главная функция"""
-    logger.info("🚀 Запуск бота...")
+def run_webhook() -> bool:
+    """Режим webhook: Telegram сам присылает обновления во Flask"""
+    if not config.WEBHOOK_URL:
+        logger.error("❌ WEBHOOK_URL не задан, используем polling")
+        return False
     
-    # Запускаем Flask в отдельном потоке для Render.com
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    logger.info("🌐 Flask запущен в отдельном потоке")
+    webhook_url = config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH
+    try:
+        # set_webhook заменяет прежний адрес, конфликтов между экземплярами нет
+        bot.set_webhook(
+            url=webhook_url,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=['message', 'callback_query']
+        )
+        logger.info(f"✅ Webhook установлен: {webhook_url}")
+    except Exception as e:
+        logger.error(f"❌ Ошибка установки webhook: {e}, используем polling")
+        return False
     
-    # Запускаем планировщик в отдельном потоке
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    logger.info("⏰ Планировщик запущен в отдельном потоке")
+    worker_thread = threading.Thread(target=process_update_queue, daemon=True)
+    worker_thread.start()
+    logger.info("📥 Обработчик очереди webhook запущен")
     
-    # Запускаем бота с улучшенной обработкой Error 409
+    # Flask принимает обновления в своем потоке, здесь только ждем завершения
+    while not shutdown_flag:
+        time.sleep(1)
+    return True
+
+def run_polling():
+    """Режим long polling с обработкой Error 409"""
     max_retries = 10  # Увеличиваем количество попыток
     retry_count = 0
     
@@ -1072,21 +641,12 @@ def main():
             # Ждем завершения предыдущего экземпляра
             time.sleep(3)
             
-            # Проверяем, не запущен ли уже бот
+            # get_me только проверяет токен: ответ не значит, что обновления уже кто-то получает
             try:
                 bot_info = bot.get_me()
-                logger.info(f"✅ Бот уже активен: @{bot_info.username}")
-                # Если бот активен, просто ждем
-                while not shutdown_flag:
-                    time.sleep(60)
-                break
+                logger.info(f"✅ Бот @{bot_info.username}, запускаем polling")
             except Exception as e:
-                logger.info(f"🔄 Запускаем новый экземпляр бота: {e}")
-            
-            # Запускаем бота с уникальным offset
-            import random
-            unique_offset = random.randint(1, 10000)
-            logger.info(f"🎯 Уникальный offset: {unique_offset}")
+                logger.warning(f"⚠️ Не удалось получить данные бота: {e}")
             
             bot.polling(none_stop=True, interval=2, timeout=60)
             
@@ -1134,7 +694,8 @@ def main():
                     logger.error("❌ Превышено максимальное количество попыток запуска")
                     break
     
-    logger.error("❌ Бот не смог запуститься после всех попыток")
+    if not shutdown_flag:
+        logger.error("❌ Бот не смог запуститься после всех попыток")
     try:
         bot.stop_polling()
     except:
@@ -0,0 +1,57 @@
+# Тексты сообщений бота (общие для обычного и asyncio-режима)
+
+# Приветствие /start, подставляется {user_name}
+WELCOME_TEXT = """
+👋 Привет, {user_name}!
+
+Я ваш персональный помощник по расписанию! 🗓️
+
+Что я умею:
+• 📚 Добавлять учебное расписание
+• 💼 Добавлять рабочее расписание  
+• 🤖 ИИ-планировщик для работы
+• 📊 Анализ и рекомендации
+• 🌅 Ежедневные напоминания
+
+Выберите действие:
+"""
+
+# Справка /help
+HELP_TEXT = """
+❓ Как пользоваться ботом:
+
+➕ Добавить:
+• 📚 Учеба - введите предмет, дату и время
+• 💼 Работа - введите описание, дату и время
+
+📅 Показать:
+• 📅 На дату - расписание на конкретную дату
+• 📊 На неделю - расписание на всю неделю
+• 🌅 Сегодня - что у вас сегодня
+• 🤖 Рекомендации - советы по расписанию
+
+🤖 ИИ-планировщик:
+• Введите: ТЕКУЩИЙ_ПРОГРЕСС
+• Пример: 250
+• Бот автоматически рассчитает план
+
+📊 Статистика:
+• Общая статистика расписания
+• Анализ загруженности
+
+🏫 Официальное расписание группы:
+• /tomorrow [группа] - на завтра
+• /date ДД.ММ.ГГГГ [группа] - на дату
+• /week [группа] - на неделю
+
+⏰ Напоминания:
+• /settings - текущие настройки
+• /timezone Europe/Moscow - часовой пояс
+• /remind_at 08:00 - время ежедневного напоминания
+• /remind_before 15 - напоминать за N минут до события (0 - выкл.)
+
+Примеры ввода:
+• "Математика 2 сентября 13:55-15:35"
+• "Встреча с клиентом 3 сентября 14:00-15:00"
+• "250" (для ИИ-планировщика)
+"""
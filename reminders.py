@@ -0,0 +1,346 @@
+# Планировщик напоминаний: куча моментов срабатывания с учетом часового пояса пользователя
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import config
+from events import Event, NO_TIME
+
+logger = logging.getLogger(__name__)
+
+DAILY = 'daily'  # Ежедневное напоминание для слота (часовой пояс, время)
+BEFORE = 'before'  # Напоминание за N минут до события
+REFILL = 'refill'  # Подгрузка событий следующего дня в кучу
+
+# На сколько дней вперед (по UTC) события держатся в куче. Дата события -
+# местная, а местное время отличается от UTC не больше чем на 14 часов,
+# поэтому двух дней хватает, чтобы подгрузка в полночь UTC успевала заранее
+# даже при напоминании за сутки.
+EVENT_HORIZON_DAYS = 2
+
+
+class ReminderScheduler:
+    """Напоминания по местному времени пользователей
+
+    В куче лежат моменты срабатывания (UTC timestamp). Поток спит ровно до
+    ближайшего из них - без опроса раз в минуту. Ежедневное задание одно на
+    каждый слот (часовой пояс, время напоминания): в момент срабатывания
+    пользователи слота берутся из индекса слот -> пользователи (для слота
+    по умолчанию - из индекса дата -> пользователи хранилища), так что
+    рассылка распределяется по суткам. Пользователь получает ежедневное
+    напоминание не чаще раза на местную дату, даже если в тот же день
+    перенес время напоминания на более позднее.
+    Напоминания перед событиями кладутся в кучу по одному на событие:
+    из хранилища на ближайшие EVENT_HORIZON_DAYS дней и сразу при add_event.
+    Сами рассылки выполняются в пуле send_workers потоков, поток
+    планировщика только собирает тексты и не ждет доставки.
+    """
+
+    def __init__(self, manager, broadcaster, max_sleep: float = 3600.0, send_workers: int = 2):
+        self.manager = manager
+        self.broadcaster = broadcaster
+        self.max_sleep = max_sleep  # Страховка от перевода системных часов
+        self._sender = ThreadPoolExecutor(max_workers=max(1, send_workers), thread_name_prefix='reminder-send')
+
+        self._heap = []  # (timestamp, seq, kind, payload)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._slots = set()  # Слоты (timezone, 'HH:MM') с ежедневным заданием
+        self._default_slot = (config.DEFAULT_TIMEZONE, config.DAILY_REMINDER_TIME)
+        self._user_slots = {}  # user_id -> слот, если он не по умолчанию
+        self._slot_users = {}  # Слот -> {user_id}, кроме слота по умолчанию
+        self._daily_sent_on = {}  # user_id -> местная дата последнего ежедневного напоминания
+        self._scheduled = set()  # (user_id, event_id, за сколько минут, часовой пояс) в куче
+        self._loaded_through = None  # Последняя дата, чьи события загружены в кучу
+        self._resume_runs = set()  # Прерванные рассылки, которые нужно досылать
+        self._wakeup_listeners = []
+        self._thread = None
+        self._stopped = False
+
+        self.daily_runs = 0
+        self.daily_sent = 0
+        self.before_sent = 0
+
+        manager.add_event_listener(self._on_event_added)
+        manager.add_settings_listener(self._on_settings_changed)
+
+    # ---------- Куча ----------
+
+    def _push(self, timestamp: float, kind: str, payload: tuple):
+        entry = (timestamp, next(self._seq), kind, payload)
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            is_next = self._heap[0] is entry
+            if is_next:
+                self._cond.notify()
+        # Новое задание раньше всех остальных - ожидающий должен проснуться
+        if is_next:
+            for callback in self._wakeup_listeners:
+                callback()
+
+    def add_wakeup_listener(self, callback: Callable):
+        """callback() вызывается, когда ближайшее срабатывание сдвинулось раньше"""
+        self._wakeup_listeners.append(callback)
+
+    def seconds_until_next(self) -> float:
+        """Сколько спать до ближайшего срабатывания (не больше max_sleep)"""
+        with self._cond:
+            if not self._heap:
+                return self.max_sleep
+            return min(max(0.0, self._heap[0][0] - time.time()), self.max_sleep)
+
+    # ---------- Заполнение ----------
+
+    def load(self):
+        """Ежедневные задания по слотам, события на ближайшие дни, подгрузка в полночь UTC"""
+        self._resume_runs = set(self.broadcaster.unfinished_runs())
+
+        self._ensure_slot(self._default_slot)
+        for user_id, settings in self.manager.storage.get_all_user_settings().items():
+            merged = {'timezone': config.DEFAULT_TIMEZONE, 'reminder_time': config.DAILY_REMINDER_TIME}
+            merged.update(settings)
+            self._set_user_slot(user_id, (merged['timezone'], merged['reminder_time']))
+
+        today = datetime.now(timezone.utc).date()
+        for offset in range(-1, EVENT_HORIZON_DAYS + 1):
+            self._load_date((today + timedelta(days=offset)).isoformat())
+        self._loaded_through = (today + timedelta(days=EVENT_HORIZON_DAYS)).isoformat()
+        self._schedule_refill()
+
+        # Досылаем прерванные перезапуском ежедневные рассылки
+        for run_id in sorted(self._resume_runs):
+            if not run_id.startswith(f'{DAILY}-'):
+                continue
+            # run_id: daily-YYYY-MM-DD-<часовой пояс>-HH:MM (в поясе тоже бывает '-')
+            date_key = run_id[len(DAILY) + 1:len(DAILY) + 11]
+            tz_name, _, reminder_time = run_id[len(DAILY) + 12:].rpartition('-')
+            if tz_name:
+                logger.info(f"📨 Найдена прерванная рассылка {run_id}, продолжаю")
+                self._push(time.time(), DAILY, ((tz_name, reminder_time), date_key, False))
+
+        logger.info(f"⏰ Планировщик напоминаний: {len(self._slots)} слотов, {len(self._heap)} заданий в очереди")
+
+    def _ensure_slot(self, slot: tuple):
+        with self._cond:
+            if slot in self._slots:
+                return
+            self._slots.add(slot)
+        self._schedule_daily(slot)
+
+    def _set_user_slot(self, user_id: int, slot: tuple):
+        """Переносит пользователя в индексе слот -> пользователи"""
+        with self._cond:
+            old = self._user_slots.get(user_id, self._default_slot)
+            if old != self._default_slot:
+                members = self._slot_users[old]
+                members.discard(user_id)
+                if not members:
+                    del self._slot_users[old]
+            if slot == self._default_slot:
+                self._user_slots.pop(user_id, None)
+            else:
+                self._user_slots[user_id] = slot
+                self._slot_users.setdefault(slot, set()).add(user_id)
+        self._ensure_slot(slot)
+
+    def _schedule_daily(self, slot: tuple):
+        """Следующее срабатывание слота по его местному времени"""
+        tz_name, reminder_time = slot
+        local_now = datetime.now(ZoneInfo(tz_name))
+        hour, minute = map(int, reminder_time.split(':'))
+        fire = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if fire <= local_now:
+            fire += timedelta(days=1)
+        self._push(fire.timestamp(), DAILY, (slot, fire.date().isoformat(), True))
+
+    def _schedule_refill(self):
+        tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+        midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
+        self._push(midnight.timestamp(), REFILL, ())
+
+    def _load_date(self, date_key: str, user_ids: Optional[List[int]] = None):
+        """Кладет в кучу напоминания перед событиями на дату"""
+        for user_id in user_ids if user_ids is not None else self.manager.storage.get_users_for_date(date_key):
+            settings = self.manager.get_user_settings(user_id)
+            if not settings['remind_before']:
+                continue
+            for event in self.manager.storage.get_events(user_id, date_key):
+                self._schedule_before(user_id, date_key, event, settings)
+
+    def _schedule_before(self, user_id: int, date_key: str, event: Event, settings: Dict):
+        if not event.day or event.start == NO_TIME:
+            return  # Дата не распознана при добавлении
+        start = datetime.fromordinal(event.day) + timedelta(minutes=event.start)
+
+        before, tz_name = settings['remind_before'], settings['timezone']
+        # Ключ включает настройки: после их смены задание кладется заново,
+        # а старое отбросит _collect_before
+        key = (user_id, event.id, before, tz_name)
+        fire = start.replace(tzinfo=ZoneInfo(tz_name)) - timedelta(minutes=before)
+        timestamp = fire.timestamp()
+        run_id = f"{BEFORE}-{int(timestamp)}"
+        if timestamp < time.time() and run_id not in self._resume_runs:
+            return
+
+        with self._cond:
+            if key in self._scheduled:
+                return
+            self._scheduled.add(key)
+        self._push(timestamp, BEFORE, (user_id, event, before, tz_name))
+
+    def _on_event_added(self, user_id: int, date_key: str, event: Event):
+        # Даты за горизонтом подгрузятся сами в свою полночь
+        if self._loaded_through and date_key <= self._loaded_through:
+            settings = self.manager.get_user_settings(user_id)
+            if settings['remind_before']:
+                self._schedule_before(user_id, date_key, event, settings)
+
+    def _on_settings_changed(self, user_id: int, settings: Dict):
+        self._set_user_slot(user_id, (settings['timezone'], settings['reminder_time']))
+        if settings['remind_before'] and self._loaded_through:
+            today = datetime.now(timezone.utc).date()
+            for offset in range(-1, EVENT_HORIZON_DAYS + 1):
+                self._load_date((today + timedelta(days=offset)).isoformat(), [user_id])
+
+    # ---------- Срабатывание ----------
+
+    def run_due(self) -> int:
+        """Выполняет все наступившие задания, возвращает их количество"""
+        now = time.time()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+
+        before_messages = {}  # timestamp -> {user_id: [тексты]}
+        for timestamp, _, kind, payload in due:
+            try:
+                if kind == DAILY:
+                    self._fire_daily(*payload)
+                elif kind == REFILL:
+                    self._refill()
+                else:
+                    self._collect_before(timestamp, payload, before_messages)
+            except Exception as e:
+                logger.error(f"❌ Ошибка задания напоминаний {kind}: {e}")
+
+        for timestamp, messages in before_messages.items():
+            self._send(f"{BEFORE}-{int(timestamp)}", messages, 'before_sent')
+        return len(due)
+
+    def _send(self, run_id: str, messages: Dict, counter: str):
+        """Передает рассылку пулу отправки; counter - счетчик отправленных"""
+        try:
+            future = self._sender.submit(self.broadcaster.run, run_id, messages)
+        except RuntimeError:
+            logger.warning(f"⚠️ Планировщик остановлен, рассылка {run_id} не запущена")
+            return
+        future.add_done_callback(lambda done: self._on_sent(run_id, counter, done))
+
+    def _on_sent(self, run_id: str, counter: str, future: Future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"❌ Ошибка рассылки {run_id}: {error}")
+            return
+        with self._cond:
+            setattr(self, counter, getattr(self, counter) + future.result()['sent'])
+
+    def _fire_daily(self, slot: tuple, date_key: str, repeat: bool):
+        try:
+            reminders = self.manager.get_day_reminders(date_key, self._slot_members(slot, date_key))
+            if reminders:
+                # Отмечаем до отправки: после переноса времени на более позднее
+                # в тот же день напоминание не придет второй раз
+                with self._cond:
+                    for user_id in reminders:
+                        self._daily_sent_on[user_id] = date_key
+                tz_name, reminder_time = slot
+                self._send(f"{DAILY}-{date_key}-{tz_name}-{reminder_time}", reminders, 'daily_sent')
+            self.daily_runs += 1
+        finally:
+            if repeat:
+                self._schedule_daily(slot)
+
+    def _slot_members(self, slot: tuple, date_key: str) -> List[int]:
+        """Пользователи слота, которым еще не отправлено напоминание на дату"""
+        if slot == self._default_slot:
+            candidates = self.manager.storage.get_users_for_date(date_key)
+            with self._cond:
+                return [
+                    user_id for user_id in candidates
+                    if user_id not in self._user_slots and self._daily_sent_on.get(user_id) != date_key
+                ]
+        # Есть ли у пользователя события на дату, проверит get_day_reminders
+        with self._cond:
+            return [
+                user_id for user_id in self._slot_users.get(slot, ())
+                if self._daily_sent_on.get(user_id) != date_key
+            ]
+
+    def _collect_before(self, timestamp: float, payload: tuple, before_messages: Dict):
+        user_id, event, before, tz_name = payload
+        with self._cond:
+            self._scheduled.discard((user_id, event.id, before, tz_name))
+        # Пользователь мог выключить напоминания, поменять интервал или часовой пояс
+        settings = self.manager.get_user_settings(user_id)
+        if (settings['remind_before'], settings['timezone']) != (before, tz_name):
+            return
+        text = f"⏰ Через {before} мин: {event.type.emoji} {event.time} - {event.activity}"
+        before_messages.setdefault(timestamp, {}).setdefault(user_id, []).append(text)
+
+    def _refill(self):
+        try:
+            # Местная дата отличается от UTC не больше чем на сутки
+            stale = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+            with self._cond:
+                self._daily_sent_on = {
+                    user_id: date_key for user_id, date_key in self._daily_sent_on.items() if date_key >= stale
+                }
+            next_date = datetime.strptime(self._loaded_through, '%Y-%m-%d').date() + timedelta(days=1)
+            self._load_date(next_date.isoformat())
+            self._loaded_through = next_date.isoformat()
+        finally:
+            self._schedule_refill()
+
+    # ---------- Поток ----------
+
+    def start(self):
+        """Заполняет кучу и запускает поток планировщика"""
+        self.load()
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            with self._cond:
+                delay = self.seconds_until_next()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.run_due()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._sender.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        """Метрики для /metrics"""
+        with self._cond:
+            queued = len(self._heap)
+            next_fire = self._heap[0][0] if self._heap else None
+        return {
+            'queued': queued,
+            'slots': len(self._slots),
+            'next_fire': datetime.fromtimestamp(next_fire, timezone.utc).isoformat() if next_fire else None,
+            'daily_runs': self.daily_runs,
+            'daily_sent': self.daily_sent,
+            'before_sent': self.before_sent,
+        }
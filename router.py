@@ -0,0 +1,126 @@
+# Маршрутизация callback-кнопок и шагов диалога по таблице обработчиков
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Router:
+    """Таблица маршрутов: ключ -> обработчик
+
+    Поиск обработчика - один поиск в словаре, сколько бы кнопок и шагов ни
+    было. Ключ маршрута - начало данных до separator, остальное - параметры:
+    callback_data "day:2025-10-18" вызовет обработчик маршрута "day" с
+    аргументом "2025-10-18". Для каждого маршрута считается число вызовов и
+    время обработки.
+
+        callbacks = Router('callbacks')
+
+        @callbacks.route('add_menu')
+        def on_add_menu(call): ...
+
+        callbacks.dispatch(call.data, call)
+    """
+
+    def __init__(self, name: str, separator: str = ':'):
+        self.name = name
+        self.separator = separator
+        self._routes = {}  # ключ -> обработчик
+
+        # Метрики по маршрутам
+        self._lock = threading.Lock()
+        self._calls = {}  # ключ -> число вызовов
+        self._failures = {}  # ключ -> число исключений
+        self._latencies = {}  # ключ -> время последних вызовов, с
+        self.unmatched = 0
+
+    def route(self, *keys: str) -> Callable:
+        """Декоратор: регистрирует обработчик для одного или нескольких ключей"""
+        def decorator(handler: Callable) -> Callable:
+            for key in keys:
+                self.add(key, handler)
+            return handler
+        return decorator
+
+    def add(self, key: str, handler: Callable):
+        if self.separator in key:
+            raise ValueError(f"Ключ маршрута не может содержать '{self.separator}': {key}")
+        if key in self._routes:
+            raise ValueError(f"Маршрут {self.name}/{key} уже зарегистрирован")
+        self._routes[key] = handler
+
+    def resolve(self, data: str) -> Optional[Tuple[str, Callable, Tuple[str, ...]]]:
+        """(ключ, обработчик, параметры) или None, если маршрута нет"""
+        key, *params = data.split(self.separator)
+        handler = self._routes.get(key)
+        if handler is None:
+            return None
+        return key, handler, tuple(params)
+
+    def dispatch(self, data: str, *args) -> bool:
+        """Вызывает обработчик(*args, *параметры); False, если маршрута нет"""
+        resolved = self._resolve_or_count(data)
+        if resolved is None:
+            return False
+        key, handler, params = resolved
+
+        started = time.perf_counter()
+        try:
+            handler(*args, *params)
+        except Exception:
+            self._record(key, time.perf_counter() - started, failed=True)
+            raise
+        self._record(key, time.perf_counter() - started)
+        return True
+
+    async def dispatch_async(self, data: str, *args) -> bool:
+        """То же для async-обработчиков (async_main.py)"""
+        resolved = self._resolve_or_count(data)
+        if resolved is None:
+            return False
+        key, handler, params = resolved
+
+        started = time.perf_counter()
+        try:
+            await handler(*args, *params)
+        except Exception:
+            self._record(key, time.perf_counter() - started, failed=True)
+            raise
+        self._record(key, time.perf_counter() - started)
+        return True
+
+    def _resolve_or_count(self, data: Optional[str]):
+        resolved = self.resolve(data) if data else None
+        if resolved is None:
+            with self._lock:
+                self.unmatched += 1
+            logger.debug(f"🔀 {self.name}: нет маршрута для {data!r}")
+        return resolved
+
+    def _record(self, key: str, seconds: float, failed: bool = False):
+        with self._lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+            if failed:
+                self._failures[key] = self._failures.get(key, 0) + 1
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=200)
+            latencies.append(seconds)
+
+    def stats(self) -> Dict:
+        """Метрики для /metrics: вызовы и время обработки по маршрутам"""
+        with self._lock:
+            routes = {}
+            for key, calls in self._calls.items():
+                latencies = sorted(self._latencies[key])
+                routes[key] = {
+                    'calls': calls,
+                    'failed': self._failures.get(key, 0),
+                    'avg_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+                    'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+                    'max_ms': round(latencies[-1] * 1000, 2),
+                }
+            return {'routes': routes, 'unmatched': self.unmatched, 'registered': len(self._routes)}
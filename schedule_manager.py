@@ -0,0 +1,596 @@
+# Менеджер личного расписания пользователей (общий для обычного и asyncio-режима)
+import asyncio
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import config
+from storage import create_storage, WriteCoalescer
+from events import Event
+from date_parser import DateParser
+from schedule_stats import ScheduleStats, WEEKDAYS_RU, MONTHS_RU
+from free_slots import to_minutes, format_minutes
+from shift_planner import plan_shifts
+
+logger = logging.getLogger(__name__)
+
+class ScheduleManager:
+    """Менеджер расписания пользователя по датам"""
+    
+    def __init__(self, background_flush: bool = True):
+        # Хранилище выбирается в config.STORAGE_BACKEND (journal | sqlite)
+        self.storage = create_storage(
+            config.STORAGE_BACKEND,
+            config.SCHEDULES_FILE,
+            config.SQLITE_PATH,
+            compact_threshold=config.JOURNAL_COMPACT_THRESHOLD
+        )
+        # Записи копятся и сбрасываются пачками (см. config.WRITE_FLUSH_*)
+        self.writer = WriteCoalescer(
+            self.storage,
+            flush_interval=config.WRITE_FLUSH_INTERVAL_SECONDS,
+            max_pending=config.WRITE_FLUSH_MAX_PENDING
+        )
+        # Счетчики для статистики и рекомендаций, обновляются в add_event
+        self.stats = ScheduleStats(self.storage.get_user_schedules, max_users=config.STATS_MAX_USERS)
+        # Разбор дат из ввода пользователей с кэшем на текущий день
+        self.dates = DateParser(maxsize=config.DATE_CACHE_SIZE, year_window=config.DATE_YEAR_WINDOW_DAYS)
+        self._event_listeners = []  # callback(user_id, date_key, event) после add_event
+        self._settings_listeners = []  # callback(user_id, settings) после смены настроек
+        self.load_schedules()
+        # В asyncio-режиме сбросом управляет задача цикла, а не отдельный поток
+        if background_flush:
+            self.writer.start()
+    
+    def load_schedules(self):
+        """Подключает хранилище расписаний"""
+        try:
+            self.storage.load()
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки расписаний: {e}")
+    
+    def save_schedules(self):
+        """Сохраняет полный снапшот расписаний (сворачивает журнал)"""
+        try:
+            self.writer.flush()
+            self.storage.compact()
+            logger.info("💾 Расписания сохранены")
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения расписаний: {e}")
+    
+    def flush(self):
+        """Сбрасывает несохраненные записи (вызывается при завершении)"""
+        self.writer.stop()
+        self.storage.close()
+    
+    def parse_date(self, date_text: str) -> str:
+        """Парсит дату из текста (например: '2 сентября' -> '2025-09-02', см. date_parser)
+        
+        Нераспознанный текст возвращается как есть.
+        """
+        date_key = self.dates.parse(date_text)
+        if date_key is None:
+            logger.warning(f"⚠️ Не удалось распознать дату: {date_text}")
+            return date_text
+        return date_key
+    
+    def add_event(self, user_id: int, date_text: str, time_text: str, activity: str, event_type: str = "general") -> str:
+        """Добавляет событие на конкретную дату"""
+        # Валидация времени
+        if not self._validate_time_format(time_text):
+            return f"❌ Неправильный формат времени: {time_text}\nИспользуйте формат: 13:55-15:35"
+        
+        # Парсим дату
+        date_key = self.parse_date(date_text)
+        
+        # Генерируем уникальный ID
+        event_id = str(uuid.uuid4())[:8]  # Короткий ID из 8 символов
+        
+        # Создаем событие
+        event = Event.from_dict(date_key, {
+            'id': event_id,
+            'time': time_text.strip(),
+            'activity': activity.strip(),
+            'type': event_type,
+            'added_at': datetime.now().isoformat()
+        })
+        
+        # Хранилище записывает только новое событие, на диск - пачкой
+        with self.stats.user_lock(user_id):
+            conflicts = self.storage.add_event(user_id, date_key, event)
+            self.stats.add(user_id, date_key, event)
+        self.writer.mark_dirty()
+        self._notify(self._event_listeners, user_id, date_key, event)
+        
+        result = f"✅ Событие добавлено на {date_text} в {time_text}: {activity}"
+        if conflicts:
+            result += "\n\n⚠️ Пересекается с:\n" + "\n".join(
+                f"{other.type.emoji} {other.time} - {other.activity}" for other in conflicts
+            )
+        return result
+    
+    def _validate_time_format(self, time_text: str) -> bool:
+        """Проверяет корректность формата времени"""
+        try:
+            # Ожидаемый формат: "13:55-15:35"
+            if '-' not in time_text:
+                return False
+            
+            start_time, end_time = time_text.split('-')
+            
+            # Проверяем формат времени (HH:MM)
+            for time_part in [start_time.strip(), end_time.strip()]:
+                if ':' not in time_part:
+                    return False
+                
+                hour, minute = time_part.split(':')
+                hour_int = int(hour)
+                minute_int = int(minute)
+                
+                if hour_int < 0 or hour_int > 23 or minute_int < 0 or minute_int > 59:
+                    return False
+            
+            return True
+        except:
+            return False
+    
+    def get_date_schedule(self, user_id: int, date_text: str) -> str:
+        """Получает расписание на конкретную дату"""
+        if not self.storage.has_user(user_id):
+            return "📅 У вас пока нет расписаний. Добавьте первое событие!"
+        
+        date_key = self.parse_date(date_text)
+        events = self.storage.get_events(user_id, date_key)
+        
+        if not events:
+            return f"📅 На {date_text} у вас нет запланированных событий."
+        
+        result = f"📅 Расписание на {date_text}:\n\n"
+        
+        for i, event in enumerate(events, 1):
+            result += f"{event.type.emoji} {event.time} - {event.activity}\n"
+        
+        return result
+    
+    def get_week_schedule(self, user_id: int) -> str:
+        """Получает расписание на неделю (все сохраненные даты по порядку)"""
+        schedules = self.storage.get_user_schedules(user_id)
+        
+        if not schedules:
+            return "📅 На этой неделе у вас нет запланированных событий."
+        
+        result = "📅 Расписание на неделю:\n\n"
+        
+        for date_key in sorted(schedules):
+            events = schedules[date_key]
+            if events:
+                # Словарь для русских названий месяцев
+                months_ru = {
+                    1: 'января', 2: 'февраля', 3: 'марта', 4: 'апреля',
+                    5: 'мая', 6: 'июня', 7: 'июля', 8: 'августа',
+                    9: 'сентября', 10: 'октября', 11: 'ноября', 12: 'декабря'
+                }
+                
+                # Преобразуем дату в читаемый формат
+                try:
+                    date_obj = datetime.strptime(date_key, '%Y-%m-%d')
+                    day = date_obj.day
+                    month = months_ru.get(date_obj.month, str(date_obj.month))
+                    date_display = f"{day} {month}"
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"⚠️ Ошибка парсинга даты '{date_key}': {e}")
+                    date_display = date_key
+                except Exception as e:
+                    logger.warning(f"⚠️ Неожиданная ошибка при форматировании даты '{date_key}': {e}")
+                    date_display = date_key
+                
+                result += f"📅 {date_display}:\n"
+                
+                for event in events:
+                    result += f"  {event.type.emoji} {event.time} - {event.activity}\n"
+                
+                result += "\n"
+        
+        return result
+    
+    def get_today_schedule(self, user_id: int) -> str:
+        """Получает расписание на сегодня"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        
+        events = self.storage.get_events(user_id, today)
+        if not events:
+            return "📅 Сегодня у вас нет запланированных событий. Отличный день для отдыха! 😊"
+        
+        return self._format_today(events)
+    
+    def _format_today(self, events: List[Event]) -> str:
+        """Текст "что у вас сегодня" по непустому списку событий"""
+        lines = ["🌅 Доброе утро! Вот что у вас сегодня:\n"]
+        for i, event in enumerate(events, 1):
+            lines.append(f"{i}. {event.type.emoji} {event.time} - {event.activity}")
+        lines.append("\n💡 Совет: Планируйте время с запасом между событиями!")
+        return '\n'.join(lines)
+    
+    def get_day_reminders(self, date_key: str, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Тексты ежедневных напоминаний на дату, каждый форматируется один раз
+        
+        user_ids берутся из индекса дата -> пользователи хранилища, поэтому
+        работа не зависит от общего числа пользователей.
+        """
+        reminders = {}
+        for user_id in user_ids:
+            events = self.storage.get_events(user_id, date_key)
+            if events:
+                reminders[user_id] = self._format_today(events)
+        return reminders
+    
+    # ---------- Настройки напоминаний ----------
+    
+    def add_event_listener(self, callback: Callable):
+        """Подписка на новые события: callback(user_id, date_key, event)"""
+        self._event_listeners.append(callback)
+    
+    def add_settings_listener(self, callback: Callable):
+        """Подписка на смену настроек: callback(user_id, settings)"""
+        self._settings_listeners.append(callback)
+    
+    def _notify(self, listeners: List[Callable], *args):
+        for callback in listeners:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработчика изменений расписания: {e}")
+    
+    def get_user_settings(self, user_id: int) -> Dict:
+        """Настройки пользователя с подставленными значениями по умолчанию"""
+        settings = {
+            'timezone': config.DEFAULT_TIMEZONE,
+            'reminder_time': config.DAILY_REMINDER_TIME,
+            'remind_before': config.REMIND_BEFORE_MINUTES
+        }
+        settings.update(self.storage.get_user_settings(user_id))
+        return settings
+    
+    def update_user_settings(self, user_id: int, timezone: str = None, reminder_time: str = None,
+                             remind_before: str = None) -> str:
+        """Проверяет и сохраняет настройки напоминаний, возвращает ответ пользователю"""
+        settings = self.storage.get_user_settings(user_id)
+        
+        if timezone is not None:
+            try:
+                ZoneInfo(timezone)
+            except (ZoneInfoNotFoundError, ValueError):
+                return f"❌ Неизвестный часовой пояс: {timezone}\nПример: Europe/Moscow"
+            settings['timezone'] = timezone
+        
+        if reminder_time is not None:
+            try:
+                reminder_time = datetime.strptime(reminder_time, '%H:%M').strftime('%H:%M')
+            except ValueError:
+                return f"❌ Неправильное время: {reminder_time}\nПример: 07:30"
+            settings['reminder_time'] = reminder_time
+        
+        if remind_before is not None:
+            if not remind_before.isdigit() or int(remind_before) > 24 * 60:
+                return f"❌ Неправильное число минут: {remind_before}\nПример: 15 (0 - выключить)"
+            settings['remind_before'] = int(remind_before)
+        
+        self.storage.set_user_settings(user_id, settings)
+        self.writer.mark_dirty()
+        self._notify(self._settings_listeners, user_id, self.get_user_settings(user_id))
+        return "✅ Настройки сохранены\n\n" + self.format_user_settings(user_id)
+    
+    def format_user_settings(self, user_id: int) -> str:
+        """Текст с текущими настройками напоминаний"""
+        settings = self.get_user_settings(user_id)
+        before = settings['remind_before']
+        return (
+            "⚙️ Настройки напоминаний:\n\n"
+            f"🌍 Часовой пояс: {settings['timezone']}\n"
+            f"🌅 Ежедневное напоминание: {settings['reminder_time']}\n"
+            f"⏰ Перед событием: {f'за {before} мин' if before else 'выключено'}\n\n"
+            "Изменить:\n"
+            "• /timezone Europe/Moscow\n"
+            "• /remind_at 07:30\n"
+            "• /remind_before 15 (0 - выключить)"
+        )
+    
+    def get_user_schedules(self, user_id: int) -> Dict:
+        """Получает все расписания пользователя"""
+        return self.storage.get_user_schedules(user_id)
+    
+    def analyze_schedule(self, user_id: int) -> str:
+        """Анализирует расписание и дает советы"""
+        stats = self.stats.get(user_id)
+        
+        if not stats.total:
+            return "📝 У вас пока нет расписаний. Добавьте их для получения анализа!"
+        
+        analysis = "🔍 Анализ вашего расписания:\n\n"
+        
+        # Анализ по типам событий
+        total_events = stats.total
+        study_count = stats.by_type['study']
+        work_count = stats.by_type['work']
+        
+        analysis += f"📊 Общая статистика:\n"
+        analysis += f"• Всего событий: {total_events}\n"
+        analysis += f"• Учебных: {study_count}\n"
+        analysis += f"• Рабочих: {work_count}\n\n"
+        
+        # Самый загруженный день недели
+        busiest_count = max(stats.by_weekday)
+        if busiest_count:
+            busiest_day = WEEKDAYS_RU[stats.by_weekday.index(busiest_count)]
+            analysis += f"📅 Самый загруженный день: {busiest_day} ({busiest_count} событий)\n\n"
+        
+        # Самый загруженный месяц, если событий больше чем на один месяц
+        months = []
+        for month, count in stats.by_month.items():
+            try:
+                month_date = datetime.strptime(month, '%Y-%m')
+            except ValueError:
+                continue  # Пропускаем ключи не в формате YYYY-MM
+            if count:
+                months.append((month_date, count))
+        if len(months) > 1:
+            month_date, count = max(months, key=lambda x: x[1])
+            analysis += f"🗓️ Самый загруженный месяц: {MONTHS_RU[month_date.month - 1]} {month_date.year} ({count} событий)\n\n"
+        
+        # Советы
+        analysis += "💡 Советы:\n"
+        if total_events > 15:
+            analysis += "• У вас очень насыщенное расписание! Рассмотрите делегирование.\n"
+        elif total_events > 10:
+            analysis += "• Хорошая загруженность! Не забудьте про отдых.\n"
+        elif total_events > 5:
+            analysis += "• Умеренная загруженность. Можно добавить больше активности.\n"
+        else:
+            analysis += "• Легкая загруженность. Отличное время для новых проектов!\n"
+        
+        if study_count > work_count * 2:
+            analysis += "• Большой акцент на учебе - отличная инвестиция в будущее!\n"
+        elif work_count > study_count * 2:
+            analysis += "• Много рабочих событий - не забывайте про развитие!\n"
+        
+        return analysis
+    
+    def get_smart_recommendations(self, user_id: int) -> str:
+        """Генерирует краткие рекомендации по расписанию"""
+        stats = self.stats.get(user_id)
+        if not stats.total:
+            return "📊 Рекомендации\n\nДобавьте события для получения советов!"
+        
+        result = "🤖 Рекомендации ИИ:\n\n"
+        
+        # Счетчики событий уже посчитаны
+        total_events = stats.total
+        study_count = stats.by_type['study']
+        work_count = stats.by_type['work']
+        
+        # Краткая статистика
+        result += f"📊 Статистика: {total_events} событий\n"
+        result += f"📚 Учеба: {study_count} | 💼 Работа: {work_count}\n\n"
+        
+        # Основные рекомендации
+        if total_events == 0:
+            result += "💡 Добавьте события в расписание\n"
+        elif total_events < 5:
+            result += "💡 Добавьте больше событий\n"
+        elif total_events > 15:
+            result += "⚠️ Слишком много событий - добавьте отдых\n"
+        else:
+            result += "✅ Хорошее количество событий\n"
+        
+        # Баланс
+        if study_count > work_count * 2:
+            result += "📚 Много учебы - добавьте работу\n"
+        elif work_count > study_count * 2:
+            result += "💼 Много работы - добавьте учебу\n"
+        else:
+            result += "⚖️ Хороший баланс учеба/работа\n"
+        
+        result += "\n🎯 Используйте ИИ-планировщик для оптимизации!"
+        
+        return result
+    
+    def get_smart_work_schedule(self, user_id: int, current_communications: int) -> str:
+        """Генерирует умное рабочее расписание на основе текущих коммуникаций"""
+        try:
+            # Определяем текущий месяц и декаду
+            now = datetime.now()
+            current_month = now.month
+            current_day = now.day
+            
+            # Цели
+            monthly_goal = 1000
+            decade_goal = 300
+            
+            # Определяем декаду (1-10, 11-20, 21-31)
+            if current_day <= 10:
+                decade = 1
+                decade_start = 1
+                decade_end = 10
+            elif current_day <= 20:
+                decade = 2
+                decade_start = 11
+                decade_end = 20
+            else:
+                decade = 3
+                decade_start = 21
+                decade_end = 31
+            
+            # Рассчитываем оставшиеся дни
+            days_in_month = (now.replace(month=now.month % 12 + 1, day=1) - timedelta(days=1)).day
+            remaining_days_in_month = days_in_month - current_day + 1
+            remaining_days_in_decade = decade_end - current_day + 1
+            
+            # Рассчитываем необходимые коммуникации
+            remaining_monthly = monthly_goal - current_communications
+            remaining_decade = decade_goal - current_communications
+            
+            # Используем более критичную цель
+            if remaining_decade > 0:
+                target_communications = remaining_decade
+                target_period = f"декаду (до {decade_end} числа)"
+                target_days = remaining_days_in_decade
+            else:
+                target_communications = remaining_monthly
+                target_period = f"месяц (до конца месяца)"
+                target_days = remaining_days_in_month
+            
+            # Автоматическое планирование рабочей смены
+            auto_plan = self.auto_plan_work_shift(user_id, target_communications, target_days)
+            
+            result = f"🤖 ИИ-планировщик для работы:\n\n"
+            result += f"📊 Текущий прогресс: {current_communications} коммуникаций\n"
+            result += f"🎯 Цель на {target_period}: {target_communications} коммуникаций\n"
+            result += f"⏰ Осталось дней: {target_days}\n"
+            result += f"📈 Нужно в день: {target_communications / target_days:.1f}\n\n"
+            
+            result += f"🚀 Автоматический план:\n{auto_plan}"
+            
+            return result
+            
+        except (ValueError, TypeError) as e:
+            logger.error(f"❌ Ошибка валидации в ИИ-планировщике: {e}")
+            return f"❌ Ошибка валидации данных: {e}"
+        except Exception as e:
+            logger.error(f"❌ Неожиданная ошибка в ИИ-планировщике: {e}")
+            return f"❌ Неожиданная ошибка: {e}"
+    
+    def find_free_windows(self, user_id: int, days: int = None, min_minutes: int = None,
+                          day_start: str = None, day_end: str = None,
+                          granularity: int = None) -> List[Tuple[str, int, int]]:
+        """Свободные окна (дата, начало, конец в минутах) на ближайшие days дней
+        
+        Окна не короче min_minutes внутри рабочего дня [day_start, day_end),
+        начало выравнивается до granularity минут. Сегодня ищем только после
+        текущего момента. Параметры по умолчанию - config.WORK_*.
+        """
+        days = days or config.WORK_PLAN_DAYS
+        min_minutes = min_minutes or config.WORK_SHIFT_HOURS * 60
+        granularity = granularity or config.WORK_SLOT_GRANULARITY_MINUTES
+        lo = to_minutes(day_start or config.WORK_DAY_START)
+        hi = to_minutes(day_end or config.WORK_DAY_END)
+        
+        now = datetime.now()
+        date_keys = [(now + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        busy = self.storage.get_busy(user_id, date_keys)
+        
+        windows = busy.free_windows(date_keys[1:], lo, hi, min_minutes, granularity)
+        today_lo = max(lo, now.hour * 60 + now.minute)
+        return busy.free_windows(date_keys[:1], today_lo, hi, min_minutes, granularity) + windows
+    
+    def auto_plan_work_shift(self, user_id: int, target_communications: int, days: int = None) -> str:
+        """Планирует наименьшее число смен на ближайшие days дней, чтобы набрать цель"""
+        try:
+            # Проверяем валидность target_communications
+            if target_communications <= 0:
+                return "❌ Некорректная цель: количество коммуникаций должно быть больше 0"
+            
+            days = max(1, days or config.WORK_PLAN_DAYS)
+            granularity = config.WORK_SLOT_GRANULARITY_MINUTES
+            min_shift = config.WORK_MIN_SHIFT_HOURS * 60
+            
+            # Свободное время между учебой и другими событиями
+            windows = {}
+            for date_key, start, end in self.find_free_windows(user_id, days=days, min_minutes=min_shift):
+                windows.setdefault(date_key, []).append((start, end))
+            if not windows:
+                return f"❌ Нет свободных слотов на ближайшие {days} дн."
+            
+            needed_minutes = -(-target_communications * 60 // config.COMMUNICATIONS_PER_HOUR)
+            needed_minutes = -(-needed_minutes // granularity) * granularity
+            plan = plan_shifts(
+                windows, needed_minutes,
+                min_shift=min_shift,
+                max_shift=config.WORK_SHIFT_HOURS * 60,
+                day_cap=config.WORK_MAX_HOURS_PER_DAY * 60,
+                break_minutes=config.WORK_BREAK_MINUTES,
+                granularity=granularity,
+                budget_ms=config.WORK_PLAN_BUDGET_MS
+            )
+            if plan.timed_out:
+                logger.warning(f"⚠️ План смен для {user_id} построен не полностью: превышен бюджет {config.WORK_PLAN_BUDGET_MS} мс")
+            
+            possible_communications = plan.minutes * config.COMMUNICATIONS_PER_HOUR // 60
+            
+            result = "📅 Рекомендуемые смены:\n"
+            for date_key, start, end in plan.shifts:
+                day_name = WEEKDAYS_RU[datetime.strptime(date_key, '%Y-%m-%d').weekday()]
+                result += f"• {day_name} ({date_key}): {format_minutes(start)} - {format_minutes(end)}\n"
+            result += f"• Смен: {len(plan.shifts)}, часов: {plan.minutes / 60:g}\n"
+            result += f"• Ожидаемые коммуникации: {possible_communications}\n"
+            result += f"• Прогресс к цели: {possible_communications / target_communications * 100:.1f}%\n\n"
+            
+            if plan.complete:
+                result += "✅ Эти смены помогут достичь цели!"
+            else:
+                result += f"⚠️ Свободного времени не хватает: нужно еще {target_communications - possible_communications} коммуникаций"
+            
+            return result
+            
+        except (ValueError, TypeError) as e:
+            logger.error(f"❌ Ошибка валидации в авто-планировании: {e}")
+            return f"❌ Ошибка валидации данных: {e}"
+        except Exception as e:
+            logger.error(f"❌ Неожиданная ошибка в авто-планировании: {e}")
+            return f"❌ Неожиданная ошибка: {e}"
+
+
+class AsyncScheduleManager:
+    """Асинхронный фасад над ScheduleManager
+
+    Методы ScheduleManager блокирующие (файлы, fsync, SQLite), поэтому
+    вызываются в небольшом пуле потоков и не останавливают цикл событий.
+    Хранилища сами защищены блокировками, так что параллельные вызовы
+    из разных обработчиков безопасны.
+    """
+    
+    def __init__(self, manager: ScheduleManager, workers: int = 4):
+        self.manager = manager
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='schedule-io')
+    
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    async def add_event(self, user_id: int, date_text: str, time_text: str, activity: str, event_type: str = "general") -> str:
+        return await self._call(self.manager.add_event, user_id, date_text, time_text, activity, event_type)
+    
+    async def get_date_schedule(self, user_id: int, date_text: str) -> str:
+        return await self._call(self.manager.get_date_schedule, user_id, date_text)
+    
+    async def get_week_schedule(self, user_id: int) -> str:
+        return await self._call(self.manager.get_week_schedule, user_id)
+    
+    async def get_today_schedule(self, user_id: int) -> str:
+        return await self._call(self.manager.get_today_schedule, user_id)
+    
+    async def analyze_schedule(self, user_id: int) -> str:
+        return await self._call(self.manager.analyze_schedule, user_id)
+    
+    async def get_smart_recommendations(self, user_id: int) -> str:
+        return await self._call(self.manager.get_smart_recommendations, user_id)
+    
+    async def get_smart_work_schedule(self, user_id: int, current_communications: int) -> str:
+        return await self._call(self.manager.get_smart_work_schedule, user_id, current_communications)
+    
+    async def update_user_settings(self, user_id: int, **changes) -> str:
+        return await self._call(lambda: self.manager.update_user_settings(user_id, **changes))
+    
+    async def format_user_settings(self, user_id: int) -> str:
+        return await self._call(self.manager.format_user_settings, user_id)
+    
+    async def flush_pending(self) -> int:
+        """Сбрасывает накопленные записи (периодическая задача цикла)"""
+        return await self._call(self.manager.writer.flush)
+    
+    async def close(self):
+        """Сбрасывает остаток и закрывает хранилище"""
+        await self._call(self.manager.flush)
+        self._executor.shutdown(wait=True)
@@ -1,22 +1,207 @@
 import requests
 import PyPDF2
 import io
+import os
 import re
+import json
+import hashlib
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import List, Dict, Mapping, NamedTuple, Optional
+
+# Отдельный логгер для подробной отладки парсера. Сообщения форматируются
+# лениво и только при ScheduleParser(debug=True), поэтому в обычном режиме
+# разбор не тратит время на логирование.
+debug_logger = logging.getLogger('schedule_parser.debug')
+
+# Название группы в PDF: "302 Ф" (три цифры, пробел, заглавная буква)
+GROUP_RE = re.compile(r'(?<!\d)(\d{3}) ?([А-ЯЁ])(?![А-Яа-яЁё])')
+
+# Классы строк расписания. Все токены начинаются с двух цифр, поэтому общий
+# префикс вынесен, а окончания собраны в одну альтернацию с именованными
+# группами - строка классифицируется за один проход регулярного выражения.
+# Порядок в таблице - порядок проверки на каждой позиции строки: main_time
+# раньше lesson_time. Прежний разбор (три отдельных re.search) читал
+# '13:55-15:35' как урок '55:15'; теперь это основное время, а уроки внутри
+# основного времени не ищутся. Токены могут перекрываться ('12-01.09.2025' -
+# урок и дата), поэтому строка дочитывается с каждой следующей позиции.
+LINE_TOKENS = (
+    ('date', r'\.\d{2}\.\d{4}'),  # 01.09.2025
+    ('main_time', r':(?P<main_start_m>\d{2})\s*-\s*(?P<main_end_h>\d{2}):(?P<main_end_m>\d{2})'),  # 08:30 - 10:05
+    ('lesson_time', r'-(?P<lesson_m>\d{2})'),  # 08-30 в начале урока
+)
+LINE_TOKEN_RE = re.compile(
+    r'(?P<hour>\d{2})(?:' + '|'.join(f'(?P<{kind}>{pattern})' for kind, pattern in LINE_TOKENS) + ')'
+)
+# Если в строке несколько токенов, побеждает более приоритетный
+LINE_KIND_PRIORITY = {'date': 0, 'lesson_time': 1, 'main_time': 2}
+
+DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')
+LESSON_PREFIX_RE = re.compile(r'^\d{2}-\d{2}\s*')
+AUDITORIUM_NOISE_RE = re.compile(r'\d+\s+(?:Советская|Полесская|Ломоносова)|Спортивный зал')
+TIME_NOISE_RE = re.compile(r'\d{2}:\d{2}\s*-\s*\d{2}:\d{2}|\d{2}-\d{2}')
+SPACES_RE = re.compile(r'\s+')
+INSTRUCTOR_RE = re.compile(r'([А-Я][а-я]+\s+[А-Я]\.[А-Я]\.)')
+AUDITORIUM_RE = re.compile(r'(?:Аудит\.\s*)?(\d+\s+(?:Советская|Полесская|Ломоносова)|Спортивный зал)')
+
+
+def classify_line(line: str) -> tuple:
+    """Классифицирует строку одним проходом: (вид, match) или (None, None)
+
+    Приоритет как у прежнего разбора: дата, затем время урока, затем
+    основное время. Текст токена целиком - match.group(0).
+    """
+    match = LINE_TOKEN_RE.search(line)
+    if match is None:
+        return None, None
+    
+    best_kind = match.lastgroup
+    if best_kind == 'date':  # Высший приоритет - дальше не смотрим
+        return best_kind, match
+    
+    # Дочитываем строку: дальше (в том числе внутри найденного урока) может
+    # начинаться более приоритетный токен
+    best_match, best_priority = match, LINE_KIND_PRIORITY[best_kind]
+    masked_until = match.end() if best_kind == 'main_time' else 0
+    match = LINE_TOKEN_RE.search(line, match.start() + 1)
+    while match is not None:
+        kind = match.lastgroup
+        if match.start() >= masked_until:
+            priority = LINE_KIND_PRIORITY[kind]
+            if priority < best_priority:
+                best_kind, best_match, best_priority = kind, match, priority
+                if priority == 0:
+                    break
+            if kind == 'main_time':
+                masked_until = match.end()
+        match = LINE_TOKEN_RE.search(line, match.start() + 1)
+    return best_kind, best_match
+
+
+def _clean_subject(text: str, strip_times: bool = True) -> str:
+    """Убирает из текста предмета аудитории, время и лишние пробелы"""
+    text = AUDITORIUM_NOISE_RE.sub('', text)
+    if strip_times:
+        text = TIME_NOISE_RE.sub('', text)
+    return SPACES_RE.sub(' ', text).strip()
+
+
+def normalize_group(group: str) -> str:
+    """Приводит название группы к ключу: '302 Ф' / '302ф' -> '302Ф'"""
+    return re.sub(r'\s+', '', group).upper()
+
+
+def _freeze(value):
+    """Рекурсивно превращает словари в неизменяемые MappingProxyType"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+class ScheduleSnapshot(NamedTuple):
+    """Неизменяемый снимок разобранного расписания
+
+    Обновление строит новый снимок и подменяет ссылку на него одним
+    присваиванием, поэтому читатели всегда видят целостные данные.
+    """
+    groups: Mapping  # группа -> {дата -> {время -> урок}}
+    content_hash: Optional[str] = None  # sha256 PDF, из которого построен снимок
+    last_update: Optional[datetime] = None
+    version: int = 0  # Растет при каждом изменении содержимого
+
+
+EMPTY_SNAPSHOT = ScheduleSnapshot(MappingProxyType({}))
+
+
+def _extract_pages_range(pdf_content: bytes, start: int, end: int) -> List[str]:
+    """Извлекает текст страниц [start, end) - выполняется в процессе-воркере"""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
+    return [reader.pages[i].extract_text() or '' for i in range(start, end)]
+
 
 class ScheduleParser:
-    def __init__(self, google_drive_url: str):
+    def __init__(self, google_drive_url: str, default_group: str = '302Ф', cache_dir: str = '.pdf_cache',
+                 extract_workers: int = 0, parallel_min_pages: int = 8,
+                 debug: bool = False, trace_path: Optional[str] = None):
         self.google_drive_url = google_drive_url
-        self.schedule_data = {}
-        self.last_update = None
+        self.default_group = normalize_group(default_group)
+        self.cache_dir = cache_dir
+        self.extract_workers = extract_workers  # 0/1 - извлекать текст последовательно
+        self.parallel_min_pages = parallel_min_pages  # Меньшие PDF всегда извлекаются последовательно
+        self.debug = debug  # Подробный лог разбора в debug_logger
+        self.trace_path = trace_path  # JSONL с решениями классификатора (только при debug)
+        if debug:
+            debug_logger.setLevel(logging.DEBUG)
+        self._snapshot = EMPTY_SNAPSHOT
+        
+        # Одновременно идет не больше одного обновления
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop_refresh = threading.Event()
+        self._update_listeners = []  # Вызываются с новым снимком при изменении содержимого
+        
+        # Одна сессия на все обновления - соединение с Google Drive переиспользуется
+        self.session = requests.Session()
+    
+    @property
+    def snapshot(self) -> ScheduleSnapshot:
+        """Текущий снимок расписания (читается без блокировок)"""
+        return self._snapshot
+    
+    @property
+    def schedule_data(self) -> Mapping:
+        """группа -> {дата -> {время -> урок}}"""
+        return self._snapshot.groups
+    
+    @property
+    def last_update(self) -> Optional[datetime]:
+        return self._snapshot.last_update
+    
+    @property
+    def content_hash(self) -> Optional[str]:
+        return self._snapshot.content_hash
         
+    def _cache_paths(self, file_id: str) -> tuple:
+        """Пути к закэшированному PDF и его метаданным (ETag, Last-Modified, хэш)"""
+        base = os.path.join(self.cache_dir, file_id)
+        return f"{base}.pdf", f"{base}.json"
+    
+    def _load_cache(self, file_id: str) -> tuple:
+        """Читает метаданные кэша, возвращает (meta, pdf_path) или ({}, None)"""
+        pdf_path, meta_path = self._cache_paths(file_id)
+        if not (os.path.exists(pdf_path) and os.path.exists(meta_path)):
+            return {}, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f), pdf_path
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Кэш PDF поврежден, скачиваю заново: {e}")
+            return {}, None
+    
+    def _save_cache(self, file_id: str, content: bytes, response: requests.Response):
+        """Сохраняет PDF и заголовки для условных запросов"""
+        pdf_path, meta_path = self._cache_paths(file_id)
+        meta = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': hashlib.sha256(content).hexdigest()
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Пишем во временные файлы и подменяем атомарно
+            for path, data, mode in ((pdf_path, content, 'wb'), (meta_path, json.dumps(meta), 'w')):
+                with open(f"{path}.tmp", mode) as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logging.warning(f"⚠️ Не удалось сохранить PDF в кэш: {e}")
+    
     def download_pdf(self) -> Optional[bytes]:
-        """Скачивает PDF с Google Drive"""
+        """Скачивает PDF с Google Drive (условный запрос, при 304 - из кэша)"""
         try:
-            logging.info("Начинаю скачивание PDF...")
-            
             # Преобразуем ссылку для прямого скачивания
             if '/d/' not in self.google_drive_url:
                 logging.error("❌ Неверный формат Google Drive URL")
@@ -25,70 +210,127 @@ class ScheduleParser:
             file_id = self.google_drive_url.split('/d/')[1].split('/')[0]
             direct_url = f"https://drive.google.com/uc?export=download&id={file_id}"
             
-            logging.info(f"Скачиваю с URL: {direct_url}")
+            # Условный запрос: сервер ответит 304, если файл не менялся
+            meta, cached_path = self._load_cache(file_id)
+            headers = {}
+            if cached_path:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+            
+            logging.info(f"Скачиваю с URL: {direct_url} (условный запрос: {bool(headers)})")
             
-            response = requests.get(direct_url, timeout=30)
-            response.raise_for_status()
+            try:
+                response = self.session.get(direct_url, headers=headers, timeout=30)
+                if response.status_code == 304 and cached_path:
+                    logging.info("📦 PDF не изменился (304), беру из кэша")
+                    with open(cached_path, 'rb') as f:
+                        return f.read()
+                response.raise_for_status()
+            except requests.RequestException as e:
+                if not cached_path:
+                    raise
+                logging.warning(f"⚠️ Ошибка скачивания PDF, использую кэш: {e}")
+                with open(cached_path, 'rb') as f:
+                    return f.read()
             
             logging.info(f"PDF успешно скачан, размер: {len(response.content)} байт")
+            self._save_cache(file_id, response.content, response)
             return response.content
             
         except Exception as e:
             logging.error(f"Ошибка скачивания PDF: {e}")
             return None
     
-    def extract_text_from_pdf(self, pdf_content: bytes) -> str:
-        """Извлекает текст из PDF по страницам и находит страницу с группой 302 Ф"""
+    def extract_text_from_pdf(self, pdf_content: bytes) -> Dict[str, Dict]:
+        """Извлекает текст из PDF за один проход и строит индекс групп
+
+        Возвращает {группа: {'label': '302 Ф', 'pages': [номера страниц],
+        'text': текст этих страниц, 'neighbours': [соседние группы]}}
+        """
         try:
-            pdf_file = io.BytesIO(pdf_content)
-            reader = PyPDF2.PdfReader(pdf_file)
-            
-            logging.info(f"PDF содержит {len(reader.pages)} страниц")
-            
-            # Ищем страницу с группой 302 Ф (с пробелом!)
-            target_page = None
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                page_text = page.extract_text()
-                
-                logging.info(f"Страница {page_num + 1}: ищу группу 302 Ф...")
-                
-                if "302 Ф" in page_text:
-                    logging.info(f"✅ Группа 302 Ф найдена на странице {page_num + 1}")
-                    target_page = page_num
-                    break
-                else:
-                    logging.info(f"❌ Группа 302 Ф НЕ найдена на странице {page_num + 1}")
+            pages_text = self.extract_pages_text(pdf_content)
+            index = self.build_group_index(pages_text)
             
-            if target_page is None:
-                logging.error("❌ Группа 302 Ф не найдена ни на одной странице!")
-                return ""
-            
-            # Извлекаем текст только с нужной страницы
-            page = reader.pages[target_page]
-            text = page.extract_text()
-            
-            logging.info(f"Извлечен текст со страницы {target_page + 1}, длина: {len(text)} символов")
-            logging.info(f"Первые 500 символов: {text[:500]}")
-            
-            return text
+            logging.info(f"Найдено групп: {len(index)} ({', '.join(sorted(index))})")
+            return index
             
         except Exception as e:
             logging.error(f"Ошибка при извлечении текста из PDF: {str(e)}")
-            return ""
+            return {}
     
-    def parse_schedule(self, text: str) -> Dict:
-        """Парсит расписание из текста с учетом структуры потоковых занятий"""
-        schedule = {}
+    def extract_pages_text(self, pdf_content: bytes) -> List[str]:
+        """Извлекает текст всех страниц PDF по порядку"""
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
+        page_count = len(reader.pages)
+        logging.info(f"PDF содержит {page_count} страниц")
+        
+        if self.extract_workers > 1 and page_count >= self.parallel_min_pages:
+            try:
+                return self._extract_pages_parallel(pdf_content, page_count)
+            except Exception as e:
+                logging.warning(f"⚠️ Параллельное извлечение не удалось, извлекаю последовательно: {e}")
+        
+        return [page.extract_text() or '' for page in reader.pages]
+    
+    def _extract_pages_parallel(self, pdf_content: bytes, page_count: int) -> List[str]:
+        """Раздает диапазоны страниц пулу процессов и склеивает текст по порядку"""
+        workers = min(self.extract_workers, page_count)
+        chunk = -(-page_count // workers)  # Округление вверх
+        ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
         
-        # Отладочная информация
-        logging.info(f"=== ОТЛАДКА ПАРСИНГА ===")
-        logging.info(f"Длина текста: {len(text)}")
-        logging.info(f"Первые 500 символов: {text[:500]}")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(
+                _extract_pages_range,
+                [pdf_content] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges]
+            )
+            # map сохраняет порядок диапазонов
+            pages_text = [text for chunk_text in chunks for text in chunk_text]
+        
+        logging.info(f"Текст извлечен параллельно: {page_count} страниц, {workers} процессов")
+        return pages_text
+    
+    def build_group_index(self, pages_text: List[str]) -> Dict[str, Dict]:
+        """Строит индекс: группа -> страницы, на которых она встречается, и их текст"""
+        index = {}
+        for page_num, page_text in enumerate(pages_text, 1):
+            page_labels = []
+            for match in GROUP_RE.finditer(page_text):
+                label = f"{match.group(1)} {match.group(2)}"
+                if label not in page_labels:
+                    page_labels.append(label)
+            
+            for label in page_labels:
+                entry = index.setdefault(normalize_group(label), {
+                    'label': label, 'pages': [], 'texts': [], 'neighbours': []
+                })
+                entry['pages'].append(page_num)
+                entry['texts'].append(page_text)
+                # Группы с той же страницы - соседние колонки таблицы
+                for other in page_labels:
+                    if other != label and other not in entry['neighbours']:
+                        entry['neighbours'].append(other)
+        
+        for entry in index.values():
+            entry['text'] = '\n'.join(entry.pop('texts'))
+        
+        return index
+    
+    def parse_schedule(self, text: str, group_label: str = '302 Ф', neighbours: Optional[List[str]] = None) -> Dict:
+        """Парсит расписание группы из текста с учетом структуры потоковых занятий"""
+        schedule = {}
+        debug = self.debug  # Проверка флага на каждой строке дешевле вызова логгера
+        trace = self._open_trace(group_label) if debug else None
         
         # Разбиваем текст на строки
         lines = text.split('\n')
-        logging.info(f"Всего строк: {len(lines)}")
+        
+        if debug:
+            debug_logger.debug("=== Разбор %s: %d символов, %d строк ===", group_label, len(text), len(lines))
+            debug_logger.debug("Первые 500 символов: %s", text[:500])
         
         current_date = None
         temp_lessons = {}  # Временные уроки до нахождения даты
@@ -98,17 +340,20 @@ class ScheduleParser:
             line = line.strip()
             if not line:
                 continue
-                
-            logging.info(f"=== Обрабатываю строку {i+1}: '{line}' ===")
             
-            # Ищем дату (формат: DD.MM.YYYY)
-            date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', line)
-            if date_match:
-                new_date = date_match.group(1)
+            kind, match = classify_line(line)
+            
+            if trace:
+                self._trace(trace, line=i + 1, kind=kind, text=line)
+            
+            # Дата (формат: DD.MM.YYYY)
+            if kind == 'date':
+                new_date = match.group(0)
                 
                 # Если у нас есть временные уроки, переносим их на новую дату
                 if temp_lessons:
-                    logging.info(f"🔄 Переношу {len(temp_lessons)} временных уроков на {new_date}")
+                    if debug:
+                        debug_logger.debug("🔄 Переношу %d временных уроков на %s", len(temp_lessons), new_date)
                     if new_date not in schedule:
                         schedule[new_date] = {}
                     schedule[new_date].update(temp_lessons)
@@ -117,18 +362,16 @@ class ScheduleParser:
                 current_date = new_date
                 if current_date not in schedule:
                     schedule[current_date] = {}
-                logging.info(f"✅ Найдена дата: {current_date}")
+                if debug:
+                    debug_logger.debug("✅ Строка %d: дата %s", i + 1, current_date)
                 continue
             
-            # Ищем время в уроке (формат: HH-MM) - это приоритет!
-            lesson_time_match = re.search(r'(\d{2})-(\d{2})', line)
-            if lesson_time_match:
-                hour, minute = lesson_time_match.groups()
-                lesson_time = f"{hour}:{minute}"
-                logging.info(f"✅ Найдено время в уроке: {lesson_time}")
+            # Время в уроке (формат: HH-MM) - приоритетнее основного времени
+            if kind == 'lesson_time':
+                lesson_time = f"{match.group('hour')}:{match.group('lesson_m')}"
                 
-                # Извлекаем предметы для группы 302 Ф из правой колонки
-                subjects = self._extract_subjects_for_302f(line)
+                # Извлекаем предметы для группы из ее колонки
+                subjects = self._extract_subjects_for_group(line, group_label, neighbours or [])
                 
                 # Ищем преподавателей и аудитории в следующих строках
                 instructor_auditorium = self._extract_instructor_auditorium(lines, i+1)
@@ -144,30 +387,32 @@ class ScheduleParser:
                     if current_date and current_date in schedule:
                         if lesson_time not in schedule[current_date]:
                             schedule[current_date][lesson_time] = lesson_data
-                            logging.info(f"📝 Создана запись для времени {lesson_time} в дате {current_date}")
+                            action = 'added'
                         else:
-                            logging.info(f"⚠️ Время {lesson_time} уже существует в дате {current_date}")
+                            action = 'duplicate'
                     else:
                         # Сохраняем во временные уроки
                         temp_lessons[lesson_time] = lesson_data
-                        logging.info(f"📝 Сохранен временный урок для времени {lesson_time}")
+                        action = 'temporary'
                 else:
-                    logging.info(f"⚠️ Предмет пустой для времени {lesson_time}, пропускаю")
+                    action = 'empty_subject'
                 
+                if debug:
+                    debug_logger.debug("✅ Строка %d: урок %s (%s) %s", i + 1, lesson_time, action, lesson_data)
+                if trace:
+                    self._trace(trace, line=i + 1, lesson_time=lesson_time, date=current_date,
+                                action=action, lesson=lesson_data)
                 continue
             
-            # Ищем основное время (формат: HH:MM - HH:MM)
-            main_time_match = re.search(r'(\d{2}):(\d{2})\s*-\s*(\d{2}):(\d{2})', line)
-            if main_time_match:
-                start_hour, start_min, end_hour, end_min = main_time_match.groups()
-                current_main_time = f"{start_hour}:{start_min}-{end_hour}:{end_min}"
-                logging.info(f"✅ Найдено основное время: {current_main_time}")
-                continue
+            # Основное время (формат: HH:MM - HH:MM) - в расписание не попадает
+            if kind == 'main_time' and debug:
+                debug_logger.debug("✅ Строка %d: основное время %s", i + 1, match.group(0))
         
         # В конце переносим оставшиеся временные уроки на первую дату
         if temp_lessons and schedule:
             first_date = list(schedule.keys())[0]
-            logging.info(f"🔄 Переношу {len(temp_lessons)} оставшихся временных уроков на {first_date}")
+            if debug:
+                debug_logger.debug("🔄 Переношу %d оставшихся временных уроков на %s", len(temp_lessons), first_date)
             if first_date not in schedule:
                 schedule[first_date] = {}
             schedule[first_date].update(temp_lessons)
@@ -175,65 +420,63 @@ class ScheduleParser:
             # Если нет дат вообще, создаем временную дату
             temp_date = "01.09.2025"
             schedule[temp_date] = temp_lessons
-            logging.info(f"🔄 Создаю временную дату {temp_date} для {len(temp_lessons)} уроков")
+            if debug:
+                debug_logger.debug("🔄 Создаю временную дату %s для %d уроков", temp_date, len(temp_lessons))
         
         # Сортируем уроки по времени для каждого дня
         for date in schedule:
             schedule[date] = dict(sorted(schedule[date].items(), key=lambda x: x[0]))
-            logging.info(f"📅 Сортировка для {date}: {list(schedule[date].keys())}")
         
         # Проверяем, что расписание не пустое
         total_lessons = sum(len(day_schedule) for day_schedule in schedule.values())
-        logging.info(f"📊 Всего найдено уроков: {total_lessons}")
+        logging.info(f"📊 {group_label}: найдено уроков: {total_lessons}, дней: {len(schedule)}")
         
-        logging.info(f"📊 Итоговое расписание: {schedule}")
-        logging.info(f"=== КОНЕЦ ОТЛАДКИ ===")
+        if debug:
+            debug_logger.debug("📊 Итоговое расписание %s: %s", group_label, schedule)
+        if trace:
+            trace.close()
         return schedule
     
-    def _extract_subjects_for_302f(self, line: str) -> str:
-        """Извлекает предметы для группы 302 Ф из строки"""
+    def _open_trace(self, group_label: str):
+        """Открывает JSONL-трассировку решений парсера (только в режиме отладки)"""
+        if not self.trace_path:
+            return None
+        try:
+            trace = open(self.trace_path, 'a', encoding='utf-8')
+        except OSError as e:
+            debug_logger.warning("⚠️ Не удалось открыть трассировку %s: %s", self.trace_path, e)
+            return None
+        self._trace(trace, group=group_label, started_at=datetime.now().isoformat())
+        return trace
+    
+    @staticmethod
+    def _trace(trace, **record):
+        """Пишет одну запись трассировки"""
+        trace.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def _extract_subjects_for_group(self, line: str, group_label: str, neighbours: List[str]) -> str:
+        """Извлекает предметы группы из строки (колонки групп идут слева направо)"""
         # Убираем время из начала строки
-        line = re.sub(r'^\d{2}-\d{2}\s*', '', line)
-        
-        # Ищем предметы для группы 302 Ф (правая колонка)
-        if '302 Ф' in line:
-            # Берем правую часть после "302 Ф"
-            parts = line.split('302 Ф')
-            if len(parts) > 1:
-                subject_part = parts[1].strip()
-                # Убираем аудитории (начинающиеся с цифр)
-                subject_part = re.sub(r'\d+\s+(?:Советская|Полесская|Ломоносова)', '', subject_part)
-                subject_part = re.sub(r'Спортивный зал', '', subject_part)
-                subject_part = re.sub(r'\s+', ' ', subject_part).strip()
-                logging.info(f"📚 Извлечен предмет для 302 Ф: '{subject_part}'")
-                return subject_part
-        
-        # Если "302 Ф" не найден, но есть "301 Ф", берем правую часть
-        if '301 Ф' in line:
-            parts = line.split('301 Ф')
-            if len(parts) > 1:
-                # Берем правую часть и ищем предметы для 302 Ф
-                right_part = parts[1].strip()
-                # Убираем аудитории
-                right_part = re.sub(r'\d+\s+(?:Советская|Полесская|Ломоносова)', '', right_part)
-                right_part = re.sub(r'Спортивный зал', '', right_part)
-                # Убираем лишний текст с временем
-                right_part = re.sub(r'\d{2}-\d{2}', '', right_part)
-                right_part = re.sub(r'\d{2}:\d{2}\s*-\s*\d{2}:\d{2}', '', right_part)
-                right_part = re.sub(r'\s+', ' ', right_part).strip()
-                logging.info(f"📚 Извлечен предмет из правой части: '{right_part}'")
-                return right_part
-        
-        # Если ничего не найдено, берем всю строку и убираем аудитории
-        line = re.sub(r'\d+\s+(?:Советская|Полесская|Ломоносова)', '', line)
-        line = re.sub(r'Спортивный зал', '', line)
-        # Убираем лишний текст с временем
-        line = re.sub(r'\d{2}-\d{2}', '', line)
-        line = re.sub(r'\d{2}:\d{2}\s*-\s*\d{2}:\d{2}', '', line)
-        line = re.sub(r'\s+', ' ', line).strip()
-        
-        logging.info(f"📚 Извлечен предмет: '{line}'")
-        return line
+        line = LESSON_PREFIX_RE.sub('', line)
+        
+        # Ищем предметы в колонке группы: от ее названия до названия следующей группы
+        if group_label in line:
+            subject_part = line.split(group_label, 1)[1]
+            next_positions = [subject_part.find(other) for other in neighbours if other in subject_part]
+            if next_positions:
+                subject_part = subject_part[:min(next_positions)]
+            # Убираем аудитории (начинающиеся с цифр)
+            return _clean_subject(subject_part, strip_times=False)
+        
+        # Если группы в строке нет, но есть соседняя, берем правую часть после нее
+        present = [(line.rfind(other), other) for other in neighbours if other in line]
+        if present:
+            position, other = max(present)
+            # Убираем аудитории и лишний текст с временем
+            return _clean_subject(line[position + len(other):])
+        
+        # Если ничего не найдено, берем всю строку и убираем аудитории и время
+        return _clean_subject(line)
     
     def _extract_instructor_auditorium(self, lines: List[str], start_line: int) -> Dict:
         """Извлекает преподавателя и аудиторию из следующих строк"""
@@ -244,26 +487,22 @@ class ScheduleParser:
             line = lines[i].strip()
             if not line:
                 continue
-                
-            logging.info(f"🔍 Проверяю строку {i+1}: '{line}'")
             
             # Поиск преподавателя (ФИО в формате "Фамилия И.О.")
-            instructor_match = re.search(r'([А-Я][а-я]+\s+[А-Я]\.[А-Я]\.)', line)
+            instructor_match = INSTRUCTOR_RE.search(line)
             if instructor_match and not result['instructor']:
                 result['instructor'] = instructor_match.group(1)
-                logging.info(f"👨‍🏫 Извлечен преподаватель: '{result['instructor']}'")
                 continue
             
             # Поиск аудитории
-            auditorium_match = re.search(r'(?:Аудит\.\s*)?(\d+\s+(?:Советская|Полесская|Ломоносова)|Спортивный зал)', line)
+            auditorium_match = AUDITORIUM_RE.search(line)
             if auditorium_match and not result['auditorium']:
                 result['auditorium'] = auditorium_match.group(1)
-                logging.info(f"🏢 Извлечена аудитория: '{result['auditorium']}'")
                 continue
             
             # Если строка не подходит для преподавателя/аудитории
-            if not instructor_match and not auditorium_match:
-                logging.info(f"❌ Строка {i+1} не подходит для преподавателя/аудитории")
+            if self.debug and not instructor_match and not auditorium_match:
+                debug_logger.debug("❌ Строка %d не подходит для преподавателя/аудитории: %r", i + 1, line)
         
         return result
     
@@ -271,49 +510,126 @@ class ScheduleParser:
         """Ищет дату в следующих строках"""
         for i in range(start_line, min(start_line + max_lines, len(lines))):
             line = lines[i].strip()
-            date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', line)
+            date_match = DATE_RE.search(line)
             if date_match:
-                found_date = date_match.group(1)
-                logging.info(f"🔍 Найдена дата в следующих строках: {found_date}")
-                return found_date
+                return date_match.group(1)
         return None
     
-    def get_schedule_for_date(self, target_date: str) -> Dict:
-        """Получает расписание на конкретную дату"""
-        if not self.schedule_data:
-            self.update_schedule()
+    def get_groups(self) -> List[str]:
+        """Группы, найденные в последнем PDF"""
+        return sorted(self.schedule_data)
+    
+    def get_schedule_for_date(self, target_date: str, group: Optional[str] = None) -> Mapping:
+        """Получает расписание группы на конкретную дату (не ждет загрузки PDF)"""
+        snapshot = self._snapshot
+        if not snapshot.groups:
+            self.request_refresh()
         
-        return self.schedule_data.get(target_date, {})
+        group_key = normalize_group(group) if group else self.default_group
+        return snapshot.groups.get(group_key, {}).get(target_date, {})
     
-    def get_schedule_for_tomorrow(self) -> Dict:
-        """Получает расписание на завтра"""
+    def get_schedule_for_tomorrow(self, group: Optional[str] = None) -> Mapping:
+        """Получает расписание группы на завтра"""
         tomorrow = (datetime.now() + timedelta(days=1)).strftime('%d.%m.%Y')
-        return self.get_schedule_for_date(tomorrow)
+        return self.get_schedule_for_date(tomorrow, group)
+    
+    def get_schedule_for_week(self, group: Optional[str] = None) -> Mapping:
+        """Получает расписание группы на неделю (не ждет загрузки PDF)"""
+        snapshot = self._snapshot
+        if not snapshot.groups:
+            self.request_refresh()
+        
+        group_key = normalize_group(group) if group else self.default_group
+        return snapshot.groups.get(group_key, {})
+    
+    def add_update_listener(self, callback):
+        """Подписывает callback(snapshot) на изменения содержимого расписания"""
+        self._update_listeners.append(callback)
     
-    def get_schedule_for_week(self) -> Dict:
-        """Получает расписание на неделю"""
-        if not self.schedule_data:
-            self.update_schedule()
+    def start_background_refresh(self, interval_hours: float):
+        """Запускает фоновое обновление: сразу (прогрев) и затем раз в interval_hours"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
         
-        return self.schedule_data
+        def run():
+            while not self._stop_refresh.is_set():
+                self.update_schedule()
+                self._stop_refresh.wait(interval_hours * 3600)
+        
+        self._stop_refresh.clear()
+        self._refresh_thread = threading.Thread(target=run, name='schedule-refresher', daemon=True)
+        self._refresh_thread.start()
+        logging.info(f"🔄 Фоновое обновление расписания: каждые {interval_hours} ч")
+    
+    def stop_background_refresh(self):
+        """Останавливает фоновое обновление"""
+        self._stop_refresh.set()
+    
+    def request_refresh(self):
+        """Запускает внеочередное обновление в фоне, если оно еще не идет"""
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.update_schedule, name='schedule-refresh-once', daemon=True).start()
     
     def update_schedule(self) -> bool:
-        """Обновляет расписание"""
+        """Обновляет расписание и атомарно подменяет снимок
+
+        Если обновление уже идет в другом потоке, сразу возвращает False.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            logging.info("⏳ Обновление расписания уже идет, пропускаю")
+            return False
+        try:
+            return self._refresh()
+        finally:
+            self._refresh_lock.release()
+    
+    def _refresh(self) -> bool:
+        """Скачивает и разбирает PDF, публикует новый снимок"""
         try:
             logging.info("🔄 Начинаю обновление расписания...")
+            current = self._snapshot
             pdf_content = self.download_pdf()
             if pdf_content:
-                text = self.extract_text_from_pdf(pdf_content)
-                if text:
-                    self.schedule_data = self.parse_schedule(text)
-                    self.last_update = datetime.now()
+                # Тот же файл, что уже разобран - извлечение и парсинг не нужны
+                content_hash = hashlib.sha256(pdf_content).hexdigest()
+                if content_hash == current.content_hash and current.groups:
+                    self._snapshot = current._replace(last_update=datetime.now())
+                    logging.info("✅ Расписание не изменилось, пропускаю разбор PDF")
+                    return True
+                
+                # Один проход по PDF обслуживает все группы
+                group_index = self.extract_text_from_pdf(pdf_content)
+                if group_index:
+                    groups = {
+                        group_key: self.parse_schedule(entry['text'], entry['label'], entry['neighbours'])
+                        for group_key, entry in group_index.items()
+                    }
+                    # Новый снимок собирается целиком и публикуется одним присваиванием
+                    snapshot = ScheduleSnapshot(
+                        groups=_freeze(groups),
+                        content_hash=content_hash,
+                        last_update=datetime.now(),
+                        version=current.version + 1
+                    )
+                    self._snapshot = snapshot
+                    
+                    for callback in self._update_listeners:
+                        try:
+                            callback(snapshot)
+                        except Exception as e:
+                            logging.error(f"❌ Ошибка обработчика обновления расписания: {e}")
                     
                     # Проверяем, что расписание не пустое
-                    total_lessons = sum(len(day_schedule) for day_schedule in self.schedule_data.values())
-                    logging.info(f"✅ Расписание обновлено! Всего уроков: {total_lessons}")
+                    total_lessons = sum(
+                        len(day_schedule)
+                        for group_schedule in groups.values()
+                        for day_schedule in group_schedule.values()
+                    )
+                    logging.info(f"✅ Расписание обновлено! Групп: {len(groups)}, всего уроков: {total_lessons}")
                     return True
                 else:
-                    logging.error("❌ Не удалось извлечь текст из PDF")
+                    logging.error("❌ Не удалось найти группы в тексте PDF")
                     return False
             else:
                 logging.error("❌ Не удалось скачать PDF")
@@ -322,48 +638,62 @@ class ScheduleParser:
             logging.error(f"❌ Ошибка обновления расписания: {e}")
             return False
     
-    def format_schedule_message(self, schedule: Dict, date: str = None) -> str:
-        """Форматирует расписание для отправки в Telegram"""
+    def _format_day_lines(self, day_schedule: Mapping) -> List[str]:
+        """Строки сообщения с уроками одного дня"""
+        separator = "─" * 30
+        lines = []
+        for time in sorted(day_schedule):
+            lesson = day_schedule[time]
+            if lesson.get('subject'):
+                lines.append(f"🕐 {time}")
+                lines.append(f"📚 {lesson['subject']}")
+                if lesson.get('instructor'):
+                    lines.append(f"👨‍🏫 {lesson['instructor']}")
+                if lesson.get('auditorium'):
+                    lines.append(f"🏢 {lesson['auditorium']}")
+            else:
+                lines.append(f"🕐 {time} - Аудит.")
+            lines.append(separator)
+        return lines
+    
+    def format_update_footer(self, label: str = "Последнее обновление") -> str:
+        """Хвост сообщения со временем последнего обновления расписания"""
+        if self.last_update:
+            return f"\n\n🔄 {label}: {self.last_update.strftime('%d.%m.%Y %H:%M')}"
+        return "\n"
+    
+    def format_schedule_message(self, schedule: Mapping, date: str = None, footer: bool = True) -> str:
+        """Форматирует расписание для отправки в Telegram
+        
+        footer=False - без строки о времени обновления (ее дописывает TimetableCache).
+        """
         if not schedule:
             return "Расписание не найдено или произошла ошибка при загрузке."
         
         if date:
             # Расписание на конкретную дату
-            message = f"📅 Расписание на {date}:\n\n"
-            for time, lesson in schedule.items():
-                if lesson.get('subject'):
-                    message += f"🕐 {time}\n"
-                    message += f"📚 {lesson['subject']}\n"
-                    if lesson.get('instructor'):
-                        message += f"👨‍🏫 {lesson['instructor']}\n"
-                    if lesson.get('auditorium'):
-                        message += f"🏢 {lesson['auditorium']}\n"
-                    message += "─" * 30 + "\n"
-                else:
-                    message += f"🕐 {time} - Аудит.\n"
-                    message += "─" * 30 + "\n"
+            lines = [f"📅 Расписание на {date}:", ""]
+            lines.extend(self._format_day_lines(schedule))
         else:
             # Расписание на неделю
-            message = "📅 Расписание на неделю:\n\n"
+            lines = ["📅 Расписание на неделю:", ""]
             for date, day_schedule in schedule.items():
-                message += f"📆 {date}\n"
+                lines.append(f"📆 {date}")
                 for time, lesson in day_schedule.items():
                     if lesson.get('subject'):
-                        message += f"🕐 {time} - {lesson['subject']}"
+                        details = ""
                         if lesson.get('instructor'):
-                            message += f" ({lesson['instructor']}"
+                            details = f" ({lesson['instructor']}"
                             if lesson.get('auditorium'):
-                                message += f", {lesson['auditorium']}"
-                            message += ")"
-                        message += "\n"
+                                details += f", {lesson['auditorium']}"
+                            details += ")"
+                        lines.append(f"🕐 {time} - {lesson['subject']}{details}")
                     else:
-                        message += f"🕐 {time} - Аудит.\n"
-                message += "─" * 30 + "\n"
-        
-        if self.last_update:
-            message += f"\n🔄 Последнее обновление: {self.last_update.strftime('%d.%m.%Y %H:%M')}"
+                        lines.append(f"🕐 {time} - Аудит.")
+                lines.append("─" * 30)
         
-        return message
+        message = '\n'.join(lines)
+        return message + self.format_update_footer() if footer else message
     
     def split_long_message(self, message: str, max_length: int = 4000) -> List[str]:
         """Разбивает длинное сообщение на части"""
@@ -371,27 +701,32 @@ class ScheduleParser:
             return [message]
         
         parts = []
-        lines = message.split('\n')
-        current_part = ""
-        
-        for line in lines:
-            if len(current_part + line + '\n') > max_length:
-                if current_part:
-                    parts.append(current_part.strip())
-                    current_part = line + '\n'
+        current_lines = []
+        current_length = 0
+        
+        for line in message.split('\n'):
+            if current_length + len(line) + 1 > max_length:
+                if current_lines:
+                    parts.append('\n'.join(current_lines).strip())
+                    current_lines = [line]
+                    current_length = len(line) + 1
                 else:
                     # Одна строка слишком длинная
                     parts.append(line[:max_length-3] + "...")
             else:
-                current_part += line + '\n'
+                current_lines.append(line)
+                current_length += len(line) + 1
         
-        if current_part:
-            parts.append(current_part.strip())
+        if current_lines:
+            parts.append('\n'.join(current_lines).strip())
         
         return parts
     
-    def format_week_schedule_messages(self, schedule: Dict) -> List[str]:
-        """Форматирует расписание на неделю с разбивкой на сообщения"""
+    def format_week_schedule_messages(self, schedule: Mapping, footer: bool = True) -> List[str]:
+        """Форматирует расписание на неделю с разбивкой на сообщения
+        
+        footer=False - без строки о времени обновления (ее дописывает TimetableCache).
+        """
         if not schedule:
             return ["📅 Расписание на неделю не найдено."]
         
@@ -406,33 +741,98 @@ class ScheduleParser:
             
             if not day_schedule:  # Пропускаем пустые дни
                 continue
-                
-            day_message = f"📅 Расписание на {date}:\n\n"
-            
-            # Сортируем уроки по времени
-            sorted_times = sorted(day_schedule.keys(), key=lambda x: x)
-            
-            for time in sorted_times:
-                lesson = day_schedule[time]
-                if lesson.get('subject'):
-                    day_message += f"🕐 {time}\n"
-                    day_message += f"📚 {lesson['subject']}\n"
-                    if lesson.get('instructor'):
-                        day_message += f"👨‍🏫 {lesson['instructor']}\n"
-                    if lesson.get('auditorium'):
-                        day_message += f"🏢 {lesson['auditorium']}\n"
-                    day_message += "─" * 30 + "\n"
-                else:
-                    day_message += f"🕐 {time} - Аудит.\n"
-                    day_message += "─" * 30 + "\n"
             
-            if self.last_update:
-                day_message += f"\n🔄 Обновлено: {self.last_update.strftime('%d.%m.%Y %H:%M')}"
+            lines = [f"📅 Расписание на {date}:", ""]
+            lines.extend(self._format_day_lines(day_schedule))
             
-            messages.append(day_message)
+            message = '\n'.join(lines)
+            messages.append(message + self.format_update_footer("Обновлено") if footer else message)
         
         # Если нет сообщений, возвращаем одно сообщение
         if not messages:
             return ["📅 Расписание на неделю не найдено или все дни пустые."]
         
         return messages
+
+
+class TimetableCache:
+    """Готовые к отправке сообщения официального расписания
+
+    Части сообщений (уже разбитые по лимиту Telegram) хранятся по ключу
+    (группа, дата) и по группе для недели. Кэш перестраивается один раз на
+    каждую новую версию снимка ScheduleParser - в потоке обновления, из
+    обработчика parser.add_update_listener. Строка о времени обновления в
+    кэш не входит и дописывается при выдаче: повторная загрузка того же
+    PDF меняет только ее и не сбрасывает кэш.
+    """
+    
+    def __init__(self, parser: ScheduleParser, max_length: int = 4000):
+        self.parser = parser
+        self.max_length = max_length
+        self._lock = threading.Lock()
+        self._version = None  # версия снимка, по которому собран кэш
+        self._days = {}  # (группа, дата) -> [части сообщения]
+        self._weeks = {}  # группа -> ([[части сообщения дня]], нужна ли строка обновления)
+        parser.add_update_listener(self.rebuild)
+    
+    def rebuild(self, snapshot: ScheduleSnapshot):
+        """Перестраивает сообщения для нового снимка"""
+        with self._lock:
+            if snapshot.version == self._version:
+                return
+            
+            days = {}
+            weeks = {}
+            for group_key, group_schedule in snapshot.groups.items():
+                for date, day_schedule in group_schedule.items():
+                    if day_schedule:
+                        message = self.parser.format_schedule_message(day_schedule, date, footer=False)
+                        days[(group_key, date)] = self.parser.split_long_message(message, self.max_length)
+                # Если непустых дней нет, вместо расписания будет заглушка без строки обновления
+                dated = any(group_schedule.values())
+                weeks[group_key] = ([
+                    self.parser.split_long_message(message, self.max_length)
+                    for message in self.parser.format_week_schedule_messages(group_schedule, footer=False)
+                ], dated)
+            
+            # Подменяем словари целиком - читатели не видят частично собранный кэш
+            self._days, self._weeks, self._version = days, weeks, snapshot.version
+            logging.info(f"🗂️ Кэш сообщений расписания перестроен: {len(days)} дней, {len(weeks)} групп")
+    
+    def _ensure_current(self):
+        snapshot = self.parser.snapshot
+        if snapshot.version != self._version:
+            self.rebuild(snapshot)
+    
+    def _with_footer(self, parts: List[str], footer: str) -> List[str]:
+        """Дописывает строку обновления к последней части, не превышая max_length"""
+        last = parts[-1] + footer
+        if len(last) <= self.max_length:
+            return parts[:-1] + [last]
+        return parts + [footer.strip()] if footer.strip() else parts
+    
+    def is_ready(self) -> bool:
+        """Загружено ли расписание хотя бы раз"""
+        return bool(self.parser.snapshot.groups)
+    
+    def get_day(self, date: str, group: Optional[str] = None) -> Optional[List[str]]:
+        """Части сообщения на дату 'ДД.ММ.ГГГГ' или None, если занятий нет"""
+        self._ensure_current()
+        group_key = normalize_group(group) if group else self.parser.default_group
+        parts = self._days.get((group_key, date))
+        if parts is None:
+            return None
+        return self._with_footer(parts, self.parser.format_update_footer())
+    
+    def get_week(self, group: Optional[str] = None) -> Optional[List[str]]:
+        """Части сообщений на неделю или None, если группы нет в расписании"""
+        self._ensure_current()
+        group_key = normalize_group(group) if group else self.parser.default_group
+        week = self._weeks.get(group_key)
+        if week is None:
+            return None
+        messages, dated = week
+        if not dated:
+            return [part for parts in messages for part in parts]
+        footer = self.parser.format_update_footer("Обновлено")
+        return [part for parts in messages for part in self._with_footer(parts, footer)]
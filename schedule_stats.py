@@ -0,0 +1,193 @@
+# Агрегаты статистики по пользователям: счетчики обновляются при каждой записи
+#
+# Проверка согласованности с хранилищем: python schedule_stats.py
+# (при остановленном боте - журнал при загрузке может быть свернут в снапшот)
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from events import Event
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS_RU = ('Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье')
+MONTHS_RU = ('Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+             'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь')
+
+
+class UserStats:
+    """Счетчики одного пользователя: всего, по типам, дням недели и месяцам"""
+
+    __slots__ = ('total', 'by_type', 'by_weekday', 'by_month')
+
+    def __init__(self):
+        self.total = 0
+        self.by_type = Counter()  # 'study' | 'work' | ... -> событий
+        self.by_weekday = [0] * 7  # Понедельник = 0
+        self.by_month = Counter()  # 'YYYY-MM' -> событий
+
+    def apply(self, date_key: str, event: Event, delta: int = 1):
+        """Учитывает событие (delta=1) или его удаление (delta=-1)"""
+        self.total += delta
+        self.by_type[event.type_name] += delta
+        if not event.day:
+            # Дата не распознана при добавлении - в общем числе есть, в разбивке по дням нет
+            return
+        self.by_weekday[(event.day + 6) % 7] += delta  # Как date.weekday()
+        # Месяц берем из распознанной даты, а не из ключа - ключ мог быть записан не как YYYY-MM-DD
+        self.by_month[f"{event.date:%Y-%m}"] += delta
+
+    def as_dict(self) -> Dict:
+        return {
+            'total': self.total,
+            'by_type': {key: count for key, count in self.by_type.items() if count},
+            'by_weekday': list(self.by_weekday),
+            'by_month': {key: count for key, count in sorted(self.by_month.items()) if count},
+        }
+
+
+class ScheduleStats:
+    """Агрегаты статистики для всех пользователей
+
+    Счетчики пользователя строятся из хранилища при первом обращении (один
+    проход по его событиям), дальше add_event поддерживает их за O(1) -
+    экраны статистики и рекомендаций не перебирают события. Будущие
+    удаление и редактирование должны вызывать remove() / remove() + add().
+    Запись в хранилище и изменение счетчиков идут под user_lock(user_id),
+    чтобы ленивое построение не учло событие дважды; замки разбиты на
+    LOCK_STRIPES полос по user_id, так что разные пользователи не ждут друг
+    друга. В памяти держатся счетчики max_users пользователей, давно не
+    смотревшие статистику вытесняются (LRU) и при следующем обращении
+    строятся заново.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, load_user: Callable[[int], Dict[str, List[Event]]], max_users: int = 10000):
+        self.load_user = load_user  # user_id -> {date -> [Event]} из хранилища
+        self.max_users = max(1, max_users)
+        self._locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+        self._users_lock = threading.Lock()  # Только словарь _users, без обращений к хранилищу
+        self._users = OrderedDict()  # user_id -> UserStats, от давних к свежим
+        self.builds = 0
+        self.evicted = 0
+
+    def user_lock(self, user_id: int) -> threading.RLock:
+        """Замок счетчиков пользователя (общий для полосы user_id)"""
+        return self._locks[hash(user_id) % self.LOCK_STRIPES]
+
+    def _cached(self, user_id: int) -> Optional[UserStats]:
+        with self._users_lock:
+            stats = self._users.get(user_id)
+            if stats is not None:
+                self._users.move_to_end(user_id)
+            return stats
+
+    def _install(self, user_id: int, stats: UserStats):
+        with self._users_lock:
+            self._users[user_id] = stats
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evicted += 1
+
+    def get(self, user_id: int) -> UserStats:
+        stats = self._cached(user_id)
+        if stats is not None:
+            return stats
+        with self.user_lock(user_id):
+            stats = self._cached(user_id)
+            if stats is None:
+                stats = self.build(self.load_user(user_id))
+                self._install(user_id, stats)
+                self.builds += 1
+            return stats
+
+    def add(self, user_id: int, date_key: str, event: Event):
+        """Вызывается после записи события в хранилище (под user_lock)"""
+        with self.user_lock(user_id):
+            stats = self._cached(user_id)
+            # Еще не построенные (или вытесненные) счетчики учтут событие при построении
+            if stats is not None:
+                stats.apply(date_key, event)
+
+    def remove(self, user_id: int, date_key: str, event: Event):
+        """Вызывается после удаления события из хранилища (под user_lock)"""
+        with self.user_lock(user_id):
+            stats = self._cached(user_id)
+            if stats is not None:
+                stats.apply(date_key, event, -1)
+
+    @staticmethod
+    def build(schedules: Dict[str, List[Event]]) -> UserStats:
+        """Счетчики с нуля по событиям пользователя"""
+        stats = UserStats()
+        for date_key, events in schedules.items():
+            for event in events:
+                stats.apply(date_key, event)
+        return stats
+
+    def verify(self, repair: bool = True) -> Dict[int, Dict]:
+        """Сверяет построенные счетчики с хранилищем
+
+        Возвращает расхождения user_id -> {'cached': ..., 'rebuilt': ...};
+        при repair=True счетчики с расхождением заменяются пересчитанными.
+        """
+        mismatches = {}
+        with self._users_lock:
+            user_ids = list(self._users)
+        for user_id in user_ids:
+            with self.user_lock(user_id):
+                with self._users_lock:
+                    cached = self._users.get(user_id)
+                if cached is None:
+                    continue  # Вытеснен за время проверки
+                rebuilt = self.build(self.load_user(user_id))
+                if cached.as_dict() != rebuilt.as_dict():
+                    mismatches[user_id] = {'cached': cached.as_dict(), 'rebuilt': rebuilt.as_dict()}
+                    if repair:
+                        self._install(user_id, rebuilt)
+
+        if mismatches:
+            logger.warning(f"⚠️ Расхождение статистики у {len(mismatches)} пользователей")
+        return mismatches
+
+    def info(self) -> Dict:
+        """Метрики для /metrics"""
+        return {'users': len(self._users), 'max_users': self.max_users, 'builds': self.builds, 'evicted': self.evicted}
+
+
+def check_storage(storage, user_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+    """Сверяет пошаговое обновление счетчиков с пересчетом по хранилищу
+
+    Для каждого пользователя счетчики набираются по одному событию, как в
+    add_event, и сравниваются с построенными одним проходом.
+    """
+    if user_ids is None:
+        user_ids = storage.get_user_ids()
+    stats = ScheduleStats(storage.get_user_schedules, max_users=len(user_ids))
+    for user_id in user_ids:
+        stats._install(user_id, UserStats())
+        for date_key, events in storage.get_user_schedules(user_id).items():
+            for event in events:
+                stats.add(user_id, date_key, event)
+    return stats.verify(repair=False)
+
+
+if __name__ == '__main__':
+    import config
+    from storage import create_storage
+
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    storage = create_storage(config.STORAGE_BACKEND, config.SCHEDULES_FILE, config.SQLITE_PATH,
+                             compact_threshold=config.JOURNAL_COMPACT_THRESHOLD)
+    storage.load()
+    try:
+        user_ids = storage.get_user_ids()
+        mismatches = check_storage(storage, user_ids)
+        for user_id, diff in mismatches.items():
+            print(f"❌ {user_id}: {diff['cached']} != {diff['rebuilt']}")
+        print(f"✅ Проверено пользователей: {len(user_ids)}, расхождений: {len(mismatches)}")
+    finally:
+        storage.close()
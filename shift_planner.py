@@ -0,0 +1,124 @@
+# Планировщик рабочих смен: минимум смен, чтобы набрать цель по часам
+import time
+import heapq
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class ShiftPlan(NamedTuple):
+    """Результат планирования"""
+    shifts: List[Tuple[str, int, int]]  # (дата, начало, конец в минутах), по порядку
+    minutes: int  # Запланировано минут работы
+    complete: bool  # Набрана ли цель
+    timed_out: bool = False  # Бюджет времени исчерпан - рассмотрены не все дни
+
+
+def split_window(start: int, end: int, max_shift: int, min_shift: int, break_minutes: int,
+                 granularity: int) -> List[Tuple[int, int]]:
+    """Делит свободное окно на смены не длиннее max_shift с перерывами между ними"""
+    chunks = []
+    cursor = start
+    while end - cursor >= min_shift:
+        length = min(max_shift, (end - cursor) // granularity * granularity)
+        if length < min_shift:
+            break
+        chunks.append((cursor, length))
+        cursor += length + break_minutes
+    return chunks
+
+
+def plan_shifts(windows: Dict[str, List[Tuple[int, int]]], needed_minutes: int, min_shift: int,
+                max_shift: int, day_cap: int, break_minutes: int = 60, granularity: int = 60,
+                budget_ms: Optional[float] = None) -> ShiftPlan:
+    """Наименьший набор непересекающихся смен, дающий needed_minutes работы
+
+    windows - свободные окна по датам (в порядке дат). Смена лежит внутри
+    окна, длится от min_shift до max_shift минут, за день - не больше
+    day_cap минут.
+
+    Смены дня берутся от длинных к коротким: k смен дают до
+    min(day_cap, сумма k самых длинных) минут (любую длительность между
+    k * min_shift и этим значением - смены можно укоротить). Прирост от
+    k-й смены дня не растет с k, а для таких (вогнутых) приростов жадный
+    выбор по куче - каждый раз самый большой прирост среди дней - дает
+    максимум минут на любое число смен. Значит, первое k, на котором цель
+    набрана, минимально. Затем лишнее срезается, смены не короче min_shift.
+    Сложность O(W log W) по числу окон.
+
+    budget_ms ограничивает время: дни, до которых не дошли, не
+    рассматриваются, результат помечается timed_out.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+    if needed_minutes <= 0:
+        return ShiftPlan([], 0, True)
+    day_cap = day_cap // granularity * granularity
+
+    # Смены-кандидаты каждого дня, от длинных к коротким
+    days = []
+    timed_out = False
+    for date_key, day_windows in windows.items():
+        if deadline and time.perf_counter() > deadline:
+            timed_out = True
+            break
+        chunks = []
+        for start, end in day_windows:
+            chunks.extend(split_window(start, end, max_shift, min_shift, break_minutes, granularity))
+        if chunks:
+            chunks.sort(key=lambda chunk: (-chunk[1], chunk[0]))
+            days.append((date_key, chunks))
+
+    # Куча: (-прирост от следующей смены дня, номер дня)
+    counts = [0] * len(days)  # Смен в дне
+    totals = [0] * len(days)  # Минут в дне
+    reach = [0] * len(days)  # Сумма длин взятых смен (до лимита на день)
+
+    def next_gain(day_index: int) -> int:
+        chunks = days[day_index][1]
+        count = counts[day_index]
+        if count >= len(chunks) or (count + 1) * min_shift > day_cap:
+            return 0
+        return min(day_cap, reach[day_index] + chunks[count][1]) - totals[day_index]
+
+    heap = [(-next_gain(day_index), day_index) for day_index in range(len(days))]
+    heapq.heapify(heap)
+    order = []  # Дни в порядке выбора смен (для среза перебора)
+    total = 0
+    while heap and total < needed_minutes:
+        gain, day_index = heapq.heappop(heap)
+        if not gain:
+            break
+        counts[day_index] += 1
+        reach[day_index] += days[day_index][1][counts[day_index] - 1][1]
+        totals[day_index] -= gain
+        total -= gain
+        order.append(day_index)
+
+        gain = next_gain(day_index)
+        if gain:
+            heapq.heappush(heap, (-gain, day_index))
+
+    # Срезаем перебор с последних выбранных дней
+    excess = (total - needed_minutes) // granularity * granularity
+    for day_index in reversed(order):
+        if excess <= 0:
+            break
+        cut = min(excess, totals[day_index] - counts[day_index] * min_shift)
+        if cut > 0:
+            totals[day_index] -= cut
+            total -= cut
+            excess -= cut
+
+    # Смены дня: самые длинные кандидаты, укороченные с конца до totals
+    shifts = []
+    for day_index, (date_key, chunks) in enumerate(days):
+        if not counts[day_index]:
+            continue
+        lengths = [length for _, length in chunks[:counts[day_index]]]
+        surplus = sum(lengths) - totals[day_index]
+        for position in range(len(lengths) - 1, -1, -1):
+            cut = min(surplus, lengths[position] - min_shift)
+            lengths[position] -= cut
+            surplus -= cut
+        shifts.extend((date_key, start, start + length) for (start, _), length in zip(chunks, lengths))
+
+    shifts.sort()
+    return ShiftPlan(shifts, total, total >= needed_minutes, timed_out)
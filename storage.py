@@ -0,0 +1,689 @@
+# Хранилища расписаний: журнал (снапшот JSON + append-only журнал) и SQLite
+import os
+import json
+import logging
+import sqlite3
+import threading
+from bisect import insort
+from typing import Callable, Dict, Iterable, List, Optional
+
+from events import Event, NO_TIME
+from free_slots import BusyIndex, format_minutes
+
+logger = logging.getLogger(__name__)
+
+# Ключ снапшота с настройками пользователей (остальные ключи - user_id)
+SETTINGS_KEY = '_settings'
+
+
+def _normalize_user_id(user_id):
+    """JSON превращает ключи в строки - возвращаем числовые user_id"""
+    if isinstance(user_id, str) and user_id.lstrip('-').isdigit():
+        return int(user_id)
+    return user_id
+
+
+def _load_dates(dates: Dict[str, List[Dict]]) -> Dict[str, List[Event]]:
+    """{date -> [словари JSON]} -> {date -> [Event]}"""
+    return {date_key: [Event.from_dict(date_key, event) for event in events] for date_key, events in dates.items()}
+
+
+class BaseStorage:
+    """Интерфейс хранилища расписаний
+
+    События хранятся по ключу (user_id, date), дата - строка 'YYYY-MM-DD'
+    (или исходный текст, если дату не удалось распознать). Наружу отдаются
+    объекты Event, на диске - прежний JSON (Event.to_dict).
+    """
+
+    def load(self):
+        """Подготавливает хранилище к работе"""
+        raise NotImplementedError
+
+    def add_event(self, user_id: int, date_key: str, event: Event) -> List[Event]:
+        """Сохраняет новое событие, возвращает события дня, с которыми оно пересекается"""
+        raise NotImplementedError
+
+    def get_events(self, user_id: int, date_key: str) -> List[Event]:
+        """События пользователя на дату, отсортированные по времени"""
+        raise NotImplementedError
+
+    def get_events_range(self, user_id: int, start_key: str, end_key: str) -> Dict[str, List[Event]]:
+        """События пользователя на даты start_key <= date < end_key"""
+        raise NotImplementedError
+
+    def get_user_schedules(self, user_id: int) -> Dict[str, List[Event]]:
+        """Все события пользователя: date -> [events]"""
+        raise NotImplementedError
+
+    def get_busy(self, user_id: int, date_keys: Iterable[str]) -> BusyIndex:
+        """Занятое время пользователя на даты date_keys (копия, ее можно менять)"""
+        busy = BusyIndex()
+        for date_key in date_keys:
+            for event in self.get_events(user_id, date_key):
+                interval = event.busy_range()
+                if interval:
+                    busy.add(date_key, *interval)
+        return busy
+
+    def has_user(self, user_id: int) -> bool:
+        """Есть ли у пользователя хотя бы одно событие"""
+        raise NotImplementedError
+
+    def get_user_ids(self) -> List[int]:
+        """Все пользователи, у которых есть события"""
+        raise NotImplementedError
+
+    def get_users_for_date(self, date_key: str) -> List[int]:
+        """Пользователи, у которых есть события на дату"""
+        raise NotImplementedError
+
+    def get_user_settings(self, user_id: int) -> Dict:
+        """Сохраненные настройки пользователя (пустой словарь, если их нет)"""
+        raise NotImplementedError
+
+    def set_user_settings(self, user_id: int, settings: Dict):
+        """Заменяет настройки пользователя"""
+        raise NotImplementedError
+
+    def get_all_user_settings(self) -> Dict[int, Dict]:
+        """Настройки всех пользователей, у которых они есть"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Записывает на диск буферизованные изменения"""
+
+    def compact(self):
+        """Сворачивает накопленные изменения (если хранилищу это нужно)"""
+
+    def close(self):
+        """Освобождает ресурсы хранилища"""
+
+
+class JournalStorage(BaseStorage):
+    """Хранилище расписаний: снапшот + журнал добавлений с фоновой компакцией
+
+    Каждое добавление дописывает в журнал одну строку JSON, поэтому стоимость
+    записи не зависит от общего числа событий. Строки копятся в буфере и
+    пишутся одним write + fsync при flush(). Когда журнал разрастается,
+    фоновый поток записывает полный снапшот во временный файл и атомарно
+    подменяет им основной (os.replace). При старте снапшот читается целиком,
+    а затем поверх него проигрывается журнал. Оборванная при падении последняя
+    строка журнала отбрасывается, повторно проигранные записи (по id события)
+    игнорируются.
+
+    События дня лежат по времени начала (вставка бинарным поиском), а занятое
+    время пользователя - слитыми интервалами (BusyIndex, строится при первом
+    обращении), поэтому проверка пересечений при добавлении и поиск свободных
+    окон - O(log n) без перебора событий.
+    """
+
+    def __init__(self, snapshot_path: str = 'schedules.json', journal_path: Optional[str] = None,
+                 compact_threshold: int = 500, fsync: bool = True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.rotated_journal_path = f"{self.journal_path}.old"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+
+        self.schedules = {}  # user_id -> {date -> [events]}
+        self.users_by_date = {}  # date -> {user_id}, для ежедневных напоминаний
+        self._busy = {}  # user_id -> BusyIndex
+        self.user_settings = {}  # user_id -> {timezone, reminder_time, ...}
+        self.lock = threading.RLock()  # Защищает self.schedules и журнал
+        self._compact_lock = threading.Lock()  # Одновременно идет только одна компакция
+        self._journal = None
+        self._journal_records = 0
+        self._pending_lines = []  # Записи журнала, еще не сброшенные на диск
+        self._compaction_thread = None
+
+    # ---------- Загрузка ----------
+
+    def load(self) -> Dict:
+        """Загружает снапшот и проигрывает поверх него журнал"""
+        with self.lock:
+            self.schedules = {}
+            self._busy = {}
+
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                settings = raw.pop(SETTINGS_KEY, {})
+                self.schedules = {_normalize_user_id(user_id): _load_dates(dates) for user_id, dates in raw.items()}
+                self.user_settings = {_normalize_user_id(user_id): value for user_id, value in settings.items()}
+
+            self.users_by_date = {}
+            for user_id, dates in self.schedules.items():
+                for date_key, events in dates.items():
+                    if events:
+                        self.users_by_date.setdefault(date_key, set()).add(user_id)
+
+            replayed = 0
+            # Журнал, оставшийся от прерванной компакции, проигрываем первым
+            for path in (self.rotated_journal_path, self.journal_path):
+                replayed += self._replay(path)
+
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal_records = replayed
+
+            logger.info(f"📂 Загружено {len(self.schedules)} расписаний, из журнала: {replayed} записей")
+
+        if replayed:
+            self.compact_async()
+
+        return self.schedules
+
+    def _replay(self, path: str) -> int:
+        """Проигрывает записи журнала, возвращает их количество"""
+        if not os.path.exists(path):
+            return 0
+
+        self._truncate_torn_tail(path)
+
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"⚠️ Поврежденная запись журнала {path}:{line_no}, пропускаю")
+                    continue
+                self._apply(record)
+                count += 1
+        return count
+
+    def _truncate_torn_tail(self, path: str):
+        """Обрезает недописанную последнюю строку (падение во время записи)"""
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if not data or data.endswith(b'\n'):
+                return
+            last_newline = data.rfind(b'\n')
+            f.truncate(last_newline + 1)
+            logger.warning(f"⚠️ Журнал {path}: отброшена оборванная запись ({len(data) - last_newline - 1} байт)")
+
+    def _apply(self, record: Dict):
+        """Применяет запись журнала к расписаниям в памяти"""
+        if record.get('op') == 'settings':
+            self.user_settings[_normalize_user_id(record['user_id'])] = record['settings']
+            return
+
+        if record.get('op') != 'add':
+            logger.warning(f"⚠️ Неизвестная операция журнала: {record.get('op')}")
+            return
+
+        user_id = _normalize_user_id(record['user_id'])
+        event = Event.from_dict(record['date'], record['event'])
+        events = self.schedules.setdefault(user_id, {}).setdefault(record['date'], [])
+
+        # Запись могла попасть и в снапшот, и в журнал (падение во время компакции)
+        if any(existing.id == event.id for existing in events):
+            return
+
+        insort(events, event)
+        self.users_by_date.setdefault(record['date'], set()).add(user_id)
+
+    # ---------- Запись и чтение ----------
+
+    def add_event(self, user_id: int, date_key: str, event: Event) -> List[Event]:
+        """Добавляет событие в память и в буфер журнала, возвращает пересечения"""
+        line = json.dumps({'op': 'add', 'user_id': user_id, 'date': date_key, 'event': event.to_dict()},
+                          ensure_ascii=False) + '\n'
+
+        with self.lock:
+            day_events = self.schedules.setdefault(user_id, {}).setdefault(date_key, [])
+            busy = self._user_busy(user_id)
+            interval = event.busy_range()
+            conflicts = []
+            if interval:
+                if not busy.is_free(date_key, *interval):
+                    # Пересечение есть - называем события (в дне их немного)
+                    conflicts = [other for other in day_events if event.overlaps(other)]
+                busy.add(date_key, *interval)
+            insort(day_events, event)
+            self.users_by_date.setdefault(date_key, set()).add(user_id)
+            self._pending_lines.append(line)
+        return conflicts
+
+    def _user_busy(self, user_id: int) -> BusyIndex:
+        """Занятое время пользователя (вызывается под self.lock)"""
+        busy = self._busy.get(user_id)
+        if busy is None:
+            busy = self._busy[user_id] = BusyIndex.from_schedules(self.schedules.get(user_id, {}))
+        return busy
+
+    def flush(self):
+        """Дописывает буфер в журнал одним write + fsync"""
+        with self.lock:
+            self._write_pending()
+            need_compaction = self._journal_records >= self.compact_threshold
+
+        if need_compaction:
+            self.compact_async()
+
+    def _write_pending(self):
+        """Сбрасывает буфер в журнал (вызывается под self.lock)"""
+        if not self._pending_lines:
+            return
+
+        self._journal.write(''.join(self._pending_lines))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_records += len(self._pending_lines)
+        self._pending_lines.clear()
+
+    def get_events(self, user_id: int, date_key: str) -> List[Event]:
+        with self.lock:
+            return list(self.schedules.get(user_id, {}).get(date_key, []))
+
+    def get_events_range(self, user_id: int, start_key: str, end_key: str) -> Dict[str, List[Event]]:
+        with self.lock:
+            return {
+                date_key: list(events)
+                for date_key, events in sorted(self.schedules.get(user_id, {}).items())
+                if start_key <= date_key < end_key and events
+            }
+
+    def get_user_schedules(self, user_id: int) -> Dict[str, List[Event]]:
+        with self.lock:
+            return {date_key: list(events) for date_key, events in self.schedules.get(user_id, {}).items()}
+
+    def get_busy(self, user_id: int, date_keys: Iterable[str]) -> BusyIndex:
+        with self.lock:
+            days = self._user_busy(user_id).days
+            busy = BusyIndex()
+            for date_key in date_keys:
+                day = days.get(date_key)
+                if day is not None:
+                    busy.days[date_key] = day.copy()
+            return busy
+
+    def has_user(self, user_id: int) -> bool:
+        return bool(self.schedules.get(user_id))
+
+    def get_user_ids(self) -> List[int]:
+        with self.lock:
+            return list(self.schedules.keys())
+
+    def get_users_for_date(self, date_key: str) -> List[int]:
+        with self.lock:
+            return list(self.users_by_date.get(date_key, ()))
+
+    def get_user_settings(self, user_id: int) -> Dict:
+        with self.lock:
+            return dict(self.user_settings.get(user_id, {}))
+
+    def set_user_settings(self, user_id: int, settings: Dict):
+        line = json.dumps({'op': 'settings', 'user_id': user_id, 'settings': settings},
+                          ensure_ascii=False) + '\n'
+        with self.lock:
+            self.user_settings[user_id] = dict(settings)
+            self._pending_lines.append(line)
+
+    def get_all_user_settings(self) -> Dict[int, Dict]:
+        with self.lock:
+            return {user_id: dict(settings) for user_id, settings in self.user_settings.items()}
+
+    # ---------- Компакция ----------
+
+    def compact_async(self):
+        """Запускает компакцию в фоновом потоке, если она еще не идет"""
+        with self.lock:
+            if self._compaction_thread and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, name='journal-compaction', daemon=True)
+            self._compaction_thread.start()
+
+    def compact(self):
+        """Сворачивает журнал в новый снапшот"""
+        with self._compact_lock:
+            try:
+                with self.lock:
+                    # Копируем состояние и переключаем журнал под одной блокировкой,
+                    # чтобы снапшот и новый журнал не пересекались и не теряли записей.
+                    # Копии неглубокие (списки дня, Event не меняются) - сериализация
+                    # всех событий идет уже без блокировки и не задерживает add_event
+                    snapshot = {
+                        user_id: {date_key: list(events) for date_key, events in dates.items()}
+                        for user_id, dates in self.schedules.items()
+                    }
+                    if self.user_settings:
+                        snapshot[SETTINGS_KEY] = {
+                            user_id: dict(settings) for user_id, settings in self.user_settings.items()
+                        }
+                    records = self._journal_records
+                    self._rotate_journal()
+
+                data = json.dumps(snapshot, ensure_ascii=False, default=Event.to_dict)
+
+                tmp_path = f"{self.snapshot_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+
+                # Снапшот на диске - старый журнал больше не нужен
+                os.remove(self.rotated_journal_path)
+                logger.info(f"💾 Журнал свернут в снапшот ({records} записей)")
+            except Exception as e:
+                logger.error(f"❌ Ошибка компакции журнала: {e}")
+
+    def _rotate_journal(self):
+        """Переносит текущий журнал в .old и открывает новый (вызывается под self.lock)"""
+        self._write_pending()
+        self._journal.close()
+
+        if os.path.exists(self.rotated_journal_path):
+            # Предыдущая компакция не завершилась - дописываем текущий журнал к старому
+            with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                    open(self.rotated_journal_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.rotated_journal_path)
+
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal_records = 0
+
+    def close(self):
+        """Сбрасывает буфер и закрывает журнал"""
+        with self.lock:
+            if self._journal:
+                self._write_pending()
+                self._journal.close()
+                self._journal = None
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище расписаний в локальной базе SQLite
+
+    В памяти ничего не кэшируется: запросы на день и на неделю идут по индексу
+    (user_id, date, start_time) и читают только нужные строки. Вставки копятся
+    в открытой транзакции (она видна этому же соединению) и фиксируются при
+    flush(). При первом запуске на пустой базе события импортируются из
+    JSON-снапшота.
+    """
+
+    def __init__(self, db_path: str = 'schedules.db', import_from: Optional[str] = None):
+        self.db_path = db_path
+        self.import_from = import_from
+        self.lock = threading.RLock()  # Одно соединение на все потоки бота
+        self._conn = None
+
+    def load(self):
+        """Открывает базу и создает схему"""
+        with self.lock:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    date TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    activity TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    added_at TEXT NOT NULL,
+                    PRIMARY KEY (user_id, id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_user_date_start
+                    ON events (user_id, date, start_time);
+                CREATE INDEX IF NOT EXISTS idx_events_date_user
+                    ON events (date, user_id);
+                CREATE TABLE IF NOT EXISTS user_settings (
+                    user_id INTEGER PRIMARY KEY,
+                    settings TEXT NOT NULL
+                );
+            """)
+
+            count = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            if count == 0 and self.import_from and os.path.exists(self.import_from):
+                count = self._import_json(self.import_from)
+
+            logger.info(f"📂 База {self.db_path} открыта, событий: {count}")
+
+    def _import_json(self, path: str) -> int:
+        """Переносит события из JSON-снапшота в пустую базу"""
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        settings = raw.pop(SETTINGS_KEY, {})
+
+        rows = [
+            self._to_row(_normalize_user_id(user_id), date_key, event)
+            for user_id, dates in raw.items()
+            for date_key, events in _load_dates(dates).items()
+            for event in events
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_settings VALUES (?, ?)",
+                [(_normalize_user_id(user_id), json.dumps(value, ensure_ascii=False)) for user_id, value in settings.items()]
+            )
+        logger.info(f"📥 Импортировано {len(rows)} событий из {path}")
+        return len(rows)
+
+    @staticmethod
+    def _to_row(user_id: int, date_key: str, event: Event) -> tuple:
+        data = event.to_dict()
+        start_time = format_minutes(event.start) if event.start != NO_TIME else data.get('time', '')
+        return (
+            data['id'], user_id, date_key, start_time, data.get('time', ''),
+            data['activity'], data.get('type', 'general'), data.get('added_at', '')
+        )
+
+    @staticmethod
+    def _to_event(row: sqlite3.Row) -> Event:
+        return Event.from_dict(row['date'], {
+            'id': row['id'],
+            'time': row['time'],
+            'activity': row['activity'],
+            'type': row['type'],
+            'added_at': row['added_at']
+        })
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self.lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add_event(self, user_id: int, date_key: str, event: Event) -> List[Event]:
+        with self.lock:
+            # События дня читаются по индексу (user_id, date, start_time)
+            conflicts = [other for other in self.get_events(user_id, date_key) if event.overlaps(other)]
+            self._conn.execute(
+                "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._to_row(user_id, date_key, event)
+            )
+        return conflicts
+
+    def flush(self):
+        """Фиксирует накопленную транзакцию"""
+        with self.lock:
+            self._conn.commit()
+
+    def get_events(self, user_id: int, date_key: str) -> List[Event]:
+        rows = self._query(
+            "SELECT * FROM events WHERE user_id = ? AND date = ? ORDER BY start_time, time",
+            (user_id, date_key)
+        )
+        return [self._to_event(row) for row in rows]
+
+    def get_events_range(self, user_id: int, start_key: str, end_key: str) -> Dict[str, List[Event]]:
+        rows = self._query(
+            "SELECT * FROM events WHERE user_id = ? AND date >= ? AND date < ? ORDER BY date, start_time, time",
+            (user_id, start_key, end_key)
+        )
+        return self._group_by_date(rows)
+
+    def get_user_schedules(self, user_id: int) -> Dict[str, List[Event]]:
+        rows = self._query(
+            "SELECT * FROM events WHERE user_id = ? ORDER BY date, start_time, time",
+            (user_id,)
+        )
+        return self._group_by_date(rows)
+
+    def _group_by_date(self, rows: List[sqlite3.Row]) -> Dict[str, List[Event]]:
+        result = {}
+        for row in rows:
+            result.setdefault(row['date'], []).append(self._to_event(row))
+        return result
+
+    def has_user(self, user_id: int) -> bool:
+        return bool(self._query("SELECT 1 FROM events WHERE user_id = ? LIMIT 1", (user_id,)))
+
+    def get_user_ids(self) -> List[int]:
+        return [row[0] for row in self._query("SELECT DISTINCT user_id FROM events", ())]
+
+    def get_users_for_date(self, date_key: str) -> List[int]:
+        return [row[0] for row in self._query("SELECT DISTINCT user_id FROM events WHERE date = ?", (date_key,))]
+
+    def get_user_settings(self, user_id: int) -> Dict:
+        rows = self._query("SELECT settings FROM user_settings WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def set_user_settings(self, user_id: int, settings: Dict):
+        with self.lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_settings VALUES (?, ?)",
+                (user_id, json.dumps(settings, ensure_ascii=False))
+            )
+
+    def get_all_user_settings(self) -> Dict[int, Dict]:
+        rows = self._query("SELECT user_id, settings FROM user_settings", ())
+        return {row[0]: json.loads(row[1]) for row in rows}
+
+    def close(self):
+        with self.lock:
+            if self._conn:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+class WriteCoalescer:
+    """Отслеживает несохраненные записи и сбрасывает их пачками
+
+    Хранилище буферизует add_event, а этот слой вызывает storage.flush()
+    раз в flush_interval секунд или сразу после max_pending записей.
+    Гарантия: при аварийном завершении процесса теряется не больше
+    записей, чем накопилось за flush_interval секунд (и не больше
+    max_pending). При SIGTERM/SIGINT буфер сбрасывается через flush().
+    flush_interval <= 0 - запись сквозная, flush на каждое добавление.
+    """
+
+    def __init__(self, storage: BaseStorage, flush_interval: float = 2.0, max_pending: int = 100):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._wakeup_listeners = []
+        self._stopped = False
+        self._thread = None
+        self._pending = 0
+
+        # Метрики: сколько записей поглотил каждый flush
+        self.flush_count = 0
+        self.write_count = 0
+        self.last_absorbed = 0
+        self.max_absorbed = 0
+
+    def start(self):
+        """Запускает фоновый поток сброса"""
+        if self.flush_interval <= 0 or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='storage-flusher', daemon=True)
+        self._thread.start()
+        logger.info(f"💾 Сброс записей: раз в {self.flush_interval} с или каждые {self.max_pending} записей")
+
+    def mark_dirty(self):
+        """Отмечает новую запись в хранилище"""
+        with self._lock:
+            self._pending += 1
+            self.write_count += 1
+            full = self._pending >= self.max_pending
+
+        if self.flush_interval <= 0:
+            self.flush()
+        elif full:
+            self._wakeup.set()
+            for callback in self._wakeup_listeners:
+                callback()
+
+    def add_wakeup_listener(self, callback: Callable):
+        """callback() вызывается, когда накопилось max_pending записей
+
+        Нужен, если flush() вызывает внешний цикл вместо start(): иначе
+        граница max_pending соблюдалась бы только фоновым потоком.
+        """
+        self._wakeup_listeners.append(callback)
+
+    def flush(self) -> int:
+        """Сбрасывает накопленные записи, возвращает их количество"""
+        with self._flush_lock:
+            with self._lock:
+                absorbed = self._pending
+                self._pending = 0
+            if not absorbed:
+                return 0
+
+            try:
+                self.storage.flush()
+            except Exception as e:
+                with self._lock:
+                    self._pending += absorbed
+                logger.error(f"❌ Ошибка сброса записей ({absorbed} шт.): {e}")
+                return 0
+
+            self.flush_count += 1
+            self.last_absorbed = absorbed
+            self.max_absorbed = max(self.max_absorbed, absorbed)
+            logger.debug(f"💾 Сброшено записей: {absorbed}")
+            return absorbed
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """Останавливает фоновый поток и сбрасывает остаток"""
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+    def stats(self) -> Dict:
+        """Метрики сброса записей"""
+        with self._lock:
+            pending = self._pending
+        return {
+            'pending': pending,
+            'writes': self.write_count,
+            'flushes': self.flush_count,
+            'last_absorbed': self.last_absorbed,
+            'max_absorbed': self.max_absorbed,
+            'avg_absorbed': round((self.write_count - pending) / self.flush_count, 2) if self.flush_count else 0
+        }
+
+
+def create_storage(backend: str, schedules_file: str, sqlite_path: str,
+                   compact_threshold: int = 500) -> BaseStorage:
+    """Создает хранилище по имени бэкенда из config.STORAGE_BACKEND"""
+    if backend == 'journal':
+        return JournalStorage(schedules_file, compact_threshold=compact_threshold)
+    if backend == 'sqlite':
+        return SQLiteStorage(sqlite_path, import_from=schedules_file)
+    raise ValueError(f"Неизвестное хранилище: {backend}")